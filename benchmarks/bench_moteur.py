@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+'''
+Banc d'essai des chemins critiques du moteur de pipopipette.
+
+Chaque cas est mesuré pour chacune des tailles de planche demandées (planches
+carrées de n x n boîtes), à partir d'une graine fixe : deux exécutions avec la
+même graine jouent exactement les mêmes coups. Les résultats sont écrits en
+JSON pour pouvoir comparer deux commits :
+
+    python -m benchmarks.bench_moteur --sortie avant.json
+    python -m benchmarks.bench_moteur --sortie apres.json --reference avant.json
+
+Avec --reference, le programme retourne un code de sortie non nul si un cas
+est plus lent que la référence de plus de --seuil (10 % par défaut).
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from pipopipette.planche import Planche
+from pipopipette.partie import PartiePipopipette
+from pipopipette.joueur import JoueurOrdinateur
+from pipopipette.simulation import SimulateurAleatoire
+
+TAILLES_PAR_DEFAUT = [3, 5, 10, 20, 50]
+
+
+def nombre_appels(taille):
+    '''
+    Nombre d'appels par répétition pour les opérations rapides, de sorte
+    qu'une répétition dure assez longtemps pour être mesurée sur les petites
+    planches sans s'éterniser sur les grandes.
+    '''
+    return max(10, 20000 // (taille * taille))
+
+
+def preparer_planche(taille, rng, proportion_jouee):
+    '''
+    Construit une planche de taille x taille boîtes dont une proportion des
+    lignes, tirées au hasard, est jouée par des couleurs alternées.
+    '''
+    planche = Planche(taille, taille)
+    coups = planche.obtenir_coups_possibles()
+    rng.shuffle(coups)
+
+    couleur = 'rouge'
+    for coup in coups[:int(len(coups) * proportion_jouee)]:
+        planche.jouer_coup(coup, couleur)
+
+        if not planche.maj_boites():
+            couleur = 'bleu' if couleur == 'rouge' else 'rouge'
+
+    return planche
+
+
+def cas_init(taille, rng):
+    n_appels = nombre_appels(taille)
+
+    def executer(_):
+        for _ in range(n_appels):
+            Planche(taille, taille)
+        return n_appels
+
+    return None, executer
+
+
+def cas_jouer_coup(taille, rng):
+    def preparer():
+        planche = Planche(taille, taille)
+        coups = planche.obtenir_coups_possibles()
+        rng.shuffle(coups)
+        return planche, coups
+
+    def executer(args):
+        planche, coups = args
+        jouer_coup = planche.jouer_coup
+        for coup in coups:
+            jouer_coup(coup, 'rouge')
+        return len(coups)
+
+    return preparer, executer
+
+
+def cas_maj_boites(taille, rng):
+    def preparer():
+        planche = Planche(taille, taille)
+        coups = planche.obtenir_coups_possibles()
+        rng.shuffle(coups)
+        return planche, coups
+
+    def executer(args):
+        # Seuls les appels à maj_boites() sont chronométrés, jouer_coup()
+        # étant mesuré séparément.
+        planche, coups = args
+        compteur = time.perf_counter
+        duree = 0.0
+        for coup in coups:
+            planche.jouer_coup(coup, 'rouge')
+            debut = compteur()
+            planche.maj_boites()
+            duree += compteur() - debut
+        return len(coups), duree
+
+    return preparer, executer
+
+
+def cas_sur_planche(methode, proportion_jouee):
+    def cas(taille, rng):
+        planche = preparer_planche(taille, rng, proportion_jouee)
+        n_appels = nombre_appels(taille)
+        fonction = getattr(planche, methode)
+
+        def executer(_):
+            for _ in range(n_appels):
+                fonction()
+            return n_appels
+
+        return None, executer
+
+    return cas
+
+
+def cas_charger_dune_chaine(taille, rng):
+    chaine = preparer_planche(taille, rng, 0.5).convertir_en_chaine()
+    n_appels = nombre_appels(taille)
+
+    def preparer():
+        return [Planche(taille, taille) for _ in range(n_appels)]
+
+    def executer(planches):
+        for planche in planches:
+            planche.charger_dune_chaine(chaine)
+        return n_appels
+
+    return preparer, executer
+
+
+def cas_partie_complete(taille, rng):
+    def preparer():
+        return PartiePipopipette(joueur_rouge=JoueurOrdinateur('rouge'), joueur_bleu=JoueurOrdinateur('bleu'),
+                                 n_boites_h=taille, n_boites_v=taille, rng=rng.getrandbits(32))
+
+    def executer(partie):
+        # L'affichage fait partie du coût d'une partie en console, mais on
+        # l'envoie dans un tampon plutôt qu'au terminal.
+        with contextlib.redirect_stdout(io.StringIO()):
+            partie.jouer()
+        return 1
+
+    return preparer, executer
+
+
+def cas_partie_simulee(taille, rng):
+    simulateur = SimulateurAleatoire(taille, taille, random.Random(rng.getrandbits(32)))
+    n_parties = nombre_appels(taille)
+
+    def executer(_):
+        simulateur.jouer_parties(n_parties)
+        return n_parties
+
+    return None, executer
+
+
+CAS = {
+    'Planche.__init__': cas_init,
+    'jouer_coup': cas_jouer_coup,
+    'maj_boites': cas_maj_boites,
+    'obtenir_coups_possibles': cas_sur_planche('obtenir_coups_possibles', 0.5),
+    'est_pleine': cas_sur_planche('est_pleine', 1.0),
+    'convertir_en_chaine': cas_sur_planche('convertir_en_chaine', 0.5),
+    'charger_dune_chaine': cas_charger_dune_chaine,
+    '__repr__': cas_sur_planche('__repr__', 0.5),
+    'partie_complete': cas_partie_complete,
+    'partie_simulee': cas_partie_simulee,
+}
+
+
+def mesurer(preparer, executer, repetitions):
+    '''
+    Exécute un cas plusieurs fois et retourne la durée par appel de chaque
+    répétition. La préparation n'est pas chronométrée.
+
+    executer() retourne le nombre d'appels effectués, ou la paire (nombre
+    d'appels, durée) quand il chronomètre lui-même une partie de son travail.
+    '''
+    durees = []
+
+    for _ in range(repetitions):
+        args = preparer() if preparer is not None else None
+
+        debut = time.perf_counter()
+        resultat = executer(args)
+        duree = time.perf_counter() - debut
+
+        if isinstance(resultat, tuple):
+            n_appels, duree = resultat
+        else:
+            n_appels = resultat
+
+        durees.append(duree / n_appels)
+
+    return durees
+
+
+def executer_bancs(tailles, repetitions, graine, noms_cas=None):
+    resultats = []
+
+    for nom, cas in CAS.items():
+        if noms_cas and nom not in noms_cas:
+            continue
+
+        for taille in tailles:
+            # Une graine par (cas, taille) : ajouter ou retirer un cas ne
+            # change pas les coups joués par les autres.
+            rng = random.Random('{}:{}:{}'.format(graine, nom, taille))
+            preparer, executer = cas(taille, rng)
+            durees = mesurer(preparer, executer, repetitions)
+
+            resultats.append({
+                'cas': nom,
+                'taille': taille,
+                'repetitions': repetitions,
+                'secondes_par_appel_median': statistics.median(durees),
+                'secondes_par_appel_min': min(durees),
+            })
+
+            print('{:<24} {:>3}x{:<3} {:>12.3f} µs'.format(nom, taille, taille,
+                                                          statistics.median(durees) * 1e6), file=sys.stderr)
+
+    return resultats
+
+
+def comparer(resultats, reference, seuil):
+    '''
+    Retourne la liste des cas plus lents que la référence de plus du seuil.
+    On compare les minimums, moins sensibles au bruit que les médianes.
+    '''
+    anciens = {(r['cas'], r['taille']): r['secondes_par_appel_min'] for r in reference['resultats']}
+    regressions = []
+
+    for resultat in resultats:
+        ancien = anciens.get((resultat['cas'], resultat['taille']))
+
+        if ancien and resultat['secondes_par_appel_min'] > ancien * (1 + seuil):
+            regressions.append((resultat['cas'], resultat['taille'], ancien, resultat['secondes_par_appel_min']))
+
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Banc d\'essai du moteur de pipopipette.')
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES_PAR_DEFAUT)
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--cas', nargs='+', choices=list(CAS), help='les cas à exécuter (tous par défaut)')
+    parser.add_argument('--sortie', help='fichier JSON des résultats (sortie standard par défaut)')
+    parser.add_argument('--reference', help='fichier JSON d\'une exécution précédente à comparer')
+    parser.add_argument('--seuil', type=float, default=0.10)
+    args = parser.parse_args(arguments)
+
+    resultats = executer_bancs(args.tailles, args.repetitions, args.graine, args.cas)
+
+    rapport = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'plateforme': platform.platform(),
+            'graine': args.graine,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'resultats': resultats,
+    }
+
+    if args.sortie:
+        with open(args.sortie, 'w') as f:
+            json.dump(rapport, f, indent=2)
+    else:
+        json.dump(rapport, sys.stdout, indent=2)
+
+    if args.reference:
+        with open(args.reference) as f:
+            regressions = comparer(resultats, json.load(f), args.seuil)
+
+        for cas, taille, ancien, nouveau in regressions:
+            print('RÉGRESSION {} {}x{}: {:.3f} µs -> {:.3f} µs'.format(cas, taille, taille, ancien * 1e6, nouveau * 1e6),
+                  file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
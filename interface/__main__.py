@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+'''
+Interface graphique :
+
+    python -m interface
+    python -m interface --relecture partie.txt
+
+Le fichier d'une relecture est écrit par
+pipopipette.relecture.sauvegarder_relecture() : la taille de la planche,
+puis un coup par ligne. Pour un ancien fichier qui ne contient que les
+coups, la taille se donne avec --taille (3 x 3 par défaut).
+'''
+
+import argparse
+
+from interface.interface_pipopipette import Fenetre, FenetreRelecture
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m interface', description='Pipopipette, interface graphique.')
+    parser.add_argument('--relecture', metavar='FICHIER', help='relire une partie enregistrée')
+    parser.add_argument('--taille', type=int, nargs=2, metavar=('N_BOITES_H', 'N_BOITES_V'),
+                        help='taille de la planche, lue dans le fichier par défaut')
+    parser.add_argument('--images', type=int, default=16, help='nombre de coups entre deux images clés')
+    args = parser.parse_args()
+
+    if args.relecture is None:
+        # Crée la fenêtre de jeu et la fait afficher.
+        Fenetre().mainloop()
+    else:
+        from pipopipette.relecture import charger_relecture
+
+        n_boites_h, n_boites_v = args.taille if args.taille is not None else (None, None)
+
+        try:
+            relecture = charger_relecture(args.relecture, n_boites_h, n_boites_v, args.images)
+        except ValueError as e:
+            parser.error('{} : {}'.format(args.relecture, e))
+
+        FenetreRelecture(relecture).mainloop()
@@ -1,18 +1,55 @@
 # -*- coding: utf-8 -*-
 
-from tkinter import Tk, Canvas, messagebox
+from tkinter import Tk, Canvas, Label, Scale, HORIZONTAL, messagebox
 import pipopipette.partie
 import pipopipette.exceptions
 import pipopipette.planche
+from pipopipette.topologie import Topologie
+
+
+def longueur_ligne_ajustee(parent, n_boites_h, n_boites_v, longueur_max=200, proportion=0.8):
+    '''
+    Calcule la longueur des lignes pour que la planche tienne dans la
+    proportion en entrée de l'écran, sans dépasser longueur_max.
+
+    Args:
+        parent (Tk): la fenêtre, qui donne la taille de l'écran
+        n_boites_h (int), n_boites_v (int): la taille de la planche
+        longueur_max (int): la longueur des lignes d'une petite planche
+        proportion (float): la part de l'écran que peut occuper le canvas
+
+    Returns:
+        int: la longueur des lignes, en pixels
+    '''
+    # Une planche mesure (1,2 n + 0,2) longueurs de ligne de côté (voir
+    # CanvasPipopipette.dimension_boite).
+    largeur = proportion * parent.winfo_screenwidth() / (1.2 * n_boites_v + 0.2)
+    hauteur = proportion * parent.winfo_screenheight() / (1.2 * n_boites_h + 0.2)
+
+    return max(5, int(min(longueur_max, largeur, hauteur)))
 
 
 class CanvasPipopipette(Canvas):
-    def __init__(self, parent, planche, longueur_ligne=200):
+    def __init__(self, parent, planche, longueur_ligne=None):
+        '''
+        Args:
+            parent (Tk): la fenêtre du canvas
+            planche (Planche): la planche affichée
+            longueur_ligne (int): la longueur des lignes, en pixels; par
+                défaut, ajustée à l'écran (voir longueur_ligne_ajustee())
+        '''
+        if longueur_ligne is None:
+            longueur_ligne = longueur_ligne_ajustee(parent, planche.N_BOITES_H, planche.N_BOITES_V)
+
         self.longueur_ligne = longueur_ligne
         self.largeur_ligne = self.longueur_ligne / 5
         self.dimension_boite = self.longueur_ligne + self.largeur_ligne
         self.planche = planche
 
+        # Identifiants des rectangles du canvas, par index de ligne et de boîte
+        self.items_lignes = {}
+        self.items_boites = {}
+
         super().__init__(parent,
                          width=self.planche.N_BOITES_V * self.dimension_boite + self.largeur_ligne - 1,
                          height=self.planche.N_BOITES_H * self.dimension_boite + self.largeur_ligne - 1)
@@ -26,7 +63,8 @@ class CanvasPipopipette(Canvas):
             fin_boite_x = debut_boite_x + self.longueur_ligne
             fin_boite_y = debut_boite_y + self.longueur_ligne
 
-            self.create_rectangle(debut_boite_x, debut_boite_y, fin_boite_x, fin_boite_y, tags='boite', fill=boite.couleur_affichage())
+            self.items_boites[position] = self.create_rectangle(debut_boite_x, debut_boite_y, fin_boite_x, fin_boite_y,
+                                                                tags='boite', fill=boite.couleur_affichage())
 
     def dessiner_lignes(self):
         for cle, ligne in self.planche.lignes.items():
@@ -43,13 +81,13 @@ class CanvasPipopipette(Canvas):
                 fin_ligne_x = debut_ligne_x + self.largeur_ligne
                 fin_ligne_y = debut_ligne_y + self.longueur_ligne
 
-            self.create_rectangle(debut_ligne_x,
-                                  debut_ligne_y,
-                                  fin_ligne_x,
-                                  fin_ligne_y,
-                                  tags='ligne',
-                                  fill=ligne.couleur_affichage(),
-                                  width=1)
+            self.items_lignes[cle] = self.create_rectangle(debut_ligne_x,
+                                                           debut_ligne_y,
+                                                           fin_ligne_x,
+                                                           fin_ligne_y,
+                                                           tags='ligne',
+                                                           fill=ligne.couleur_affichage(),
+                                                           width=1)
 
     def dessiner_points(self):
         for col in range(self.planche.N_BOITES_V + 1):
@@ -114,6 +152,22 @@ class CanvasPipopipette(Canvas):
         # On dessine les points
         self.dessiner_points()
 
+    def actualiser_elements(self, index_lignes, index_boites):
+        '''
+        Met à jour la couleur de quelques lignes et boîtes seulement, sans
+        recréer les éléments du canvas. Le canvas doit avoir été dessiné une
+        première fois avec actualiser().
+
+        Args:
+            index_lignes (List[(int, int, str)]): les lignes à mettre à jour
+            index_boites (List[(int, int)]): les boîtes à mettre à jour
+        '''
+        for idx in index_lignes:
+            self.itemconfigure(self.items_lignes[idx], fill=self.planche.lignes[idx].couleur_affichage())
+
+        for idx in index_boites:
+            self.itemconfigure(self.items_boites[idx], fill=self.planche.boites[idx].couleur_affichage())
+
 
 class Fenetre(Tk):
     def __init__(self):
@@ -149,7 +203,10 @@ class Fenetre(Tk):
         coup = self.canvas_planche.obtenir_coup_joue(event)
 
         if coup is not None:
-            self.partie.jouer_coup(coup)
+            try:
+                self.partie.jouer_coup(coup)
+            except pipopipette.exceptions.ErreurClicCoup as e:
+                messagebox.showwarning('Erreur !', e)
 
         self.canvas_planche.actualiser()
 
@@ -161,3 +218,91 @@ class Fenetre(Tk):
                 self.canvas_planche.actualiser()
             else:
                 self.destroy()
+
+
+class FenetreRelecture(Tk):
+    '''
+    Fenêtre de relecture d'une partie enregistrée (voir
+    pipopipette.relecture.Relecture). Le curseur, les flèches gauche et
+    droite et les touches Début et Fin déplacent la position affichée; seules
+    les lignes et les boîtes qui changent sont redessinées.
+    '''
+
+    def __init__(self, relecture, longueur_ligne=None):
+        super().__init__()
+
+        self.resizable(0, 0)
+
+        self.title('Pipopipette - relecture')
+
+        self.relecture = relecture
+        topologie = relecture.topologie
+
+        self.numero_coup = 0
+        self.etat_affiche = relecture.etat_au_coup(0)
+
+        self.canvas_planche = CanvasPipopipette(self,
+                                                pipopipette.planche.Planche(topologie.n_boites_h, topologie.n_boites_v),
+                                                longueur_ligne)
+        self.canvas_planche.actualiser()
+        self.canvas_planche.grid()
+
+        self.curseur = Scale(self, from_=0, to=len(relecture), orient=HORIZONTAL, showvalue=False,
+                             command=lambda valeur: self.aller_au_coup(int(valeur)))
+        self.curseur.grid(sticky='ew')
+
+        self.etiquette = Label(self)
+        self.etiquette.grid()
+        self.actualiser_etiquette()
+
+        self.bind('<Left>', lambda event: self.aller_au_coup(self.numero_coup - 1))
+        self.bind('<Right>', lambda event: self.aller_au_coup(self.numero_coup + 1))
+        self.bind('<Home>', lambda event: self.aller_au_coup(0))
+        self.bind('<End>', lambda event: self.aller_au_coup(len(self.relecture)))
+
+    def aller_au_coup(self, numero_coup):
+        '''
+        Affiche la position après numero_coup coups. La planche et le canvas
+        ne sont mis à jour que pour les lignes et les boîtes qui changent.
+
+        Args:
+            numero_coup (int): le numéro du coup, ramené entre 0 et le
+                nombre de coups de la partie
+        '''
+        numero_coup = max(0, min(numero_coup, len(self.relecture)))
+
+        if numero_coup == self.numero_coup:
+            return
+
+        etat = self.relecture.etat_au_coup(numero_coup)
+        index_lignes, index_boites = self.relecture.differences(self.etat_affiche, etat)
+        planche = self.canvas_planche.planche
+        topologie = self.relecture.topologie
+
+        for idx in index_lignes:
+            planche.lignes[idx].jouee = bool(etat.masque_lignes >> topologie.numeros_lignes[idx] & 1)
+
+        for idx in index_boites:
+            code = etat.couleurs_boites[topologie.numeros_boites[idx]]
+            planche.boites[idx].couleur = Topologie.COULEURS_CODES[code]
+            planche.boites[idx].pleine = code != 0
+
+        self.canvas_planche.actualiser_elements(index_lignes, index_boites)
+
+        self.numero_coup = numero_coup
+        self.etat_affiche = etat
+
+        # Le curseur rappelle aller_au_coup(), qui s'arrête aussitôt.
+        self.curseur.set(numero_coup)
+        self.actualiser_etiquette()
+
+    def actualiser_etiquette(self):
+        bleues, rouges = self.etat_affiche.bilan_boites()
+
+        if self.numero_coup == 0:
+            texte = 'Coup 0 / {}'.format(len(self.relecture))
+        else:
+            coup, couleur = self.relecture.historique[self.numero_coup - 1]
+            texte = 'Coup {} / {} : {} {}'.format(self.numero_coup, len(self.relecture), couleur, coup)
+
+        self.etiquette.configure(text='{}    rouge {} - bleu {}'.format(texte, rouges, bleues))
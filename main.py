@@ -1,5 +1,4 @@
 import interface.interface_pipopipette
-from tkinter import *
 
 if __name__ == '__main__':
     # Main de votre programme. Crée la fenêtre et la fait afficher.
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+Moteur du jeu de pipopipette, sans interface graphique.
+
+Les noms principaux du paquet sont accessibles directement, par exemple
+pipopipette.Planche ou from pipopipette import PartiePipopipette, mais leur
+sous-module n'est importé qu'au premier accès (PEP 562). import pipopipette
+ne coûte donc presque rien, ce qui compte pour les processus de travail
+démarrés à la demande par les pools. L'interface Tk est dans le paquet
+interface.
+'''
+
+import importlib
+
+# Nom exporté -> sous-module qui le définit
+_SOUS_MODULES = {
+    'Boite': 'boite',
+    'Ligne': 'ligne',
+    'Planche': 'planche',
+    'EtatPlanche': 'etat_planche',
+    'DeltaPlanche': 'etat_planche',
+    'Topologie': 'topologie',
+    'obtenir_topologie': 'topologie',
+    'ErreurClicCoup': 'exceptions',
+    'ErreurTypeJoueur': 'exceptions',
+    'Joueur': 'joueur',
+    'JoueurHumain': 'joueur',
+    'JoueurDistant': 'joueur',
+    'JoueurOrdinateur': 'joueur',
+    'JoueurOrdinateurPrudent': 'joueur',
+    'JoueurOrdinateurParfait': 'joueur',
+    'JoueurOrdinateurRecherche': 'joueur',
+    'PartiePipopipette': 'partie',
+    'SimulateurAleatoire': 'simulation',
+    'TableRetrograde': 'retrograde',
+    'ExportateurEntrainement': 'entrainement',
+    'EvaluateurLots': 'evaluateur',
+    'Analyseur': 'analyse',
+    'CacheEvaluations': 'cache_evaluations',
+    'CacheEvaluationsPartage': 'cache_evaluations',
+    'BaseDeParties': 'base_parties',
+    'Instrumentation': 'instrumentation',
+    'Participant': 'tournoi',
+    'Tournoi': 'tournoi',
+    'ServeurPipopipette': 'serveur',
+    'DiffuseurPlanche': 'diffusion',
+}
+
+__all__ = list(_SOUS_MODULES)
+
+
+def __getattr__(nom):
+    sous_module = _SOUS_MODULES.get(nom)
+
+    if sous_module is None:
+        raise AttributeError("module 'pipopipette' has no attribute '{}'".format(nom))
+
+    valeur = getattr(importlib.import_module('pipopipette.' + sous_module), nom)
+    globals()[nom] = valeur
+
+    return valeur
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+'''
+Point d'entrée en ligne de commande, sans interface graphique :
+
+    python -m pipopipette jouer --rouge Humain --bleu Prudent
+    python -m pipopipette simuler --parties 100000 --taille 5 5
+    python -m pipopipette serveur --port 8765
+
+L'interface graphique se lance séparément avec python -m interface (ou
+python main.py). Chaque commande n'importe que les modules dont elle a
+besoin.
+'''
+
+import argparse
+
+from pipopipette.joueur import TYPES_JOUEURS, creer_joueur
+
+
+def entier_positif(valeur):
+    '''
+    Type argparse des options qui doivent être un entier strictement positif.
+    '''
+    try:
+        entier = int(valeur)
+    except ValueError:
+        raise argparse.ArgumentTypeError('entier invalide : {}'.format(valeur))
+
+    if entier <= 0:
+        raise argparse.ArgumentTypeError('doit être strictement positif : {}'.format(valeur))
+
+    return entier
+
+
+def commande_jouer(args):
+    from pipopipette.partie import PartiePipopipette
+
+    partie = PartiePipopipette(joueur_rouge=creer_joueur(args.rouge, 'rouge'),
+                               joueur_bleu=creer_joueur(args.bleu, 'bleu'),
+                               n_boites_h=args.taille[0], n_boites_v=args.taille[1], rng=args.graine)
+    partie.jouer(args.affichage)
+
+
+def commande_simuler(args):
+    from time import perf_counter
+
+    from pipopipette.simulation import jouer_lot
+
+    debut = perf_counter()
+    victoires_rouges, victoires_bleues, nulles = jouer_lot(args.taille[0], args.taille[1], args.parties,
+                                                           args.graine, args.processus)
+    duree = perf_counter() - debut
+
+    print('Parties : {}'.format(args.parties))
+    print('Victoires rouges : {} ({:.2%})'.format(victoires_rouges, victoires_rouges / args.parties))
+    print('Victoires bleues : {} ({:.2%})'.format(victoires_bleues, victoires_bleues / args.parties))
+    print('Parties nulles : {} ({:.2%})'.format(nulles, nulles / args.parties))
+    print('{:.0f} parties par seconde'.format(args.parties / duree))
+
+
+def commande_serveur(args):
+    from pipopipette import serveur
+
+    serveur.main(args.arguments_serveur)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m pipopipette', description='Pipopipette en ligne de commande.')
+    commandes = parser.add_subparsers(dest='commande', required=True)
+
+    jouer = commandes.add_parser('jouer', help='jouer une partie en console')
+    jouer.add_argument('--rouge', choices=TYPES_JOUEURS, default='Humain')
+    jouer.add_argument('--bleu', choices=TYPES_JOUEURS, default='Ordinateur')
+    jouer.add_argument('--taille', type=entier_positif, nargs=2, default=[3, 3], metavar=('N_BOITES_H', 'N_BOITES_V'))
+    jouer.add_argument('--affichage', type=int, default=1,
+                       help='afficher la planche tous les N coups, jamais avec 0')
+    jouer.add_argument('--graine', type=int)
+    jouer.set_defaults(fonction=commande_jouer)
+
+    simuler = commandes.add_parser('simuler', help='simuler des parties aléatoires')
+    simuler.add_argument('--parties', type=entier_positif, default=10000)
+    simuler.add_argument('--taille', type=entier_positif, nargs=2, default=[3, 3], metavar=('N_BOITES_H', 'N_BOITES_V'))
+    simuler.add_argument('--graine', type=int, default=0)
+    simuler.add_argument('--processus', type=entier_positif, default=1,
+                         help='nombre de processus; les résultats ne dépendent pas de ce nombre')
+    simuler.set_defaults(fonction=commande_simuler)
+
+    # Les options du serveur sont analysées par pipopipette.serveur.main().
+    serveur = commandes.add_parser('serveur', add_help=False, help='démarrer le serveur de parties')
+    serveur.set_defaults(fonction=commande_serveur)
+
+    args, reste = parser.parse_known_args(arguments)
+
+    if args.commande == 'serveur':
+        args.arguments_serveur = reste
+    elif reste:
+        parser.error('arguments non reconnus : {}'.format(' '.join(reste)))
+
+    args.fonction(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+'''
+Analyse de positions : évaluation de tous les coups possibles d'une planche.
+
+Pour chaque coup de planche.obtenir_coups_possibles(), l'analyse donne la
+marge de boîtes prédite en fin de partie (boîtes du joueur qui joue moins
+celles de son adversaire, boîtes déjà remplies comprises) et un score entre
+0 et 1 (1 pour une victoire, 0,5 pour une nulle, 0 pour une défaite). Chaque
+évaluation indique comment elle a été obtenue :
+
+    - 'exacte' : recherche complète jusqu'à la fin de la partie, quand il
+      reste assez peu de lignes à jouer. Tous les coups sont évalués par une
+      seule recherche, dont la table de transposition (indexée par le
+      masque des lignes jouées) est partagée entre les coups et conservée
+      d'une analyse à l'autre.
+
+    - 'simulations' : parties aléatoires jouées jusqu'au bout. Les coups
+      sont évalués en lot : chaque ordre aléatoire des lignes restantes est
+      rejoué après chacun des coups possibles, ce qui partage le tirage
+      entre les coups et réduit la variance de leurs différences.
+
+Les analyses sont gardées en cache par position et par joueur (voir
+pipopipette.cache_evaluations).
+'''
+
+import random
+from collections import namedtuple
+
+from pipopipette.cache_evaluations import CacheEvaluations
+from pipopipette.planche import Planche
+from pipopipette.topologie import Topologie
+
+
+class EvaluationCoup(namedtuple('EvaluationCoup', ['coup', 'score', 'marge_predite', 'methode',
+                                                   'profondeur', 'n_simulations'])):
+    '''
+    Évaluation d'un coup.
+
+    Attributs :
+        coup (int, int, str): l'index de la ligne évaluée
+        score (float): le résultat attendu pour le joueur qui joue, entre 0 et 1
+        marge_predite (float): la marge de boîtes prédite en fin de partie
+            pour le joueur qui joue
+        methode (str): 'exacte' ou 'simulations'
+        profondeur (int): le nombre de coups examinés après ce coup
+        n_simulations (int): le nombre de parties simulées, 0 pour une
+            évaluation exacte
+    '''
+    __slots__ = ()
+
+
+def compter_boites_completees(topologie, masque, numero_ligne):
+    '''
+    Compte les boîtes complétées en jouant la ligne numero_ligne, masque
+    incluant déjà cette ligne.
+    '''
+    return len(topologie.boites_completees(masque, numero_ligne))
+
+
+def resoudre(topologie, masque, table):
+    '''
+    Calcule, par une recherche complète, la meilleure marge de boîtes que
+    peut encore obtenir le joueur qui joue à partir du masque de lignes
+    jouées (boîtes déjà remplies exclues).
+
+    Args :
+        topologie (Topologie): la topologie de la planche
+        masque (int): le masque des lignes jouées
+        table (dict): la table de transposition, masque -> marge
+
+    Returns :
+        int: la marge optimale pour le joueur qui joue
+    '''
+    valeur = table.get(masque)
+
+    if valeur is not None:
+        # Une table en mémoire partagée conserve les marges en flottants.
+        return int(valeur)
+
+    libres = topologie.masque_complet & ~masque
+
+    if not libres:
+        return 0
+
+    meilleure = -topologie.n_boites - 1
+
+    while libres:
+        bit = libres & -libres
+        libres ^= bit
+        nouveau = masque | bit
+        n_boites = compter_boites_completees(topologie, nouveau, bit.bit_length() - 1)
+
+        # Le joueur qui complète une boîte rejoue, sinon c'est à l'adversaire.
+        if n_boites:
+            valeur = n_boites + resoudre(topologie, nouveau, table)
+        else:
+            valeur = -resoudre(topologie, nouveau, table)
+
+        if valeur > meilleure:
+            meilleure = valeur
+
+    table[masque] = meilleure
+
+    return meilleure
+
+
+def score_selon_marge(marge):
+    if marge > 0:
+        return 1.0
+    elif marge < 0:
+        return 0.0
+    else:
+        return 0.5
+
+
+class Analyseur:
+    '''
+    Évalue tous les coups possibles d'une position. Voir la documentation
+    du module.
+    '''
+
+    def __init__(self, seuil_exact=14, n_simulations=200, graine=0, cache=None, taille_max_table=2000000,
+                 table_transposition=None):
+        '''
+        Args :
+            seuil_exact (int): nombre maximal de lignes restantes pour une
+                évaluation exacte; au-delà, on passe aux simulations
+            n_simulations (int): le nombre de parties simulées par coup
+            graine (int): la graine des simulations; une même position est
+                toujours évaluée de la même façon
+            cache (CacheEvaluations): le cache des analyses par position, un
+                CacheEvaluations de 100 000 entrées par défaut. Tout objet
+                offrant get() et l'affectation par clé convient.
+            taille_max_table (int): nombre d'entrées au-delà duquel la
+                table de transposition est vidée avant une recherche
+            table_transposition (CacheEvaluationsPartage): si présente, la
+                table de transposition des recherches exactes, à la place
+                d'un dict par taille de planche. Avec un cache partagé, les
+                processus d'un même hôte profitent des positions déjà
+                résolues par les autres. Elle doit être réservée à une seule
+                taille de planche, ses clés étant les masques de lignes.
+        '''
+        self.seuil_exact = seuil_exact
+        self.n_simulations = n_simulations
+        self.graine = graine
+        self.cache = cache if cache is not None else CacheEvaluations(100000)
+        self.taille_max_table = taille_max_table
+        self.table_transposition = table_transposition
+
+        # (n_boites_h, n_boites_v) -> table de transposition de resoudre()
+        self.tables = {}
+
+    def analyser(self, planche, couleur):
+        '''
+        Évalue tous les coups possibles de la planche pour le joueur de la
+        couleur en entrée.
+
+        Args :
+            planche (Planche ou EtatPlanche): la position à analyser
+            couleur (str): la couleur du joueur qui doit jouer
+
+        Returns :
+            dict: coup -> EvaluationCoup, pour chaque coup possible
+        '''
+        etat = planche.obtenir_etat() if hasattr(planche, 'obtenir_etat') else planche
+        cle = (etat, couleur, self.seuil_exact, self.n_simulations)
+
+        evaluations = self.cache.get(cle)
+
+        if evaluations is None:
+            evaluations = self.evaluer(etat, couleur)
+            self.cache[cle] = evaluations
+
+        return evaluations
+
+    def meilleur_coup(self, planche, couleur):
+        '''
+        Returns :
+            (int, int, str): le coup de meilleur score, puis de meilleure marge
+        '''
+        evaluations = self.analyser(planche, couleur)
+
+        return max(evaluations.values(), key=lambda evaluation: (evaluation.score, evaluation.marge_predite)).coup
+
+    def evaluer(self, etat, couleur):
+        topologie = etat.obtenir_topologie()
+        code_joueur = Topologie.CODES_COULEURS[couleur]
+        marge_actuelle = sum(1 if code == code_joueur else -1 for code in etat.couleurs_boites if code != 0)
+
+        libres = [numero for numero in range(topologie.n_lignes) if not etat.masque_lignes >> numero & 1]
+
+        if len(libres) <= self.seuil_exact:
+            return self.evaluer_exact(topologie, etat.masque_lignes, libres, marge_actuelle)
+
+        rng = random.Random('{}:{}:{}'.format(self.graine, etat.hash_canonique(), couleur))
+
+        return self.evaluer_par_simulations(topologie, etat.masque_lignes, libres, marge_actuelle, rng)
+
+    def evaluer_exact(self, topologie, masque, libres, marge_actuelle):
+        evaluations = {}
+
+        if self.table_transposition is not None:
+            table = self.table_transposition
+        else:
+            table = self.tables.setdefault((topologie.n_boites_h, topologie.n_boites_v), {})
+
+            if len(table) > self.taille_max_table:
+                table.clear()
+
+        for numero in libres:
+            nouveau = masque | 1 << numero
+            n_boites = compter_boites_completees(topologie, nouveau, numero)
+
+            if n_boites:
+                marge = marge_actuelle + n_boites + resoudre(topologie, nouveau, table)
+            else:
+                marge = marge_actuelle - resoudre(topologie, nouveau, table)
+
+            coup = topologie.index_lignes[numero]
+            evaluations[coup] = EvaluationCoup(coup, score_selon_marge(marge), marge, 'exacte', len(libres) - 1, 0)
+
+        return evaluations
+
+    def evaluer_par_simulations(self, topologie, masque, libres, marge_actuelle, rng):
+        # Nombre de côtés joués de chaque boîte au départ
+        cotes_depart = bytearray(bin(masque & masque_boite).count('1') for masque_boite in topologie.masques_boites)
+        boites_lignes = topologie.boites_lignes
+
+        sommes_marges = dict.fromkeys(libres, 0)
+        sommes_scores = dict.fromkeys(libres, 0.0)
+
+        for _ in range(self.n_simulations):
+            ordre = rng.sample(libres, len(libres))
+
+            for premier in libres:
+                cotes = cotes_depart[:]
+                # marge du joueur qui joue le premier coup, et +1 si c'est
+                # encore à lui de jouer, -1 sinon
+                marge = 0
+                signe = 1
+
+                for numero in [premier] + [numero for numero in ordre if numero != premier]:
+                    n_boites = 0
+
+                    for numero_boite in boites_lignes[numero]:
+                        cotes[numero_boite] += 1
+
+                        if cotes[numero_boite] == 4:
+                            n_boites += 1
+
+                    if n_boites:
+                        marge += signe * n_boites
+                    else:
+                        signe = -signe
+
+                marge += marge_actuelle
+                sommes_marges[premier] += marge
+                sommes_scores[premier] += score_selon_marge(marge)
+
+        evaluations = {}
+
+        for numero in libres:
+            coup = topologie.index_lignes[numero]
+            evaluations[coup] = EvaluationCoup(coup, sommes_scores[numero] / self.n_simulations,
+                                               sommes_marges[numero] / self.n_simulations,
+                                               'simulations', len(libres) - 1, self.n_simulations)
+
+        return evaluations
+
+    def annoter(self, n_boites_h, n_boites_v, historique):
+        '''
+        Annote une partie enregistrée (voir PartiePipopipette.historique_coups
+        et BaseDeParties.obtenir_partie()) : pour chaque coup, on compare
+        l'évaluation du coup joué à celle du meilleur coup.
+
+        Args :
+            n_boites_h (int): le nombre de rangées de boîtes
+            n_boites_v (int): le nombre de colonnes de boîtes
+            historique (List[((int, int, str), str)]): les (coup, couleur) joués
+
+        Returns :
+            List[(EvaluationCoup, EvaluationCoup)]: pour chaque coup,
+                l'évaluation du coup joué et celle du meilleur coup
+        '''
+        planche = Planche(n_boites_h, n_boites_v)
+        annotations = []
+
+        for coup, couleur in historique:
+            evaluations = self.analyser(planche, couleur)
+            meilleure = max(evaluations.values(), key=lambda evaluation: (evaluation.score, evaluation.marge_predite))
+            annotations.append((evaluations[tuple(coup)], meilleure))
+
+            planche.jouer_coup(tuple(coup), couleur)
+            planche.maj_boites()
+
+        return annotations
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+from pipopipette.topologie import Topologie, obtenir_topologie, hash_position
+
+
+def convertir_chaine_en_historique(chaine):
+    '''
+    Fonction inverse de PartiePipopipette.convertir_historique_en_chaine().
+
+    Args :
+        chaine (str): l'historique au format ligne,colonne,orientation,couleur\\n
+
+    Returns :
+        List[((int, int, str), str)]: la liste des (coup, couleur) joués
+    '''
+    historique = []
+
+    for information_coup in chaine.split('\n'):
+        if information_coup != '':
+            ligne_string, colonne_string, orientation, couleur = information_coup.split(',')
+            historique.append(((int(ligne_string), int(colonne_string), orientation), couleur))
+
+    return historique
+
+
+def parcourir_positions(n_boites_h, n_boites_v, historique):
+    '''
+    Rejoue un historique de coups à partir de la planche vide et donne le
+    hash canonique de chacune des positions traversées, la planche vide
+    incluse.
+
+    Le rejeu se fait directement sur le masque des lignes et les couleurs
+    des boîtes, sans construire de Planche.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        historique (List[((int, int, str), str)]): les (coup, couleur) joués
+
+    Returns :
+        Iterator[(int, int)]: les paires (numero_coup, hash), numero_coup
+            valant 0 pour la planche vide
+    '''
+    topologie = obtenir_topologie(n_boites_h, n_boites_v)
+    masque = 0
+    couleurs = bytearray(topologie.n_boites)
+
+    yield 0, hash_position(n_boites_h, n_boites_v, masque, bytes(couleurs))
+
+    for numero_coup, (coup, couleur) in enumerate(historique, start=1):
+        numero_ligne = topologie.numeros_lignes[tuple(coup)]
+        masque |= 1 << numero_ligne
+
+        for numero_boite in topologie.boites_completees(masque, numero_ligne):
+            couleurs[numero_boite] = Topologie.CODES_COULEURS[couleur]
+
+        yield numero_coup, hash_position(n_boites_h, n_boites_v, masque, bytes(couleurs))
+
+
+class BaseDeParties:
+    '''
+    Base de données SQLite de parties terminées, indexée par le hash
+    canonique (voir Planche.hash_canonique()) de chacune des positions
+    traversées pendant la partie.
+
+    Les requêtes par position (parties passant par une planche, taux de
+    victoire à partir d'une planche) passent par l'index et ne rejouent
+    aucune partie.
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS parties (
+            id INTEGER PRIMARY KEY,
+            n_boites_h INTEGER NOT NULL,
+            n_boites_v INTEGER NOT NULL,
+            type_joueur_rouge TEXT NOT NULL,
+            type_joueur_bleu TEXT NOT NULL,
+            boites_rouges INTEGER NOT NULL,
+            boites_bleues INTEGER NOT NULL,
+            gagnant TEXT NOT NULL,
+            coups TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS positions (
+            hash INTEGER NOT NULL,
+            partie INTEGER NOT NULL REFERENCES parties(id),
+            numero_coup INTEGER NOT NULL,
+            PRIMARY KEY (hash, partie)
+        ) WITHOUT ROWID;
+    '''
+
+    def __init__(self, chemin=':memory:'):
+        '''
+        Ouvre (ou crée) la base de données.
+
+        Args :
+            chemin (str): le chemin du fichier SQLite, ':memory:' pour une
+                base en mémoire
+        '''
+        self.connexion = sqlite3.connect(chemin)
+        self.connexion.executescript(BaseDeParties.SCHEMA)
+
+    def fermer(self):
+        self.connexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def ajouter_partie(self, partie):
+        '''
+        Ajoute une partie terminée à la base, ainsi que toutes les positions
+        par lesquelles elle est passée.
+
+        Args :
+            partie (PartiePipopipette): la partie terminée à ajouter. Son
+                attribut historique_coups doit contenir tous les coups joués
+                depuis la planche vide.
+
+        Returns :
+            int: l'identifiant de la partie dans la base
+        '''
+        with self.connexion:
+            return self._inserer_partie(partie)
+
+    def ajouter_parties(self, parties):
+        '''
+        Ajoute plusieurs parties terminées dans une seule transaction.
+
+        Args :
+            parties (Iterable[PartiePipopipette]): les parties à ajouter
+
+        Returns :
+            List[int]: les identifiants des parties dans la base
+        '''
+        with self.connexion:
+            return [self._inserer_partie(partie) for partie in parties]
+
+    def _inserer_partie(self, partie):
+        assert partie.partie_terminee(), "BaseDeParties: la partie n'est pas terminée."
+
+        planche = partie.planche
+        assert len(partie.historique_coups) == len(planche.lignes), "BaseDeParties: historique de coups incomplet."
+
+        n_boites_bleues, n_boites_rouges = planche.bilan_boites()
+
+        curseur = self.connexion.execute(
+            'INSERT INTO parties (n_boites_h, n_boites_v, type_joueur_rouge, type_joueur_bleu, '
+            'boites_rouges, boites_bleues, gagnant, coups) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (planche.N_BOITES_H, planche.N_BOITES_V,
+             partie.joueur_rouge.obtenir_type_joueur(), partie.joueur_bleu.obtenir_type_joueur(),
+             n_boites_rouges, n_boites_bleues, partie.gagnant_partie,
+             partie.convertir_historique_en_chaine()))
+
+        id_partie = curseur.lastrowid
+
+        self.connexion.executemany(
+            'INSERT INTO positions (hash, partie, numero_coup) VALUES (?, ?, ?)',
+            ((hash_, id_partie, numero_coup) for numero_coup, hash_
+             in parcourir_positions(planche.N_BOITES_H, planche.N_BOITES_V, partie.historique_coups)))
+
+        return id_partie
+
+    def parties_passant_par(self, planche):
+        '''
+        Retourne toutes les parties qui sont passées par l'état de la
+        planche en entrée.
+
+        Args :
+            planche (Planche): la position recherchée
+
+        Returns :
+            List[(int, int)]: les paires (id de la partie, numéro du coup
+                après lequel la position a été atteinte)
+        '''
+        curseur = self.connexion.execute('SELECT partie, numero_coup FROM positions WHERE hash = ? ORDER BY partie',
+                                         (planche.hash_canonique(),))
+
+        return curseur.fetchall()
+
+    def taux_victoire(self, planche, couleur):
+        '''
+        Calcule le taux de victoire de la couleur en entrée parmi les
+        parties passées par l'état de la planche en entrée.
+
+        Le résultat de chaque partie est déduit de ses nombres de boîtes et
+        non de la colonne gagnant, où PartiePipopipette.partie_terminee()
+        inscrit 'bleu' en cas d'égalité : les parties nulles sont comptées
+        à part.
+
+        Args :
+            planche (Planche): la position à partir de laquelle on compte
+            couleur (str): 'rouge' ou 'bleu'
+
+        Returns :
+            float: la proportion de ces parties gagnées par la couleur, None
+                si aucune partie n'est passée par la position
+            float: la proportion de ces parties nulles, None si aucune
+                partie n'est passée par la position
+            int: le nombre de parties passées par la position
+        '''
+        assert couleur in ["bleu", "rouge"], "BaseDeParties: couleur invalide."
+
+        victoire = 'parties.boites_rouges > parties.boites_bleues' if couleur == 'rouge' \
+            else 'parties.boites_bleues > parties.boites_rouges'
+
+        n_parties, n_victoires, n_nulles = self.connexion.execute(
+            'SELECT COUNT(*), SUM({}), SUM(parties.boites_rouges = parties.boites_bleues) FROM positions '
+            'JOIN parties ON parties.id = positions.partie WHERE positions.hash = ?'.format(victoire),
+            (planche.hash_canonique(),)).fetchone()
+
+        if n_parties == 0:
+            return None, None, 0
+
+        return n_victoires / n_parties, n_nulles / n_parties, n_parties
+
+    def obtenir_partie(self, id_partie):
+        '''
+        Retourne les informations d'une partie de la base.
+
+        Args :
+            id_partie (int): l'identifiant de la partie
+
+        Returns :
+            dict: les colonnes de la partie, la clé 'coups' contenant
+                l'historique sous forme de liste de (coup, couleur). None si
+                la partie n'existe pas.
+        '''
+        curseur = self.connexion.execute('SELECT * FROM parties WHERE id = ?', (id_partie,))
+        rangee = curseur.fetchone()
+
+        if rangee is None:
+            return None
+
+        partie = dict(zip([description[0] for description in curseur.description], rangee))
+        partie['coups'] = convertir_chaine_en_historique(partie['coups'])
+
+        return partie
+
+    def __len__(self):
+        return self.connexion.execute('SELECT COUNT(*) FROM parties').fetchone()[0]
@@ -20,6 +20,17 @@ class Boite:
         self.couleur = couleur
         self.pleine = True
 
+    def copier(self):
+        '''
+        Retourne une nouvelle boîte dans le même état, sans repasser par
+        le constructeur.
+        '''
+        copie = Boite.__new__(Boite)
+        copie.couleur = self.couleur
+        copie.pleine = self.pleine
+
+        return copie
+
     def couleur_formattee(self):
         '''
         Nécessaire pour l'affichage en console, NE PAS MODIFIER.
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+'''
+Caches bornés d'évaluations de positions, partagés entre les parties.
+
+    - CacheEvaluations : cache LRU en mémoire, protégé par un verrou pour être
+      partagé entre les fils d'exécution d'un processus. Les valeurs peuvent
+      être n'importe quel objet.
+
+    - CacheEvaluationsPartage : cache en mémoire partagée
+      (multiprocessing.shared_memory), utilisable par tous les processus
+      d'un hôte. Les valeurs sont des nombres à virgule flottante, et
+      l'éviction suit l'algorithme CLOCK dans chaque ensemble d'une table
+      associative par ensembles.
+
+Les deux caches offrent la même interface : get() et l'affectation par clé
+pour des clés quelconques (entières pour le cache partagé), obtenir() et
+ajouter() pour des clés Planche ou EtatPlanche, remplacées par leur hash
+canonique, ainsi que statistiques() pour le taux de succès.
+'''
+
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+
+# Le cache partagé reçu par initialiser_processus()
+cache_du_processus = None
+
+
+def statistiques_cache(succes, echecs, evictions, taille, capacite):
+    total = succes + echecs
+
+    return {
+        'succes': succes,
+        'echecs': echecs,
+        'taux_succes': succes / total if total else None,
+        'evictions': evictions,
+        'taille': taille,
+        'capacite': capacite,
+    }
+
+
+def initialiser_processus(cache):
+    '''
+    Initialiseur de pool de processus qui rend un cache partagé disponible
+    dans pipopipette.cache_evaluations.cache_du_processus.
+    '''
+    global cache_du_processus
+    cache_du_processus = cache
+
+
+class CacheEvaluations:
+    '''
+    Cache LRU borné et sûr entre fils d'exécution. Voir la documentation du
+    module.
+    '''
+
+    def __init__(self, capacite=100000):
+        '''
+        Args :
+            capacite (int): le nombre maximal d'entrées
+        '''
+        assert capacite > 0, 'CacheEvaluations: capacité invalide.'
+
+        self.capacite = capacite
+        self.entrees = OrderedDict()
+        self.verrou = threading.Lock()
+
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+
+    def get(self, cle, defaut=None):
+        with self.verrou:
+            try:
+                valeur = self.entrees[cle]
+            except KeyError:
+                self.echecs += 1
+                return defaut
+
+            self.entrees.move_to_end(cle)
+            self.succes += 1
+
+            return valeur
+
+    def __setitem__(self, cle, valeur):
+        with self.verrou:
+            self.entrees[cle] = valeur
+            self.entrees.move_to_end(cle)
+
+            if len(self.entrees) > self.capacite:
+                self.entrees.popitem(last=False)
+                self.evictions += 1
+
+    def obtenir(self, planche, defaut=None):
+        '''
+        Args :
+            planche (Planche ou EtatPlanche): la position recherchée
+
+        Returns :
+            la valeur associée à la position, defaut si elle est absente
+        '''
+        return self.get(planche.hash_canonique(), defaut)
+
+    def ajouter(self, planche, valeur):
+        self[planche.hash_canonique()] = valeur
+
+    def __contains__(self, cle):
+        with self.verrou:
+            return cle in self.entrees
+
+    def __len__(self):
+        return len(self.entrees)
+
+    def vider(self):
+        with self.verrou:
+            self.entrees.clear()
+
+    def statistiques(self):
+        '''
+        Returns :
+            dict: succès, échecs, taux de succès, évictions, taille et capacité
+        '''
+        with self.verrou:
+            return statistiques_cache(self.succes, self.echecs, self.evictions, len(self.entrees), self.capacite)
+
+
+class CacheEvaluationsPartage:
+    '''
+    Cache d'évaluations en mémoire partagée entre processus. Voir la
+    documentation du module.
+
+    Le processus qui crée le cache en est propriétaire et doit appeler
+    detruire() quand il n'en a plus besoin. Les autres processus s'y
+    rattachent en recevant l'objet à leur création, le verrou ne pouvant
+    être transmis que par héritage : par exemple avec
+    ProcessPoolExecutor(initializer=initialiser_processus, initargs=(cache,)),
+    après quoi les tâches trouvent le cache dans cache_du_processus.
+
+    La mémoire est organisée ainsi :
+
+        - un en-tête de quatre entiers de 64 bits : succès, échecs,
+          évictions et nombre d'entrées
+        - les clés (entiers signés de 64 bits)
+        - les valeurs (flottants de 64 bits)
+        - les bits de référence de CLOCK (un octet par case)
+        - les marques d'occupation (un octet par case, 0 pour une case vide)
+        - l'aiguille de CLOCK de chaque ensemble (un octet par ensemble)
+    '''
+    N_ENTETE = 4
+
+    def __init__(self, capacite=1 << 20, voies=8, nom=None, verrou=None, _creer=True):
+        '''
+        Crée un nouveau cache partagé.
+
+        Args :
+            capacite (int): le nombre d'entrées, arrondi au multiple de voies
+                supérieur
+            voies (int): le nombre d'entrées par ensemble, au plus 255
+            nom (str): le nom du segment de mémoire partagée, choisi par le
+                système si None
+            verrou (multiprocessing.Lock): le verrou partagé, créé si None
+        '''
+        assert 0 < voies < 256, 'CacheEvaluationsPartage: nombre de voies invalide.'
+
+        # multiprocessing n'est importé que pour le cache partagé, pour ne
+        # pas ralentir le démarrage des processus qui n'utilisent que
+        # CacheEvaluations.
+        from multiprocessing import Lock
+        from multiprocessing.shared_memory import SharedMemory
+
+        self.voies = voies
+        self.n_ensembles = -(-capacite // voies)
+        self.capacite = self.n_ensembles * voies
+        self.verrou = verrou if verrou is not None else Lock()
+
+        taille = 8 * CacheEvaluationsPartage.N_ENTETE + 18 * self.capacite + self.n_ensembles
+
+        if _creer:
+            self.memoire = SharedMemory(name=nom, create=True, size=taille)
+            self.memoire.buf[:taille] = bytes(taille)
+        else:
+            self.memoire = SharedMemory(name=nom)
+
+        self.proprietaire = _creer
+        self._projeter()
+
+    @classmethod
+    def rattacher(cls, nom, verrou, capacite, voies=8):
+        '''
+        Se rattache à un cache créé par un autre processus.
+
+        Args :
+            nom (str): le nom du segment (attribut nom du cache d'origine)
+            verrou (multiprocessing.Lock): le verrou du cache d'origine
+            capacite (int), voies (int): les mêmes que pour le cache d'origine
+
+        Returns :
+            CacheEvaluationsPartage: le cache
+        '''
+        return cls(capacite, voies, nom, verrou, _creer=False)
+
+    @property
+    def nom(self):
+        return self.memoire.name
+
+    def _projeter(self):
+        buf = self.memoire.buf
+        debut_cles = 8 * CacheEvaluationsPartage.N_ENTETE
+        debut_valeurs = debut_cles + 8 * self.capacite
+        debut_references = debut_valeurs + 8 * self.capacite
+        debut_occupees = debut_references + self.capacite
+        debut_aiguilles = debut_occupees + self.capacite
+
+        self.entete = buf[:debut_cles].cast('q')
+        self.cles = buf[debut_cles:debut_valeurs].cast('q')
+        self.valeurs = buf[debut_valeurs:debut_references].cast('d')
+        self.references = buf[debut_references:debut_occupees]
+        self.occupees = buf[debut_occupees:debut_aiguilles]
+        self.aiguilles = buf[debut_aiguilles:debut_aiguilles + self.n_ensembles]
+
+    def __getstate__(self):
+        return {'voies': self.voies, 'capacite': self.capacite, 'nom': self.nom, 'verrou': self.verrou}
+
+    def __setstate__(self, etat):
+        self.__init__(etat['capacite'], etat['voies'], etat['nom'], etat['verrou'], _creer=False)
+
+    @staticmethod
+    def normaliser_cle(cle):
+        '''
+        Ramène une clé entière à un entier signé de 64 bits. Les clés qui y
+        tiennent sont conservées telles quelles; les autres sont hachées.
+        '''
+        if not -(1 << 63) <= cle < 1 << 63:
+            cle = struct.unpack('<q', hashlib.blake2b(cle.to_bytes((cle.bit_length() + 8) // 8, 'little', signed=True),
+                                                      digest_size=8).digest())[0]
+
+        return cle
+
+    def _trouver(self, cle):
+        # Les clés peuvent être des masques de lignes, dont les bits de poids
+        # faible se répètent d'une position à l'autre : elles sont mélangées
+        # (hachage de Fibonacci) avant le choix de l'ensemble.
+        debut = (((cle * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % self.n_ensembles * self.voies
+
+        for case in range(debut, debut + self.voies):
+            if self.occupees[case] and self.cles[case] == cle:
+                return debut, case
+
+        return debut, None
+
+    def get(self, cle, defaut=None):
+        cle = CacheEvaluationsPartage.normaliser_cle(cle)
+
+        with self.verrou:
+            _, case = self._trouver(cle)
+
+            if case is None:
+                self.entete[1] += 1
+                return defaut
+
+            self.references[case] = 1
+            self.entete[0] += 1
+
+            return self.valeurs[case]
+
+    def __setitem__(self, cle, valeur):
+        cle = CacheEvaluationsPartage.normaliser_cle(cle)
+
+        with self.verrou:
+            debut, case = self._trouver(cle)
+
+            if case is None:
+                case = self._choisir_case(debut)
+                self.cles[case] = cle
+                self.occupees[case] = 1
+
+            self.valeurs[case] = valeur
+            self.references[case] = 1
+
+    def _choisir_case(self, debut):
+        # Une case vide s'il y en a une, sinon la première case sans bit de
+        # référence à partir de l'aiguille, en effaçant les bits au passage.
+        for case in range(debut, debut + self.voies):
+            if not self.occupees[case]:
+                self.entete[3] += 1
+                return case
+
+        ensemble = debut // self.voies
+        aiguille = self.aiguilles[ensemble]
+
+        while self.references[debut + aiguille]:
+            self.references[debut + aiguille] = 0
+            aiguille = (aiguille + 1) % self.voies
+
+        self.aiguilles[ensemble] = (aiguille + 1) % self.voies
+        self.entete[2] += 1
+
+        return debut + aiguille
+
+    def obtenir(self, planche, defaut=None):
+        return self.get(planche.hash_canonique(), defaut)
+
+    def ajouter(self, planche, valeur):
+        self[planche.hash_canonique()] = valeur
+
+    def __contains__(self, cle):
+        cle = CacheEvaluationsPartage.normaliser_cle(cle)
+
+        with self.verrou:
+            return self._trouver(cle)[1] is not None
+
+    def __len__(self):
+        return self.entete[3]
+
+    def statistiques(self):
+        with self.verrou:
+            return statistiques_cache(self.entete[0], self.entete[1], self.entete[2], self.entete[3], self.capacite)
+
+    def fermer(self):
+        '''
+        Détache ce processus du segment de mémoire partagée.
+        '''
+        for vue in [self.entete, self.cles, self.valeurs, self.references, self.occupees, self.aiguilles]:
+            vue.release()
+
+        self.memoire.close()
+
+    def detruire(self):
+        '''
+        Détache ce processus et supprime le segment. Réservé au processus
+        qui a créé le cache.
+        '''
+        self.fermer()
+
+        if self.proprietaire:
+            self.memoire.unlink()
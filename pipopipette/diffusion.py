@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+'''
+Diffusion d'une planche à ses spectateurs par deltas.
+
+Envoyer toute la planche (convertir_en_chaine()) à chaque spectateur après
+chaque coup coûte une sérialisation et O(taille de la planche) octets par
+spectateur et par coup. DiffuseurPlanche s'abonne plutôt au flux des
+changements de la planche (voir Planche.abonner()) : chaque coup devient un
+delta de quelques dizaines d'octets, sérialisé une seule fois, et les mêmes
+octets sont écrits à tous les spectateurs. Un spectateur qui arrive en cours
+de partie reçoit d'abord un instantané, puis les deltas suivants.
+
+Les messages sont des lignes JSON, comme pour le serveur de parties (voir
+pipopipette.serveur). Les lignes et les boîtes y sont désignées par leur
+numéro dans la topologie (voir Topologie) :
+
+    {"type": "etat", "sequence": 11, "n_boites_h": 3, "n_boites_v": 3,
+     "lignes": 1234567, "boites": "000100020000000000"}
+    {"type": "coup", "sequence": 12, "ligne": 17, "couleur": "rouge",
+     "boites": [4]}
+    {"type": "fin", "sequence": 12}
+
+lignes est le masque des lignes jouées et boites, les codes de couleur des
+boîtes en hexadécimal (EtatPlanche.masque_lignes et couleurs_boites). Les
+numéros de séquence se suivent : un delta s'applique à l'état de numéro
+précédent. Le message "fin" annonce que la diffusion est terminée, par
+exemple parce que la partie a été quittée : le spectateur ne recevra plus
+rien. VuePlanche reconstruit la planche côté spectateur.
+'''
+
+import json
+
+from pipopipette.etat_planche import EtatPlanche
+from pipopipette.planche import Planche
+
+
+def encoder_etat(etat, sequence, entete=None):
+    '''
+    Returns :
+        bytes: la ligne JSON de l'instantané etat
+    '''
+    message = dict(entete or {})
+    message.update({'type': 'etat', 'sequence': sequence, 'n_boites_h': etat.n_boites_h,
+                    'n_boites_v': etat.n_boites_v, 'lignes': etat.masque_lignes,
+                    'boites': etat.couleurs_boites.hex()})
+
+    return json.dumps(message).encode() + b'\n'
+
+
+def encoder_delta(delta, topologie, entete=None):
+    '''
+    Returns :
+        bytes: la ligne JSON du DeltaPlanche delta
+    '''
+    message = dict(entete or {})
+    message.update({'type': 'coup', 'sequence': delta.sequence, 'ligne': topologie.numeros_lignes[delta.ligne],
+                    'couleur': delta.couleur, 'boites': [topologie.numeros_boites[idx] for idx in delta.boites]})
+
+    return json.dumps(message).encode() + b'\n'
+
+
+def encoder_fin(sequence, entete=None):
+    '''
+    Returns :
+        bytes: la ligne JSON annonçant la fin de la diffusion
+    '''
+    message = dict(entete or {})
+    message.update({'type': 'fin', 'sequence': sequence})
+
+    return json.dumps(message).encode() + b'\n'
+
+
+class DiffuseurPlanche:
+    '''
+    Diffuse les changements d'une planche à des spectateurs. Voir la
+    documentation du module.
+
+    Un spectateur est un objet qui a une méthode write(bytes), typiquement
+    l'asyncio.StreamWriter de sa connexion. Les spectateurs trop lents, dont
+    le tampon d'écriture dépasse taille_tampon_max octets, sont fermés et
+    retirés : ils peuvent se reconnecter et recevoir un nouvel instantané.
+    '''
+
+    def __init__(self, planche, entete=None, taille_tampon_max=1 << 20):
+        '''
+        Args :
+            planche (Planche): la planche à diffuser
+            entete (dict): des champs ajoutés à chaque message, par exemple
+                l'identifiant de la partie
+            taille_tampon_max (int): la taille maximale du tampon d'écriture
+                d'un spectateur, en octets
+        '''
+        self.planche = planche
+        self.topologie = planche.obtenir_topologie()
+        self.entete = entete
+        self.taille_tampon_max = taille_tampon_max
+        # Les écrivains des spectateurs, dans leur ordre d'arrivée (un dict
+        # plutôt qu'une liste pour ajouter et retirer en temps constant)
+        self.spectateurs = {}
+
+        # Dernier instantané sérialisé, partagé par les spectateurs qui
+        # arrivent entre deux coups : (numéro de séquence, octets)
+        self.instantane = None
+
+        # Statistiques : messages sérialisés et octets écrits
+        self.n_messages = 0
+        self.n_octets_envoyes = 0
+
+        planche.abonner(self.recevoir)
+
+    def obtenir_instantane(self):
+        sequence = self.planche.numero_sequence
+
+        if self.instantane is None or self.instantane[0] != sequence:
+            self.instantane = sequence, encoder_etat(self.planche.obtenir_etat(), sequence, self.entete)
+            self.n_messages += 1
+
+        return self.instantane[1]
+
+    def ajouter_spectateur(self, ecrivain):
+        '''
+        Envoie l'instantané de la planche au spectateur, puis lui enverra
+        chaque delta. Un spectateur déjà abonné n'est pas ajouté une
+        seconde fois : il reçoit seulement un nouvel instantané.
+        '''
+        self.spectateurs[ecrivain] = None
+
+        self.envoyer(ecrivain, self.obtenir_instantane())
+
+    def retirer_spectateur(self, ecrivain):
+        self.spectateurs.pop(ecrivain, None)
+
+    def recevoir(self, delta):
+        '''
+        Fonction abonnée à la planche : sérialise le changement une seule
+        fois et l'envoie à tous les spectateurs. Après un chargement (delta
+        à None), les spectateurs reçoivent un nouvel instantané.
+        '''
+        if not self.spectateurs:
+            return
+
+        if delta is None:
+            message = self.obtenir_instantane()
+        else:
+            message = encoder_delta(delta, self.topologie, self.entete)
+            self.n_messages += 1
+
+        for ecrivain in list(self.spectateurs):
+            self.envoyer(ecrivain, message)
+
+    def envoyer(self, ecrivain, message):
+        ecrivain.write(message)
+        self.n_octets_envoyes += len(message)
+
+        transport = getattr(ecrivain, 'transport', None)
+
+        if transport is not None and transport.get_write_buffer_size() > self.taille_tampon_max:
+            self.retirer_spectateur(ecrivain)
+            ecrivain.close()
+
+    def fermer(self):
+        '''
+        Annonce la fin de la diffusion aux spectateurs, désabonne le
+        diffuseur de la planche et oublie les spectateurs.
+        '''
+        self.planche.desabonner(self.recevoir)
+
+        if self.spectateurs:
+            message = encoder_fin(self.planche.numero_sequence, self.entete)
+            self.n_messages += 1
+
+            for ecrivain in list(self.spectateurs):
+                self.envoyer(ecrivain, message)
+
+        self.spectateurs = {}
+
+
+class VuePlanche:
+    '''
+    Planche d'un spectateur, tenue à jour à partir des messages d'un
+    DiffuseurPlanche.
+    '''
+
+    def __init__(self):
+        self.planche = None
+        self.sequence = None
+
+        # Vrai après le message "fin" du diffuseur
+        self.terminee = False
+
+    def appliquer(self, message):
+        '''
+        Applique un message décodé : instantané, delta ou fin.
+
+        Args :
+            message (dict): le message
+
+        Returns :
+            Planche: la planche du spectateur après le message
+        '''
+        if message['type'] == 'etat':
+            etat = EtatPlanche(message['n_boites_h'], message['n_boites_v'], message['lignes'],
+                               bytes.fromhex(message['boites']))
+            self.planche = Planche.depuis_etat(etat)
+        elif message['type'] == 'fin':
+            self.terminee = True
+            return self.planche
+        else:
+            assert self.planche is not None and message['sequence'] == self.sequence + 1, \
+                'VuePlanche: delta hors séquence.'
+
+            topologie = self.planche.obtenir_topologie()
+            self.planche.jouer_coup(topologie.index_lignes[message['ligne']], message['couleur'])
+
+            for numero_boite in message['boites']:
+                self.planche.boites[topologie.index_boites[numero_boite]].assigner_couleur(message['couleur'])
+
+        self.sequence = message['sequence']
+        self.planche.numero_sequence = self.sequence
+
+        return self.planche
@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+'''
+Parties ordinateur contre ordinateur réparties sur plusieurs machines.
+
+Un coordinateur découpe un lot de parties en travaux et les distribue à des
+travailleurs connectés par TCP. Comme pour le serveur de parties (voir
+pipopipette.serveur), le protocole est une suite de lignes JSON, une réponse
+par requête. Les requêtes des travailleurs sont :
+
+    {"commande": "demander"}
+    {"commande": "resultat", "travail": 3, "resultat": {...}}
+
+Un travail décrit tout ce qu'il faut pour jouer ses parties :
+
+    {"travail": 3, "n_boites_h": 3, "n_boites_v": 3, "rouge": "Prudent",
+     "bleu": "Ordinateur", "graine": 0, "premiere_partie": 300,
+     "n_parties": 100}
+
+La partie numéro i du lot utilise le flux GenerateurCompteur(graine, i)
+(voir pipopipette.hasard) : les résultats ne dépendent ni du nombre de
+travailleurs ni de celui qui joue chaque travail. Un travailleur ne renvoie
+que le bilan de ses parties (victoires, parties nulles et boîtes de chaque
+couleur), que le coordinateur additionne.
+
+Un travail est redistribué quand la connexion de son travailleur se ferme
+avant le résultat, ou quand il n'est pas revenu après delai secondes et
+qu'un autre travailleur attend du travail. Le premier résultat reçu est
+gardé, les suivants sont ignorés; une connexion ne peut rendre que les
+travaux qui lui ont été distribués. Au-delà de max_tentatives distributions,
+le lot échoue avec ErreurTravail, de même que lorsque tous les travailleurs
+locaux se sont arrêtés avant la fin sans qu'un autre soit connecté.
+
+Pour tout lancer sur une seule machine, avec quatre travailleurs locaux :
+
+    python -m pipopipette.distribue coordinateur --parties 100000 --travailleurs-locaux 4
+
+et pour ajouter un travailleur depuis une autre machine :
+
+    python -m pipopipette.distribue travailleur --hote coordinateur.local
+'''
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+from time import monotonic, perf_counter
+
+from pipopipette.hasard import GenerateurCompteur
+from pipopipette import joueur
+from pipopipette.joueur import creer_joueur
+
+# Les parties distribuées opposent des joueurs ordinateurs qui se créent à
+# partir de leur seule couleur.
+TYPES_JOUEURS = [type_joueur for type_joueur in joueur.TYPES_JOUEURS if type_joueur != 'Humain']
+
+CHAMPS_RESULTAT = ['victoires_rouges', 'victoires_bleues', 'nulles', 'boites_rouges', 'boites_bleues']
+
+
+class ErreurTravail(Exception):
+    '''
+    Une exception indiquant qu'un travail a échoué trop de fois.
+    '''
+    pass
+
+
+def decouper_travaux(n_boites_h, n_boites_v, rouge, bleu, n_parties, graine=0, taille_travail=100):
+    '''
+    Découpe un lot de parties en travaux d'au plus taille_travail parties.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        rouge (str): le type du joueur rouge, parmi TYPES_JOUEURS
+        bleu (str): le type du joueur bleu, parmi TYPES_JOUEURS
+        n_parties (int): le nombre de parties du lot
+        graine (int): la graine du lot
+        taille_travail (int): le nombre maximal de parties par travail
+
+    Returns :
+        List[dict]: les travaux
+    '''
+    assert rouge in TYPES_JOUEURS and bleu in TYPES_JOUEURS, 'decouper_travaux: type de joueur invalide.'
+
+    return [{'travail': numero, 'n_boites_h': n_boites_h, 'n_boites_v': n_boites_v, 'rouge': rouge, 'bleu': bleu,
+             'graine': graine, 'premiere_partie': debut, 'n_parties': min(taille_travail, n_parties - debut)}
+            for numero, debut in enumerate(range(0, n_parties, taille_travail))]
+
+
+def jouer_travail(travail):
+    '''
+    Joue les parties d'un travail, sans affichage.
+
+    Returns :
+        dict: le bilan des parties, avec les champs de CHAMPS_RESULTAT
+    '''
+    from pipopipette.partie import PartiePipopipette
+
+    resultat = dict.fromkeys(CHAMPS_RESULTAT, 0)
+    debut = travail['premiere_partie']
+
+    for numero_partie in range(debut, debut + travail['n_parties']):
+        partie = PartiePipopipette(joueur_rouge=creer_joueur(travail['rouge'], 'rouge'),
+                                   joueur_bleu=creer_joueur(travail['bleu'], 'bleu'),
+                                   n_boites_h=travail['n_boites_h'], n_boites_v=travail['n_boites_v'],
+                                   rng=GenerateurCompteur(travail['graine'], numero_partie))
+
+        while not partie.partie_terminee():
+            partie.jouer_coup(partie.demander_coup())
+
+        n_boites_bleues, n_boites_rouges = partie.planche.bilan_boites()
+
+        resultat['boites_rouges'] += n_boites_rouges
+        resultat['boites_bleues'] += n_boites_bleues
+
+        if n_boites_rouges > n_boites_bleues:
+            resultat['victoires_rouges'] += 1
+        elif n_boites_bleues > n_boites_rouges:
+            resultat['victoires_bleues'] += 1
+        else:
+            resultat['nulles'] += 1
+
+    return resultat
+
+
+class Coordinateur:
+    '''
+    Distribue les travaux d'un lot aux travailleurs et additionne leurs
+    résultats. Voir la documentation du module.
+    '''
+
+    def __init__(self, travaux, delai=300, max_tentatives=3):
+        '''
+        Args :
+            travaux (List[dict]): les travaux, voir decouper_travaux()
+            delai (float): le nombre de secondes après lequel un travail
+                sans résultat peut être redistribué
+            max_tentatives (int): le nombre maximal de distributions d'un
+                travail
+        '''
+        self.travaux = {travail['travail']: travail for travail in travaux}
+        self.delai = delai
+        self.max_tentatives = max_tentatives
+
+        self.en_attente = list(self.travaux)
+        self.en_cours = {}
+        self.tentatives = dict.fromkeys(self.travaux, 0)
+        self.resultats = {}
+
+        self.resultat_total = dict.fromkeys(CHAMPS_RESULTAT, 0)
+        self.termine = asyncio.Event()
+        self.erreur = None
+
+        # Tâches des connexions ouvertes, par écrivain
+        self.connexions = {}
+
+        if not self.travaux:
+            self.termine.set()
+
+    async def traiter_requete(self, requete, travaux_connexion):
+        '''
+        Traite une requête déjà décodée d'un travailleur.
+
+        Args :
+            requete (dict): la requête
+            travaux_connexion (set): les travaux distribués à cette
+                connexion et encore sans résultat
+
+        Returns :
+            dict: la réponse
+        '''
+        commande = requete.get('commande') if isinstance(requete, dict) else None
+
+        if commande == 'demander':
+            travail = self.distribuer()
+
+            if travail is not None:
+                travaux_connexion.add(travail['travail'])
+                return {'ok': True, 'travail': travail}
+
+            # Plus rien à distribuer : le travailleur attend les travaux qui
+            # pourraient être redistribués, ou s'arrête si tout est fini.
+            return {'ok': True, 'travail': None, 'fin': self.termine.is_set(), 'attendre': min(1.0, self.delai)}
+
+        if commande == 'resultat':
+            numero = requete.get('travail')
+
+            if numero not in self.travaux:
+                return {'ok': False, 'erreur': 'Travail inconnu : {}'.format(numero)}
+
+            if numero not in travaux_connexion:
+                return {'ok': False, 'erreur': "Le travail {} n'a pas été distribué à cette connexion.".format(numero)}
+
+            travaux_connexion.discard(numero)
+            self.enregistrer(numero, requete.get('resultat'))
+
+            return {'ok': True}
+
+        return {'ok': False, 'erreur': 'Commande inconnue : {}'.format(commande)}
+
+    def distribuer(self):
+        '''
+        Returns :
+            dict: le prochain travail à faire, ou None s'il n'y en a pas
+        '''
+        if not self.en_attente:
+            # Les travaux en retard sont redistribués aux travailleurs libres.
+            maintenant = monotonic()
+            self.en_attente.extend(numero for numero, debut in self.en_cours.items()
+                                   if maintenant - debut > self.delai)
+
+            for numero in self.en_attente:
+                del self.en_cours[numero]
+
+        while self.en_attente:
+            numero = self.en_attente.pop(0)
+
+            if numero in self.resultats:
+                continue
+
+            if self.tentatives[numero] >= self.max_tentatives:
+                self.echouer(ErreurTravail('Le travail {} a échoué {} fois.'.format(numero, self.tentatives[numero])))
+                return None
+
+            self.tentatives[numero] += 1
+            self.en_cours[numero] = monotonic()
+
+            return self.travaux[numero]
+
+        return None
+
+    def liberer(self, travaux_connexion):
+        '''
+        Remet en attente les travaux d'une connexion fermée avant leur
+        résultat.
+        '''
+        for numero in travaux_connexion:
+            if numero not in self.resultats and self.en_cours.pop(numero, None) is not None:
+                self.en_attente.append(numero)
+
+        travaux_connexion.clear()
+
+    def enregistrer(self, numero, resultat):
+        valeurs = [int(resultat[champ]) for champ in CHAMPS_RESULTAT]
+
+        if numero in self.resultats:
+            return
+
+        self.en_cours.pop(numero, None)
+        self.resultats[numero] = resultat
+
+        for champ, valeur in zip(CHAMPS_RESULTAT, valeurs):
+            self.resultat_total[champ] += valeur
+
+        if len(self.resultats) == len(self.travaux):
+            self.termine.set()
+
+    def echouer(self, erreur):
+        self.erreur = erreur
+        self.termine.set()
+
+    async def gerer_connexion(self, lecteur, ecrivain):
+        '''
+        Traite les requêtes d'un travailleur jusqu'à la fermeture de sa
+        connexion, puis redistribue les travaux qu'il n'a pas terminés.
+        '''
+        travaux_connexion = set()
+        self.connexions[ecrivain] = asyncio.current_task()
+
+        try:
+            while True:
+                ligne = await lecteur.readline()
+
+                if not ligne:
+                    break
+
+                try:
+                    reponse = await self.traiter_requete(json.loads(ligne), travaux_connexion)
+                except (ValueError, KeyError, TypeError):
+                    reponse = {'ok': False, 'erreur': 'Requête invalide.'}
+
+                ecrivain.write(json.dumps(reponse).encode() + b'\n')
+                await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connexions[ecrivain]
+            self.liberer(travaux_connexion)
+            ecrivain.close()
+
+    async def demarrer_tcp(self, hote='127.0.0.1', port=8766):
+        '''
+        Returns :
+            asyncio.Server: le serveur TCP, déjà à l'écoute
+        '''
+        return await asyncio.start_server(self.gerer_connexion, hote, port)
+
+    async def attendre(self):
+        '''
+        Attend la fin du lot.
+
+        Returns :
+            dict: le bilan de toutes les parties du lot
+        '''
+        await self.termine.wait()
+
+        if self.erreur is not None:
+            raise self.erreur
+
+        return dict(self.resultat_total)
+
+    async def fermer(self):
+        '''
+        Ferme les connexions encore ouvertes et attend la fin de leur
+        traitement.
+        '''
+        taches = list(self.connexions.values())
+
+        for ecrivain in list(self.connexions):
+            ecrivain.close()
+
+        await asyncio.gather(*taches, return_exceptions=True)
+
+
+async def travailler(hote='127.0.0.1', port=8766, n_connexions_max=10):
+    '''
+    Boucle d'un travailleur : demande des travaux au coordinateur et les joue
+    jusqu'à ce qu'il n'y en ait plus. Les parties sont jouées dans un thread
+    pour que la connexion reste servie pendant ce temps.
+
+    Args :
+        hote (str): l'adresse du coordinateur
+        port (int): le port du coordinateur
+        n_connexions_max (int): le nombre de tentatives de connexion, une par
+            seconde, avant d'abandonner
+
+    Returns :
+        int: le nombre de travaux joués
+    '''
+    for tentative in range(n_connexions_max):
+        try:
+            lecteur, ecrivain = await asyncio.open_connection(hote, port)
+            break
+        except OSError:
+            if tentative == n_connexions_max - 1:
+                raise
+
+            await asyncio.sleep(1)
+
+    n_travaux = 0
+
+    async def envoyer(**requete):
+        ecrivain.write(json.dumps(requete).encode() + b'\n')
+        await ecrivain.drain()
+        ligne = await lecteur.readline()
+
+        if not ligne:
+            raise ConnectionError('Le coordinateur a fermé la connexion.')
+
+        return json.loads(ligne)
+
+    try:
+        while True:
+            reponse = await envoyer(commande='demander')
+            travail = reponse.get('travail')
+
+            if travail is None:
+                if reponse.get('fin'):
+                    break
+
+                await asyncio.sleep(reponse.get('attendre', 1))
+                continue
+
+            resultat = await asyncio.get_running_loop().run_in_executor(None, jouer_travail, travail)
+            await envoyer(commande='resultat', travail=travail['travail'], resultat=resultat)
+            n_travaux += 1
+    except ConnectionError:
+        # Le coordinateur s'est arrêté : ses travaux sont terminés ou perdus.
+        pass
+    finally:
+        ecrivain.close()
+
+    return n_travaux
+
+
+def _travailler(hote, port):
+    asyncio.run(travailler(hote, port))
+
+
+async def surveiller_travailleurs(coordinateur, processus, intervalle=0.5):
+    '''
+    Fait échouer le lot avec ErreurTravail quand tous les travailleurs
+    locaux se sont arrêtés avant sa fin et qu'aucun autre travailleur n'est
+    connecté : sans eux, le coordinateur attendrait indéfiniment.
+
+    Args :
+        coordinateur (Coordinateur): le coordinateur du lot
+        processus (List[multiprocessing.Process]): les travailleurs locaux
+        intervalle (float): le nombre de secondes entre deux vérifications
+    '''
+    while not coordinateur.termine.is_set():
+        if not coordinateur.connexions and not any(p.is_alive() for p in processus):
+            codes = ', '.join(str(p.exitcode) for p in processus)
+            coordinateur.echouer(ErreurTravail('Tous les travailleurs locaux se sont arrêtés avant la fin du lot '
+                                               '(codes de sortie : {}).'.format(codes)))
+            return
+
+        await asyncio.sleep(intervalle)
+
+
+def lancer_travailleurs_locaux(n_travailleurs, hote='127.0.0.1', port=8766):
+    '''
+    Démarre des travailleurs dans des processus de cette machine.
+
+    Returns :
+        List[multiprocessing.Process]: les processus démarrés
+    '''
+    # Avec fork, les processus hériteraient des connexions ouvertes du
+    # coordinateur, qui ne verrait alors plus leur fermeture.
+    contexte = multiprocessing.get_context('spawn')
+    processus = [contexte.Process(target=_travailler, args=(hote, port), daemon=True)
+                 for _ in range(n_travailleurs)]
+
+    for p in processus:
+        p.start()
+
+    return processus
+
+
+async def coordonner(travaux, hote='127.0.0.1', port=8766, n_travailleurs_locaux=0, delai=300, max_tentatives=3):
+    '''
+    Distribue un lot de travaux jusqu'à sa fin. Avec des travailleurs
+    locaux, le lot échoue s'ils s'arrêtent tous avant la fin sans qu'un
+    autre travailleur soit connecté (voir surveiller_travailleurs()).
+
+    Returns :
+        dict: le bilan de toutes les parties du lot
+
+    Raises :
+        ErreurTravail: si un travail a échoué trop de fois, ou si plus aucun
+            travailleur ne peut terminer le lot
+    '''
+    coordinateur = Coordinateur(travaux, delai, max_tentatives)
+    serveur = await coordinateur.demarrer_tcp(hote, port)
+
+    # Avec le port 0, le système en choisit un : les travailleurs locaux
+    # doivent recevoir celui-là.
+    port = serveur.sockets[0].getsockname()[1]
+    processus = lancer_travailleurs_locaux(n_travailleurs_locaux, hote, port)
+    surveillance = asyncio.ensure_future(surveiller_travailleurs(coordinateur, processus)) if processus else None
+
+    try:
+        async with serveur:
+            resultat = await coordinateur.attendre()
+
+            # Les travailleurs locaux s'arrêtent à leur prochaine demande.
+            for p in processus:
+                await asyncio.get_running_loop().run_in_executor(None, p.join, 60)
+
+            return resultat
+    finally:
+        if surveillance is not None:
+            surveillance.cancel()
+
+        await coordinateur.fermer()
+
+        for p in processus:
+            if p.is_alive():
+                p.terminate()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Parties ordinateur réparties sur plusieurs machines.')
+    commandes = parser.add_subparsers(dest='commande', required=True)
+
+    coordinateur = commandes.add_parser('coordinateur', help='distribuer un lot de parties')
+    coordinateur.add_argument('--hote', default='127.0.0.1', help='adresse d\'écoute, 0.0.0.0 pour le réseau')
+    coordinateur.add_argument('--port', type=int, default=8766)
+    coordinateur.add_argument('--parties', type=int, default=10000)
+    coordinateur.add_argument('--taille', type=int, nargs=2, default=[3, 3], metavar=('N_BOITES_H', 'N_BOITES_V'))
+    coordinateur.add_argument('--rouge', choices=TYPES_JOUEURS, default='Prudent')
+    coordinateur.add_argument('--bleu', choices=TYPES_JOUEURS, default='Ordinateur')
+    coordinateur.add_argument('--graine', type=int, default=0)
+    coordinateur.add_argument('--taille-travail', type=int, default=100)
+    coordinateur.add_argument('--delai', type=float, default=300,
+                              help='secondes avant de redistribuer un travail sans résultat')
+    coordinateur.add_argument('--travailleurs-locaux', type=int, default=0)
+
+    travailleur = commandes.add_parser('travailleur', help='jouer les travaux d\'un coordinateur')
+    travailleur.add_argument('--hote', default='127.0.0.1')
+    travailleur.add_argument('--port', type=int, default=8766)
+
+    args = parser.parse_args(arguments)
+
+    if args.commande == 'travailleur':
+        print('{} travaux joués'.format(asyncio.run(travailler(args.hote, args.port))))
+        return
+
+    travaux = decouper_travaux(args.taille[0], args.taille[1], args.rouge, args.bleu, args.parties,
+                               args.graine, args.taille_travail)
+    debut = perf_counter()
+    resultat = asyncio.run(coordonner(travaux, args.hote, args.port, args.travailleurs_locaux, args.delai))
+    duree = perf_counter() - debut
+
+    print('Parties : {}'.format(args.parties))
+
+    for champ in CHAMPS_RESULTAT:
+        print('{} : {}'.format(champ.replace('_', ' ').capitalize(), resultat[champ]))
+
+    print('{:.0f} parties par seconde'.format(args.parties / duree))
+
+
+if __name__ == '__main__':
+    main()
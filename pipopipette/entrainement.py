@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+'''
+Exportation de données d'entraînement : des parties terminées aux tenseurs
+NumPy de caractéristiques, écrits par blocs dans des fichiers .npy.
+
+Chaque coup d'une partie donne un exemple : la position avant le coup, vue
+par le joueur qui le joue, et deux étiquettes, le coup joué et la marge
+finale de ce joueur. La position est décrite par des plans de forme
+(2 * n_boites_h + 1, 2 * n_boites_v + 1), la grille où la ligne horizontale
+(i, j) est en (2i, 2j + 1), la ligne verticale (i, j) en (2i + 1, 2j) et la
+boîte (i, j) en (2i + 1, 2j + 1) :
+
+    0. les lignes jouées
+    1. les boîtes du joueur qui joue
+    2. les boîtes de son adversaire
+    3. le nombre de côtés joués de chaque boîte, de 0 à 4 (la valeur de
+       Planche.compter_lignes_jouees_boite())
+    4. le joueur qui joue : 1 partout pour le joueur rouge, 0 pour le bleu
+
+Les parties sont rejouées sur le masque des lignes, sans construire de
+Planche, et seules les lignes jouées et les propriétaires des boîtes sont
+copiés par exemple. Les plans sont calculés une fois par bloc, en
+opérations vectorisées : les nombres de côtés, par exemple, sont le produit
+de la matrice des lignes jouées du bloc par la matrice d'incidence des
+lignes et des boîtes.
+
+Les exemples passent par des tampons d'un bloc, écrits dans
+caracteristiques_NNNNN.npy, coups_NNNNN.npy, marges_NNNNN.npy et
+joueurs_NNNNN.npy dès qu'ils sont pleins : la mémoire utilisée ne dépend que de la taille des blocs, et
+non du nombre de parties. Les fichiers se relisent projetés en mémoire avec
+charger_blocs().
+
+NumPy est nécessaire pour ce module seulement.
+'''
+
+import json
+import os
+
+import numpy as np
+
+from pipopipette.hasard import GenerateurCompteur
+from pipopipette.topologie import Topologie, obtenir_topologie
+
+NOMS_PLANS = ['lignes', 'boites_joueur', 'boites_adversaire', 'cotes_boites', 'joueur_rouge']
+
+CODE_ROUGE = Topologie.CODES_COULEURS['rouge']
+
+
+def parties_auto_jeu(n_boites_h, n_boites_v, n_parties, graine=0, classe_joueur=None):
+    '''
+    Joue des parties d'un joueur ordinateur contre lui-même, sans affichage.
+    La partie numéro i utilise le flux GenerateurCompteur(graine, i), de
+    sorte que chaque partie peut être rejouée seule.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        n_parties (int): le nombre de parties
+        graine (int): la graine des parties
+        classe_joueur (type): la classe des deux joueurs,
+            JoueurOrdinateurPrudent par défaut
+
+    Returns :
+        Iterator[List[((int, int, str), str)]]: l'historique de chaque partie
+    '''
+    from pipopipette.joueur import JoueurOrdinateurPrudent
+    from pipopipette.partie import PartiePipopipette
+
+    classe_joueur = classe_joueur if classe_joueur is not None else JoueurOrdinateurPrudent
+
+    for numero_partie in range(n_parties):
+        partie = PartiePipopipette(joueur_rouge=classe_joueur('rouge'), joueur_bleu=classe_joueur('bleu'),
+                                   n_boites_h=n_boites_h, n_boites_v=n_boites_v,
+                                   rng=GenerateurCompteur(graine, numero_partie))
+
+        while not partie.partie_terminee():
+            partie.jouer_coup(partie.demander_coup())
+
+        yield partie.historique_coups
+
+
+class EncodeurPlans:
+    '''
+    Calcule les plans de caractéristiques (voir la documentation du module)
+    d'un lot de positions d'une taille de planche.
+    '''
+
+    def __init__(self, n_boites_h, n_boites_v):
+        '''
+        Args :
+            n_boites_h (int): le nombre de rangées de boîtes
+            n_boites_v (int): le nombre de colonnes de boîtes
+        '''
+        topologie = obtenir_topologie(n_boites_h, n_boites_v)
+
+        self.topologie = topologie
+        self.forme_plans = (len(NOMS_PLANS), 2 * n_boites_h + 1, 2 * n_boites_v + 1)
+
+        # Position de chaque ligne et de chaque boîte dans la grille des plans
+        self.rangees_lignes = np.array([2 * ligne + (orientation == 'V')
+                                        for ligne, _, orientation in topologie.index_lignes])
+        self.colonnes_lignes = np.array([2 * col + (orientation == 'H')
+                                         for _, col, orientation in topologie.index_lignes])
+        self.rangees_boites = np.array([2 * ligne + 1 for ligne, _ in topologie.index_boites])
+        self.colonnes_boites = np.array([2 * col + 1 for _, col in topologie.index_boites])
+
+        # incidence[l, b] vaut 1 si la ligne l est un côté de la boîte b
+        self.incidence = np.zeros((topologie.n_lignes, topologie.n_boites), dtype=np.uint8)
+
+        for numero_boite, cotes in enumerate(topologie.lignes_boites):
+            self.incidence[list(cotes), numero_boite] = 1
+
+    def calculer_plans(self, lignes, couleurs, joueurs):
+        '''
+        Args :
+            lignes (numpy.ndarray): (n, n_lignes), 1 pour les lignes jouées
+            couleurs (numpy.ndarray): (n, n_boites), les codes de couleur des
+                boîtes (Topologie.CODES_COULEURS)
+            joueurs (numpy.ndarray): (n,), le code de couleur du joueur qui joue
+
+        Returns :
+            numpy.ndarray: les plans, de forme (n,) + self.forme_plans
+        '''
+        plans = np.zeros((len(lignes),) + self.forme_plans, dtype=np.uint8)
+        joueurs_colonne = joueurs[:, None]
+
+        plans[:, 0, self.rangees_lignes, self.colonnes_lignes] = lignes
+        plans[:, 1, self.rangees_boites, self.colonnes_boites] = couleurs == joueurs_colonne
+        plans[:, 2, self.rangees_boites, self.colonnes_boites] = (couleurs != 0) & (couleurs != joueurs_colonne)
+        plans[:, 3, self.rangees_boites, self.colonnes_boites] = lignes @ self.incidence
+        plans[:, 4] = (joueurs == CODE_ROUGE)[:, None, None]
+
+        return plans
+
+
+class ExportateurEntrainement:
+    '''
+    Écrit les exemples d'entraînement de parties terminées par blocs de
+    fichiers .npy. Voir la documentation du module.
+
+        with ExportateurEntrainement('donnees', 3, 3) as exportateur:
+            for historique in parties_auto_jeu(3, 3, 100000):
+                exportateur.ajouter_partie(historique)
+    '''
+
+    def __init__(self, dossier, n_boites_h, n_boites_v, taille_bloc=65536):
+        '''
+        Args :
+            dossier (str): le dossier des fichiers, créé au besoin
+            n_boites_h (int): le nombre de rangées de boîtes des parties
+            n_boites_v (int): le nombre de colonnes de boîtes des parties
+            taille_bloc (int): le nombre d'exemples par fichier
+        '''
+        assert taille_bloc > 0, 'ExportateurEntrainement: taille de bloc invalide.'
+
+        os.makedirs(dossier, exist_ok=True)
+
+        self.dossier = dossier
+        self.encodeur = EncodeurPlans(n_boites_h, n_boites_v)
+        self.topologie = self.encodeur.topologie
+        self.taille_bloc = taille_bloc
+        self.forme_plans = self.encodeur.forme_plans
+
+        topologie = self.topologie
+
+        # Tampons du bloc en cours
+        self.lignes = np.zeros((taille_bloc, topologie.n_lignes), dtype=np.uint8)
+        self.couleurs = np.zeros((taille_bloc, topologie.n_boites), dtype=np.uint8)
+        self.joueurs = np.zeros(taille_bloc, dtype=np.uint8)
+        self.coups = np.zeros(taille_bloc, dtype=np.int16)
+        self.marges = np.zeros(taille_bloc, dtype=np.int8)
+
+        self.n_exemples_bloc = 0
+        self.n_blocs = 0
+        self.n_exemples = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def ajouter_partie(self, historique):
+        '''
+        Ajoute un exemple par coup d'une partie terminée.
+
+        Args :
+            historique (List[((int, int, str), str)]): les (coup, couleur)
+                joués depuis la planche vide, comme
+                PartiePipopipette.historique_coups
+        '''
+        topologie = self.topologie
+        lignes = np.zeros(topologie.n_lignes, dtype=np.uint8)
+        couleurs = np.zeros(topologie.n_boites, dtype=np.uint8)
+        masque = 0
+        debut = self.n_exemples_bloc
+        premier_bloc = self.n_blocs
+
+        for coup, couleur in historique:
+            k = self.n_exemples_bloc
+            numero_ligne = topologie.numeros_lignes[tuple(coup)]
+            code_couleur = Topologie.CODES_COULEURS[couleur]
+
+            self.lignes[k] = lignes
+            self.couleurs[k] = couleurs
+            self.joueurs[k] = code_couleur
+            self.coups[k] = numero_ligne
+
+            lignes[numero_ligne] = 1
+            masque |= 1 << numero_ligne
+
+            for numero_boite in topologie.boites_completees(masque, numero_ligne):
+                couleurs[numero_boite] = code_couleur
+
+            self.n_exemples_bloc += 1
+
+            if self.n_exemples_bloc == self.taille_bloc:
+                # Les marges ne sont connues qu'en fin de partie : celles
+                # des exemples déjà écrits sont complétées dans leur fichier.
+                self.marges[debut:] = 0
+                self.ecrire_bloc()
+                debut = 0
+
+        n_rouges = int(np.count_nonzero(couleurs == CODE_ROUGE))
+        marge_rouge = 2 * n_rouges - int(np.count_nonzero(couleurs))
+
+        self.marges[debut:self.n_exemples_bloc] = np.where(self.joueurs[debut:self.n_exemples_bloc] == CODE_ROUGE,
+                                                           marge_rouge, -marge_rouge)
+
+        if self.n_blocs > premier_bloc:
+            self.completer_marges(premier_bloc, historique, marge_rouge)
+
+    def completer_marges(self, premier_bloc, historique, marge_rouge):
+        '''
+        Inscrit la marge finale d'une partie dans les fichiers de marges des
+        blocs écrits avant sa fin (une partie à cheval sur plusieurs blocs).
+        '''
+        n_coups_restants = len(historique) - self.n_exemples_bloc
+
+        for numero_bloc in range(self.n_blocs - 1, premier_bloc - 1, -1):
+            marges = np.load(self.chemin('marges', numero_bloc), mmap_mode='r+')
+            joueurs = np.load(self.chemin('joueurs', numero_bloc), mmap_mode='r')
+            n = min(n_coups_restants, len(marges))
+
+            marges[len(marges) - n:] = np.where(joueurs[len(marges) - n:] == CODE_ROUGE, marge_rouge, -marge_rouge)
+            marges.flush()
+            n_coups_restants -= n
+
+    def chemin(self, nom, numero_bloc):
+        return os.path.join(self.dossier, '{}_{:05d}.npy'.format(nom, numero_bloc))
+
+    def calculer_plans(self, n):
+        '''
+        Calcule les plans des n premiers exemples du bloc en cours.
+
+        Returns :
+            numpy.ndarray: les plans, de forme (n,) + self.forme_plans
+        '''
+        return self.encodeur.calculer_plans(self.lignes[:n], self.couleurs[:n], self.joueurs[:n])
+
+    def ecrire_bloc(self):
+        '''
+        Écrit les exemples du bloc en cours dans ses fichiers et vide les
+        tampons.
+        '''
+        n = self.n_exemples_bloc
+
+        if n == 0:
+            return
+
+        sorties = {
+            'caracteristiques': self.calculer_plans(n),
+            'coups': self.coups[:n],
+            'marges': self.marges[:n],
+            'joueurs': self.joueurs[:n],
+        }
+
+        for nom, valeurs in sorties.items():
+            fichier = np.lib.format.open_memmap(self.chemin(nom, self.n_blocs), mode='w+',
+                                                dtype=valeurs.dtype, shape=valeurs.shape)
+            fichier[:] = valeurs
+            fichier.flush()
+            del fichier
+
+        self.n_exemples += n
+        self.n_blocs += 1
+        self.n_exemples_bloc = 0
+
+    def fermer(self):
+        '''
+        Écrit le dernier bloc, incomplet, et le manifeste du dossier.
+        '''
+        self.ecrire_bloc()
+
+        manifeste = {
+            'n_boites_h': self.topologie.n_boites_h,
+            'n_boites_v': self.topologie.n_boites_v,
+            'plans': NOMS_PLANS,
+            'forme_plans': list(self.forme_plans),
+            'n_blocs': self.n_blocs,
+            'n_exemples': self.n_exemples,
+        }
+
+        with open(os.path.join(self.dossier, 'manifeste.json'), 'w') as f:
+            json.dump(manifeste, f, indent=2)
+
+
+def charger_blocs(dossier):
+    '''
+    Projette en mémoire les blocs d'un dossier écrit par
+    ExportateurEntrainement.
+
+    Returns :
+        List[dict]: pour chaque bloc, les tableaux 'caracteristiques',
+            'coups', 'marges' et 'joueurs', en lecture seule
+    '''
+    with open(os.path.join(dossier, 'manifeste.json')) as f:
+        manifeste = json.load(f)
+
+    return [{nom: np.load(os.path.join(dossier, '{}_{:05d}.npy'.format(nom, numero_bloc)), mmap_mode='r')
+             for nom in ['caracteristiques', 'coups', 'marges', 'joueurs']}
+            for numero_bloc in range(manifeste['n_blocs'])]
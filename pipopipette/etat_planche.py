@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+from pipopipette.topologie import Topologie, obtenir_topologie, hash_position
+
+
+class EtatPlanche(namedtuple('EtatPlanche', ['n_boites_h', 'n_boites_v', 'masque_lignes', 'couleurs_boites'])):
+    '''
+    Instantané immuable de l'état d'une planche.
+
+    Un état est constitué des dimensions de la planche, d'un entier
+    masque_lignes dont le bit i est à 1 si la ligne numéro i est jouée, et
+    d'une chaîne d'octets couleurs_boites contenant le code de couleur de
+    chaque boîte (voir Topologie pour la numérotation et les codes).
+
+    Comme il ne contient que des entiers et des octets, un état est
+    hashable (on peut s'en servir comme clé de dictionnaire) et se
+    sérialise en quelques dizaines d'octets avec pickle, ce qui le rend
+    peu coûteux à envoyer à un autre processus.
+
+    Pour créer un état, utilisez Planche.obtenir_etat(), et pour retrouver
+    une planche, Planche.depuis_etat().
+    '''
+    __slots__ = ()
+
+    def obtenir_topologie(self):
+        return obtenir_topologie(self.n_boites_h, self.n_boites_v)
+
+    def est_pleine(self):
+        '''
+        Returns :
+            bool: True si toutes les lignes sont jouées, False sinon
+        '''
+        return self.masque_lignes == self.obtenir_topologie().masque_complet
+
+    def obtenir_coups_possibles(self):
+        '''
+        Returns :
+            List[(int, int, str)]: les index des lignes non jouées, dans
+                l'ordre canonique de la topologie
+        '''
+        masque = self.masque_lignes
+
+        return [idx for numero, idx in enumerate(self.obtenir_topologie().index_lignes) if not masque >> numero & 1]
+
+    def bilan_boites(self):
+        '''
+        Returns :
+            int: Le nombre de boîtes bleues
+            int: le nombre de boîtes rouges
+        '''
+        return (self.couleurs_boites.count(Topologie.CODES_COULEURS['bleu']),
+                self.couleurs_boites.count(Topologie.CODES_COULEURS['rouge']))
+
+    def hash_canonique(self):
+        '''
+        Returns :
+            int: le même hash que Planche.hash_canonique() pour la planche
+                correspondante
+        '''
+        return hash_position(self.n_boites_h, self.n_boites_v, self.masque_lignes, self.couleurs_boites)
+
+
+def etat_depuis_chaine(n_boites_h, n_boites_v, chaine):
+    '''
+    Construit directement l'état d'une planche à partir de sa chaîne (voir
+    Planche.convertir_en_chaine()), sans passer par les objets Ligne et
+    Boite.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        chaine (str): la chaîne de caractères représentant la planche
+
+    Returns :
+        EtatPlanche: l'état de la planche
+    '''
+    topologie = obtenir_topologie(n_boites_h, n_boites_v)
+    masque = 0
+    couleurs = bytearray(topologie.n_boites)
+
+    for information_case in chaine.split('\n'):
+        if information_case != '':
+            ligne_string, colonne_string, attribut = information_case.split(',')
+
+            if attribut in ['H', 'V']:
+                masque |= 1 << topologie.numeros_lignes[(int(ligne_string), int(colonne_string), attribut)]
+            else:
+                couleurs[topologie.numeros_boites[(int(ligne_string), int(colonne_string))]] = \
+                    Topologie.CODES_COULEURS[attribut]
+
+    return EtatPlanche(n_boites_h, n_boites_v, masque, bytes(couleurs))
+
+
+class DeltaPlanche(namedtuple('DeltaPlanche', ['sequence', 'ligne', 'couleur', 'boites'])):
+    '''
+    Changement d'une planche causé par un coup, publié aux abonnés de la
+    planche (voir Planche.abonner()).
+
+    Un delta est constitué du numéro de séquence du changement, de l'index
+    (ligne, colonne, orientation) de la ligne jouée, de la couleur du joueur
+    et du tuple des index (ligne, colonne) des boîtes remplies par le coup,
+    qui prennent toutes cette couleur. Appliqué dans l'ordre des numéros de
+    séquence à partir d'un EtatPlanche, il suffit à suivre la planche.
+    '''
+    __slots__ = ()
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+'''
+Évaluation apprise de positions, par lots, en NumPy seulement (sur CPU).
+
+Le modèle est un petit perceptron : les plans de caractéristiques d'une
+position (voir pipopipette.entrainement), mis à plat, passent par zéro ou
+plusieurs couches cachées ReLU, puis par deux têtes linéaires :
+
+    - la politique, un score par ligne, transformé en probabilités sur les
+      lignes libres seulement (softmax);
+    - la valeur, la marge finale prédite du joueur qui joue, ses boîtes
+      moins celles de son adversaire (l'étiquette marges de l'exportateur).
+
+Sans couche cachée, le modèle est linéaire. Les poids s'enregistrent dans
+un fichier .npz (voir ModeleEvaluation.sauvegarder()) et se relisent avec
+charger_modele().
+
+Le coût d'une évaluation est dominé par les appels NumPy, pas par les
+calculs : EvaluateurLots évalue donc des lots entiers de positions en un
+seul passage, et sa recherche (EvaluateurLots.rechercher()) développe
+l'arbre niveau par niveau pour évaluer toutes les positions d'un niveau
+ensemble plutôt qu'une à une.
+'''
+
+import numpy as np
+
+from pipopipette.entrainement import EncodeurPlans
+from pipopipette.topologie import Topologie
+
+CODE_ROUGE = Topologie.CODES_COULEURS['rouge']
+CODE_BLEU = Topologie.CODES_COULEURS['bleu']
+
+
+class ModeleEvaluation:
+    '''
+    Perceptron à deux têtes, politique et valeur. Voir la documentation du
+    module.
+    '''
+
+    def __init__(self, couches, politique, valeur):
+        '''
+        Args :
+            couches (List[(numpy.ndarray, numpy.ndarray)]): les (poids, biais)
+                des couches cachées, dans l'ordre; une liste vide donne un
+                modèle linéaire
+            politique ((numpy.ndarray, numpy.ndarray)): les (poids, biais) de
+                la tête politique, une sortie par ligne
+            valeur ((numpy.ndarray, numpy.ndarray)): les (poids, biais) de la
+                tête valeur, une seule sortie
+        '''
+        self.couches = [(np.asarray(poids, dtype=np.float32), np.asarray(biais, dtype=np.float32))
+                        for poids, biais in couches]
+        self.politique = (np.asarray(politique[0], dtype=np.float32), np.asarray(politique[1], dtype=np.float32))
+        self.valeur = (np.asarray(valeur[0], dtype=np.float32).reshape(-1, 1),
+                       np.asarray(valeur[1], dtype=np.float32).reshape(1))
+
+        self.n_entrees = (self.couches[0][0] if self.couches else self.politique[0]).shape[0]
+        self.n_sorties = self.politique[0].shape[1]
+
+        n_precedent = self.n_entrees
+
+        for poids, biais in self.couches:
+            assert poids.shape[0] == n_precedent and biais.shape == poids.shape[1:], \
+                'ModeleEvaluation: dimensions des poids incohérentes.'
+
+            n_precedent = poids.shape[1]
+
+        for poids, biais in (self.politique, self.valeur):
+            assert poids.shape[0] == n_precedent and biais.shape == poids.shape[1:], \
+                'ModeleEvaluation: dimensions des poids incohérentes.'
+
+    def propager(self, entrees):
+        '''
+        Args :
+            entrees (numpy.ndarray): (n, n_entrees), les caractéristiques
+
+        Returns :
+            (numpy.ndarray, numpy.ndarray): les scores de la politique
+                (n, n_sorties) et les valeurs (n,)
+        '''
+        activations = entrees.astype(np.float32, copy=False)
+
+        for poids, biais in self.couches:
+            activations = np.maximum(activations @ poids + biais, 0)
+
+        scores = activations @ self.politique[0] + self.politique[1]
+        valeurs = (activations @ self.valeur[0] + self.valeur[1])[:, 0]
+
+        return scores, valeurs
+
+    def sauvegarder(self, chemin):
+        '''
+        Enregistre les poids dans un fichier .npz : W0, b0, W1, b1, ... pour
+        les couches cachées, Wp, bp pour la politique et Wv, bv pour la valeur.
+        '''
+        tableaux = {'Wp': self.politique[0], 'bp': self.politique[1], 'Wv': self.valeur[0], 'bv': self.valeur[1]}
+
+        for i, (poids, biais) in enumerate(self.couches):
+            tableaux['W{}'.format(i)] = poids
+            tableaux['b{}'.format(i)] = biais
+
+        np.savez(chemin, **tableaux)
+
+
+def charger_modele(chemin):
+    '''
+    Relit un modèle enregistré par ModeleEvaluation.sauvegarder().
+
+    Returns :
+        ModeleEvaluation: le modèle
+    '''
+    with np.load(chemin) as tableaux:
+        couches = []
+
+        while 'W{}'.format(len(couches)) in tableaux:
+            i = len(couches)
+            couches.append((tableaux['W{}'.format(i)], tableaux['b{}'.format(i)]))
+
+        return ModeleEvaluation(couches, (tableaux['Wp'], tableaux['bp']), (tableaux['Wv'], tableaux['bv']))
+
+
+def creer_modele_aleatoire(n_boites_h, n_boites_v, tailles_cachees=(), graine=0):
+    '''
+    Crée un modèle aux poids aléatoires (initialisation de He) pour une
+    taille de planche, par exemple comme point de départ d'un entraînement.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        tailles_cachees (Tuple[int]): la taille de chaque couche cachée
+        graine (int): la graine des poids
+
+    Returns :
+        ModeleEvaluation: le modèle
+    '''
+    encodeur = EncodeurPlans(n_boites_h, n_boites_v)
+    rng = np.random.default_rng(graine)
+    tailles = [int(np.prod(encodeur.forme_plans))] + list(tailles_cachees)
+
+    def couche(n_entrees, n_sorties):
+        return rng.normal(0, np.sqrt(2 / n_entrees), (n_entrees, n_sorties)), np.zeros(n_sorties)
+
+    couches = [couche(n_entrees, n_sorties) for n_entrees, n_sorties in zip(tailles, tailles[1:])]
+
+    return ModeleEvaluation(couches, couche(tailles[-1], encodeur.topologie.n_lignes), couche(tailles[-1], 1))
+
+
+class EvaluateurLots:
+    '''
+    Évalue des lots de positions d'une taille de planche avec un
+    ModeleEvaluation. Voir la documentation du module.
+    '''
+
+    def __init__(self, modele, n_boites_h, n_boites_v, taille_lot=4096):
+        '''
+        Args :
+            modele (ModeleEvaluation): le modèle
+            n_boites_h (int): le nombre de rangées de boîtes
+            n_boites_v (int): le nombre de colonnes de boîtes
+            taille_lot (int): le nombre maximal de positions par appel au
+                modèle, qui borne la mémoire des grandes recherches
+        '''
+        self.modele = modele
+        self.encodeur = EncodeurPlans(n_boites_h, n_boites_v)
+        self.topologie = self.encodeur.topologie
+        self.taille_lot = taille_lot
+
+        assert modele.n_entrees == int(np.prod(self.encodeur.forme_plans)) \
+            and modele.n_sorties == self.topologie.n_lignes, \
+            "EvaluateurLots: le modèle ne correspond pas à la taille de la planche."
+
+        # Statistiques : positions évaluées et appels au modèle
+        self.n_positions = 0
+        self.n_lots = 0
+
+    def evaluer_positions(self, masques, couleurs_boites, joueurs):
+        '''
+        Évalue des positions données par leur masque de lignes jouées (voir
+        Topologie), les codes de couleur de leurs boîtes et le code de
+        couleur du joueur qui joue.
+
+        Args :
+            masques (List[int]): les masques des lignes jouées
+            couleurs_boites (List[bytes]): les codes de couleur des boîtes
+            joueurs (List[int]): les codes de couleur des joueurs qui jouent
+
+        Returns :
+            (numpy.ndarray, numpy.ndarray): les probabilités de la politique
+                sur les lignes libres (n, n_lignes) et les valeurs (n,)
+        '''
+        topologie = self.topologie
+        n = len(masques)
+        n_octets = (topologie.n_lignes + 7) // 8
+        probabilites = np.zeros((n, topologie.n_lignes), dtype=np.float32)
+        valeurs = np.zeros(n, dtype=np.float32)
+
+        for debut in range(0, n, self.taille_lot):
+            fin = min(debut + self.taille_lot, n)
+            octets = np.frombuffer(b''.join(masque.to_bytes(n_octets, 'little') for masque in masques[debut:fin]),
+                                   dtype=np.uint8).reshape(fin - debut, n_octets)
+            lignes = np.unpackbits(octets, axis=1, bitorder='little')[:, :topologie.n_lignes]
+            couleurs = np.frombuffer(b''.join(couleurs_boites[debut:fin]),
+                                     dtype=np.uint8).reshape(fin - debut, topologie.n_boites)
+
+            plans = self.encodeur.calculer_plans(lignes, couleurs, np.asarray(joueurs[debut:fin], dtype=np.uint8))
+            scores, valeurs[debut:fin] = self.modele.propager(plans.reshape(fin - debut, -1))
+
+            # Softmax sur les lignes libres seulement
+            scores = np.where(lignes == 0, scores, -np.inf)
+            scores -= scores.max(axis=1, keepdims=True)
+            exponentielles = np.exp(scores)
+            probabilites[debut:fin] = exponentielles / exponentielles.sum(axis=1, keepdims=True)
+
+            self.n_lots += 1
+
+        self.n_positions += n
+
+        return probabilites, valeurs
+
+    def evaluer(self, planches, couleurs):
+        '''
+        Évalue un lot de planches.
+
+        Args :
+            planches (List[Planche]): les planches, de la taille de l'évaluateur
+            couleurs (List[str]): la couleur du joueur qui joue sur chaque planche
+
+        Returns :
+            List[(dict, float)]: pour chaque planche, les probabilités de la
+                politique (coup -> probabilité, coups possibles seulement) et
+                la marge finale prédite du joueur qui joue
+        '''
+        masques = [planche.obtenir_masque_lignes() for planche in planches]
+        probabilites, valeurs = self.evaluer_positions(masques,
+                                                       [planche.obtenir_couleurs_boites() for planche in planches],
+                                                       [Topologie.CODES_COULEURS[couleur] for couleur in couleurs])
+        index_lignes = self.topologie.index_lignes
+        resultats = []
+
+        for masque, probabilites_planche, valeur in zip(masques, probabilites, valeurs):
+            politique = {index_lignes[numero]: float(probabilites_planche[numero])
+                         for numero in range(self.topologie.n_lignes) if not masque >> numero & 1}
+            resultats.append((politique, float(valeur)))
+
+        return resultats
+
+    def rechercher(self, planche, couleur, profondeur=2, largeur=None):
+        '''
+        Évalue les coups possibles par une recherche négamax de profondeur
+        fixe dont les feuilles sont évaluées par le modèle.
+
+        L'arbre est développé niveau par niveau : toutes les positions d'un
+        niveau sont évaluées en un seul lot, qui donne à la fois la valeur
+        des feuilles et, si largeur est donnée, la politique qui choisit les
+        largeur coups développés à chaque nœud. Le joueur qui complète une
+        boîte rejoue, et les planches pleines sont évaluées exactement.
+
+        Args :
+            planche (Planche): la position, de la taille de l'évaluateur
+            couleur (str): la couleur du joueur qui joue
+            profondeur (int): le nombre de coups développés, au moins 1
+            largeur (int): le nombre maximal de coups développés par nœud,
+                tous si None
+
+        Returns :
+            (dict, int): la marge finale prédite du joueur qui joue pour
+                chacun des coups développés à la racine, et le nombre de
+                positions explorées
+        '''
+        assert profondeur >= 1, 'EvaluateurLots: profondeur invalide.'
+
+        topologie = self.topologie
+        code_joueur = Topologie.CODES_COULEURS[couleur]
+
+        # Chaque niveau : masques, couleurs des boîtes, joueurs et parents
+        niveaux = [([planche.obtenir_masque_lignes()], [planche.obtenir_couleurs_boites()], [code_joueur], [])]
+        valeurs_niveaux = []
+
+        for numero_niveau in range(profondeur + 1):
+            masques, couleurs_boites, joueurs, _ = niveaux[-1]
+            valeurs = np.zeros(len(masques), dtype=np.float32)
+
+            # Les planches pleines ont une valeur exacte : seules les autres
+            # passent par le modèle.
+            a_evaluer = [i for i, masque in enumerate(masques) if masque != topologie.masque_complet]
+
+            for i in range(len(masques)):
+                if masques[i] == topologie.masque_complet:
+                    couleurs = couleurs_boites[i]
+                    valeurs[i] = 2 * couleurs.count(joueurs[i]) - len(couleurs)
+
+            probabilites, valeurs_modele = self.evaluer_positions([masques[i] for i in a_evaluer],
+                                                                  [couleurs_boites[i] for i in a_evaluer],
+                                                                  [joueurs[i] for i in a_evaluer])
+            valeurs[a_evaluer] = valeurs_modele
+            valeurs_niveaux.append(valeurs)
+
+            if numero_niveau == profondeur:
+                break
+
+            enfants = ([], [], [], [])
+
+            for rang, i in enumerate(a_evaluer):
+                if largeur is None:
+                    candidats = range(topologie.n_lignes)
+                else:
+                    candidats = np.argsort(-probabilites[rang], kind='stable')[:largeur]
+
+                for numero_ligne in candidats:
+                    numero_ligne = int(numero_ligne)
+                    self.developper(masques[i], couleurs_boites[i], joueurs[i], numero_ligne, i, enfants)
+
+            niveaux.append(enfants)
+
+        # Remontée négamax : la valeur d'un nœud développé est la meilleure
+        # de ses enfants, de signe inversé quand le joueur change.
+        for numero_niveau in range(len(niveaux) - 1, 1, -1):
+            _, _, joueurs, parents = niveaux[numero_niveau]
+            joueurs_parents = niveaux[numero_niveau - 1][2]
+            valeurs_parents = valeurs_niveaux[numero_niveau - 1]
+            meilleures = np.full(len(valeurs_parents), -np.inf, dtype=np.float32)
+
+            contributions = np.where(np.asarray(joueurs) == np.asarray(joueurs_parents)[parents],
+                                     valeurs_niveaux[numero_niveau], -valeurs_niveaux[numero_niveau])
+            np.maximum.at(meilleures, parents, contributions)
+            valeurs_parents[:] = np.where(np.isfinite(meilleures), meilleures, valeurs_parents)
+
+        masques, _, joueurs, _ = niveaux[1]
+        evaluations = {}
+
+        for masque, joueur, valeur in zip(masques, joueurs, valeurs_niveaux[1]):
+            coup = topologie.index_lignes[(masque ^ niveaux[0][0][0]).bit_length() - 1]
+            evaluations[coup] = float(valeur if joueur == code_joueur else -valeur)
+
+        return evaluations, sum(len(niveau[0]) for niveau in niveaux)
+
+    def developper(self, masque, couleurs_boites, joueur, numero_ligne, parent, enfants):
+        '''
+        Ajoute aux listes enfants la position qui suit le coup numero_ligne,
+        s'il est possible.
+        '''
+        topologie = self.topologie
+        bit = 1 << numero_ligne
+
+        if masque & bit:
+            return
+
+        nouveau = masque | bit
+        couleurs = None
+        completees = topologie.boites_completees(nouveau, numero_ligne)
+
+        if completees:
+            couleurs = bytearray(couleurs_boites)
+
+            for numero_boite in completees:
+                couleurs[numero_boite] = joueur
+
+        masques, liste_couleurs, joueurs, parents = enfants
+        masques.append(nouveau)
+        parents.append(parent)
+
+        if couleurs is None:
+            # Aucune boîte complétée : c'est au tour de l'adversaire.
+            liste_couleurs.append(couleurs_boites)
+            joueurs.append(CODE_BLEU if joueur == CODE_ROUGE else CODE_ROUGE)
+        else:
+            liste_couleurs.append(bytes(couleurs))
+            joueurs.append(joueur)
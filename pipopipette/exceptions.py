@@ -0,0 +1,15 @@
+class ErreurClicCoup(Exception):
+    '''
+    Une exception indiquant qu'un coup invalide a été joué, par exemple un
+    clic sur une ligne déjà jouée. Voir Planche.valider_coup().
+    '''
+    pass
+
+
+class ErreurTypeJoueur(Exception):
+    '''
+    Une exception indiquant qu'un joueur ne peut pas être créé selon son
+    type : le type est inconnu, ou il manque des arguments à son
+    constructeur. Voir joueur.creer_joueur().
+    '''
+    pass
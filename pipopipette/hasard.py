@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+'''
+Sources de hasard reproductibles.
+
+GenerateurCompteur est un générateur « à compteur » : le n-ième tirage d'un
+flux est une fonction de mélange appliquée à (clé du flux, n), sans autre
+état que le compteur. Chaque flux est identifié par une graine et une suite
+d'identifiants (par exemple le numéro d'une partie puis la couleur d'un
+joueur) :
+
+    GenerateurCompteur(graine, numero_partie, 'rouge')
+
+Créer un flux ne coûte qu'un hachage, et les flux de clés différentes sont
+indépendants quel que soit l'ordre dans lequel on les utilise. Un lot de
+parties dont chaque partie tire ses coups de son propre flux donne donc les
+mêmes résultats sur un ou plusieurs processus, et n'importe quelle partie
+du lot peut être rejouée seule. C'est aussi ce qui évite que les processus
+créés par fork partagent, sans le savoir, le générateur global du module
+random.
+
+GenerateurCompteur hérite de random.Random : choice(), shuffle(), sample(),
+etc. s'utilisent comme d'habitude.
+'''
+
+import hashlib
+import os
+import random
+
+MASQUE_64 = (1 << 64) - 1
+
+# Incrément de Weyl de SplitMix64
+GAMMA = 0x9E3779B97F4A7C15
+
+
+def melanger_64(valeur):
+    '''
+    Fonction de finalisation de SplitMix64 : une bijection sur les entiers
+    de 64 bits dont chaque bit de sortie dépend de tous les bits d'entrée.
+    '''
+    valeur = (valeur ^ (valeur >> 30)) * 0xBF58476D1CE4E5B9 & MASQUE_64
+    valeur = (valeur ^ (valeur >> 27)) * 0x94D049BB133111EB & MASQUE_64
+
+    return valeur ^ (valeur >> 31)
+
+
+def cle_flux(graine, *identifiants):
+    '''
+    Calcule la clé de 64 bits d'un flux à partir de sa graine et de ses
+    identifiants (entiers ou chaînes).
+    '''
+    donnees = repr((graine,) + identifiants).encode()
+
+    return int.from_bytes(hashlib.blake2b(donnees, digest_size=8).digest(), 'little')
+
+
+class GenerateurCompteur(random.Random):
+    '''
+    Générateur pseudo-aléatoire à compteur. Voir la documentation du module.
+    '''
+
+    def __init__(self, graine=None, *identifiants):
+        '''
+        Args :
+            graine (int ou str): la graine du flux, tirée du système si None
+            identifiants (int ou str): les identifiants du flux
+        '''
+        self.identifiants = identifiants
+        super().__init__(graine)
+
+    def seed(self, graine=None, version=2):
+        if graine is None:
+            graine = int.from_bytes(os.urandom(8), 'little')
+
+        self.graine = graine
+        self.cle = cle_flux(graine, *self.identifiants)
+        self.compteur = 0
+        self.gauss_next = None
+
+    def deriver(self, *identifiants):
+        '''
+        Retourne le flux de même graine dont les identifiants sont ceux de
+        ce flux suivis de ceux en entrée. Le flux dérivé ne dépend pas de
+        l'avancement de celui-ci.
+
+        Returns :
+            GenerateurCompteur: le flux dérivé
+        '''
+        return GenerateurCompteur(self.graine, *(self.identifiants + identifiants))
+
+    def sauter(self, n):
+        '''
+        Avance le flux de n tirages de 64 bits en temps constant.
+        '''
+        self.compteur += n
+
+    def suivant_64(self):
+        self.compteur += 1
+
+        return melanger_64((self.cle + self.compteur * GAMMA) & MASQUE_64)
+
+    def random(self):
+        return (self.suivant_64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        if k <= 64:
+            return self.suivant_64() >> (64 - k) if k else 0
+
+        n_mots = (k + 63) // 64
+        valeur = 0
+
+        for _ in range(n_mots):
+            valeur = valeur << 64 | self.suivant_64()
+
+        return valeur >> (n_mots * 64 - k)
+
+    def getstate(self):
+        return self.graine, self.identifiants, self.compteur, self.gauss_next
+
+    def setstate(self, etat):
+        graine, self.identifiants, compteur, gauss_next = etat
+        self.seed(graine)
+        self.compteur = compteur
+        self.gauss_next = gauss_next
+
+    def __repr__(self):
+        return 'GenerateurCompteur({})'.format(', '.join(map(repr, (self.graine,) + self.identifiants)))
+
+
+def obtenir_generateur(rng):
+    '''
+    Normalise un argument rng : None donne None (le générateur global du
+    module random sera utilisé), une graine donne un GenerateurCompteur et
+    un générateur est retourné tel quel.
+
+    Args :
+        rng (None, int, str ou random.Random): le générateur ou sa graine
+
+    Returns :
+        random.Random: le générateur, ou None
+    '''
+    if rng is None or isinstance(rng, random.Random):
+        return rng
+
+    return GenerateurCompteur(rng)
+
+
+def deriver_generateur(rng, *identifiants):
+    '''
+    Retourne un flux indépendant dérivé de rng quand c'est possible (voir
+    GenerateurCompteur.deriver()), sinon un générateur random.Random initialisé
+    par un tirage de rng. Avec rng à None, retourne None.
+    '''
+    if rng is None:
+        return None
+
+    if isinstance(rng, GenerateurCompteur):
+        return rng.deriver(*identifiants)
+
+    return random.Random(rng.getrandbits(64))
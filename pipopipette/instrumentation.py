@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import json
+from time import perf_counter
+
+
+# Bornes supérieures des intervalles des histogrammes de durées, en secondes :
+# 1, 2.5 et 5 fois chaque puissance de 10 de la microseconde à 10 secondes.
+BORNES_DUREES = tuple(float('{}e{}'.format(facteur, exposant)) for exposant in range(-6, 1) for facteur in (1, 2.5, 5)) + (10.0,)
+
+# Bornes des histogrammes de nombres de noeuds de recherche.
+BORNES_NOEUDS = tuple(10 ** exposant for exposant in range(0, 9))
+
+
+class Histogramme:
+    '''
+    Histogramme à intervalles fixes, compatible avec le type histogram de
+    Prometheus : comptes[i] est le nombre d'observations inférieures ou
+    égales à bornes[i] et supérieures à bornes[i - 1], la dernière case
+    comptant les observations au-delà de la dernière borne.
+    '''
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)
+        self.somme = 0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.comptes[bisect.bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def quantile(self, q):
+        '''
+        Estime un quantile par interpolation linéaire dans l'intervalle qui
+        le contient, comme histogram_quantile() de Prometheus.
+
+        Args :
+            q (float): le quantile désiré, entre 0 et 1
+
+        Returns :
+            float: l'estimation du quantile, None s'il n'y a aucune observation
+        '''
+        if self.nombre == 0:
+            return None
+
+        rang = q * self.nombre
+        cumul = 0
+
+        for i, compte in enumerate(self.comptes):
+            if cumul + compte >= rang and compte > 0:
+                if i == len(self.bornes):
+                    return self.bornes[-1]
+
+                borne_inf = self.bornes[i - 1] if i > 0 else 0
+                return borne_inf + (self.bornes[i] - borne_inf) * (rang - cumul) / compte
+
+            cumul += compte
+
+        return self.bornes[-1]
+
+    def exporter(self):
+        return {
+            'bornes': list(self.bornes),
+            'comptes': list(self.comptes),
+            'somme': self.somme,
+            'nombre': self.nombre,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Instrumentation:
+    '''
+    Collecte des mesures de performance sur les parties qui l'utilisent.
+
+    Pour instrumenter une partie, il suffit d'assigner un objet
+    Instrumentation à son attribut instrumentation; une même instrumentation
+    peut être partagée par plusieurs parties. Quand l'attribut est à None
+    (par défaut), le seul coût pour la partie est un test par appel.
+
+    Les mesures sont séparées par couleur de joueur :
+
+        - 'tour' : durée totale de PartiePipopipette.jouer_tour(), affichage
+          et coups invalides compris
+        - 'decision' : durée de Joueur.choisir_coup()
+        - 'application' : durée de PartiePipopipette.jouer_coup()
+        - 'noeuds' : nombre de noeuds de recherche explorés par décision,
+          pour les joueurs qui exposent un attribut n_noeuds_explores mis à
+          jour à chaque appel de choisir_coup()
+    '''
+    NOMS_HISTOGRAMMES = {
+        'tour': ('duree_tour_secondes', 'Durée d\'un tour de jeu.', BORNES_DUREES),
+        'decision': ('duree_decision_secondes', 'Durée du choix d\'un coup par le joueur.', BORNES_DUREES),
+        'application': ('duree_application_secondes', 'Durée de l\'application d\'un coup.', BORNES_DUREES),
+        'noeuds': ('noeuds_par_decision', 'Noeuds de recherche explorés par décision.', BORNES_NOEUDS),
+    }
+
+    PREFIXE = 'pipopipette_'
+
+    def __init__(self):
+        # (nom, couleur) -> Histogramme
+        self.histogrammes = {}
+
+        # (nom, couleur) -> int
+        self.compteurs = {}
+
+    def observer(self, nom, valeur, couleur):
+        '''
+        Ajoute une observation à l'histogramme (nom, couleur).
+
+        Args :
+            nom (str): une clé de Instrumentation.NOMS_HISTOGRAMMES
+            valeur (float): la valeur observée
+            couleur (str): la couleur du joueur concerné
+        '''
+        histogramme = self.histogrammes.get((nom, couleur))
+
+        if histogramme is None:
+            histogramme = Histogramme(Instrumentation.NOMS_HISTOGRAMMES[nom][2])
+            self.histogrammes[(nom, couleur)] = histogramme
+
+        histogramme.observer(valeur)
+
+    def incrementer(self, nom, couleur, valeur=1):
+        self.compteurs[(nom, couleur)] = self.compteurs.get((nom, couleur), 0) + valeur
+
+    def mesurer_decision(self, joueur, planche):
+        '''
+        Appelle joueur.choisir_coup(planche) en mesurant sa durée et, si le
+        joueur l'expose, le nombre de noeuds explorés.
+
+        Args :
+            joueur (Joueur): le joueur qui choisit son coup
+            planche (Planche): la planche sur laquelle il le choisit
+
+        Returns :
+            (int, int, str): le coup choisi par le joueur
+        '''
+        debut = perf_counter()
+        coup = joueur.choisir_coup(planche)
+        self.observer('decision', perf_counter() - debut, joueur.couleur)
+
+        n_noeuds = getattr(joueur, 'n_noeuds_explores', None)
+
+        if n_noeuds is not None:
+            self.observer('noeuds', n_noeuds, joueur.couleur)
+            self.incrementer('noeuds_explores', joueur.couleur, n_noeuds)
+
+        return coup
+
+    async def mesurer_decision_async(self, joueur, planche):
+        '''
+        Version coroutine de mesurer_decision(), qui attend
+        joueur.choisir_coup_async(planche). La durée mesurée inclut le temps
+        passé à attendre, par exemple, le coup d'un joueur distant.
+        '''
+        debut = perf_counter()
+        coup = await joueur.choisir_coup_async(planche)
+        self.observer('decision', perf_counter() - debut, joueur.couleur)
+
+        n_noeuds = getattr(joueur, 'n_noeuds_explores', None)
+
+        if n_noeuds is not None:
+            self.observer('noeuds', n_noeuds, joueur.couleur)
+            self.incrementer('noeuds_explores', joueur.couleur, n_noeuds)
+
+        return coup
+
+    def exporter_dict(self):
+        return {
+            'histogrammes': [dict(nom=nom, couleur=couleur, **histogramme.exporter())
+                             for (nom, couleur), histogramme in sorted(self.histogrammes.items())],
+            'compteurs': [{'nom': nom, 'couleur': couleur, 'valeur': valeur}
+                          for (nom, couleur), valeur in sorted(self.compteurs.items())],
+        }
+
+    def exporter_json(self):
+        '''
+        Returns :
+            str: les mesures au format JSON
+        '''
+        return json.dumps(self.exporter_dict(), indent=2)
+
+    def exporter_prometheus(self):
+        '''
+        Returns :
+            str: les mesures au format texte d'exposition de Prometheus
+        '''
+        lignes = []
+
+        for nom in Instrumentation.NOMS_HISTOGRAMMES:
+            nom_metrique, aide, _ = Instrumentation.NOMS_HISTOGRAMMES[nom]
+            nom_metrique = Instrumentation.PREFIXE + nom_metrique
+            series = [(couleur, histogramme) for (nom_h, couleur), histogramme
+                      in sorted(self.histogrammes.items()) if nom_h == nom]
+
+            if not series:
+                continue
+
+            lignes.append('# HELP {} {}'.format(nom_metrique, aide))
+            lignes.append('# TYPE {} histogram'.format(nom_metrique))
+
+            for couleur, histogramme in series:
+                cumul = 0
+
+                for borne, compte in zip(histogramme.bornes, histogramme.comptes):
+                    cumul += compte
+                    lignes.append('{}_bucket{{couleur="{}",le="{}"}} {}'.format(nom_metrique, couleur, borne, cumul))
+
+                lignes.append('{}_bucket{{couleur="{}",le="+Inf"}} {}'.format(nom_metrique, couleur, histogramme.nombre))
+                lignes.append('{}_sum{{couleur="{}"}} {}'.format(nom_metrique, couleur, histogramme.somme))
+                lignes.append('{}_count{{couleur="{}"}} {}'.format(nom_metrique, couleur, histogramme.nombre))
+
+        for nom in sorted({nom for nom, _ in self.compteurs}):
+            nom_metrique = '{}{}_total'.format(Instrumentation.PREFIXE, nom)
+            lignes.append('# TYPE {} counter'.format(nom_metrique))
+
+            for (nom_c, couleur), valeur in sorted(self.compteurs.items()):
+                if nom_c == nom:
+                    lignes.append('{}{{couleur="{}"}} {}'.format(nom_metrique, couleur, valeur))
+
+        return '\n'.join(lignes) + '\n'
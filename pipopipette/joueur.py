@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from pipopipette.exceptions import ErreurTypeJoueur
+from pipopipette.hasard import obtenir_generateur
+
+
+class Joueur:
+    '''
+    Classe générale de joueur. Vous est fournie.
+    '''
+
+    # Les arguments nommés du constructeur, après la couleur, sans lesquels
+    # le joueur ne peut pas être recréé selon son type (voir creer_joueur())
+    ARGUMENTS_REQUIS = ()
+
+    def __init__(self, couleur, rng=None):
+        '''
+        Le constructeur global de Joueur.
+
+        Args :
+            couleur (str): la couleur qui sera jouée par le joueur.
+            rng (random.Random ou int): le générateur (ou la graine d'un
+                GenerateurCompteur) des choix aléatoires du joueur. Si None,
+                la partie lui attribue un flux dérivé du sien, et à défaut
+                le joueur utilise le générateur global du module random.
+        '''
+        assert couleur in ["bleu", "rouge"], "Piece: couleur invalide."
+
+        self.couleur = couleur
+        self.rng = obtenir_generateur(rng)
+
+    def obtenir_rng(self):
+        '''
+        Returns :
+            random.Random: le générateur des choix aléatoires du joueur, le
+                module random lui-même s'il n'en a pas reçu
+        '''
+        return self.rng if self.rng is not None else random
+
+    def obtenir_type_joueur(self):
+        '''
+        Cette méthode sera implémentée par JoueurHumain et JoueurOrdinateur
+
+        Returns :
+            str: une clé de CLASSES_JOUEURS
+        '''
+        pass
+
+    def choisir_coup(self, planche):
+        '''
+        Cette méthode sera implémentée par JoueurHumain et JoueurOrdinateur.
+
+        Args :
+            planche (Plache): la planche sur laquelle le joueur choisit son coup
+
+        Returns:
+            (int, int, str): L'index du la ligne (le coup) choisi par le joueur.
+        '''
+        pass
+
+    async def choisir_coup_async(self, planche):
+        '''
+        Version awaitable de choisir_coup(), utilisée par
+        PartiePipopipette.jouer_async().
+
+        Par défaut, on appelle simplement choisir_coup(), ce qui convient
+        aux joueurs dont le choix ne bloque pas. Les joueurs qui attendent
+        une entrée ou un autre processus redéfinissent cette méthode pour
+        rendre la main à la boucle d'événements pendant l'attente.
+
+        Args :
+            planche (Plache): la planche sur laquelle le joueur choisit son coup
+
+        Returns:
+            (int, int, str): L'index du la ligne (le coup) choisi par le joueur.
+        '''
+        return self.choisir_coup(planche)
+
+
+class JoueurHumain(Joueur):
+    '''
+    Classe modélisant un joueur humain.
+    '''
+
+    def __init__(self, couleur):
+        '''
+        Cette méthode va construire un objet Joueur et
+        l'initialiser avec la bonne couleur.
+        '''
+        super().__init__(couleur)
+
+    def obtenir_type_joueur(self):
+        return "Humain"
+
+    def choisir_coup(self, planche):
+        '''
+        Demande à l'usager quel coup il désire jouer. Comme un coup est
+        constitué d'une ligne, d'une colonne et d'une orientation, on doit
+        demander chacune des trois valeurs à l'usager.
+
+        On retourne ensuite l'ndex correspondant aux trois valeurs dans l'ordre
+        (ligne, colonne, orientation).
+
+        Args :
+            planche (Plache): la planche sur laquelle le joueur choisit son coup
+
+        Returns:
+            (int, int, str): L'index du la ligne (le coup) choisi par le joueur.
+        '''
+        ligne = int(input("Quel est l'index de la ligne du coup que vous désirez jouer? "))
+        col = int(input("Quel est l'index de la colonne du coup que vous désirez jouer? "))
+        orientation = input("Quelle est l'orientation du coup vous désirez jouer? ")
+
+        return ligne, col, orientation
+
+    async def choisir_coup_async(self, planche):
+        '''
+        Les trois appels à input() de choisir_coup() sont faits dans un fil
+        d'exécution séparé pour ne pas bloquer la boucle d'événements.
+        '''
+        import asyncio
+
+        return await asyncio.to_thread(self.choisir_coup, planche)
+
+
+class JoueurDistant(Joueur):
+    '''
+    Classe modélisant un joueur humain distant, dont les coups arrivent de
+    l'extérieur (par exemple d'une connexion réseau) avec recevoir_coup().
+
+    Ce joueur ne peut être utilisé qu'avec PartiePipopipette.jouer_async().
+    '''
+
+    def __init__(self, couleur):
+        super().__init__(couleur)
+
+        # asyncio n'est importé que par les joueurs qui s'en servent : il
+        # multiplie le temps de démarrage des processus qui importent
+        # pipopipette.joueur.
+        import asyncio
+
+        self.coups_recus = asyncio.Queue()
+
+    def obtenir_type_joueur(self):
+        return "Humain"
+
+    def recevoir_coup(self, coup):
+        '''
+        Transmet au joueur le prochain coup qu'il doit jouer.
+
+        Args :
+            coup (int, int, str): L'index de la ligne à jouer
+        '''
+        self.coups_recus.put_nowait(coup)
+
+    def choisir_coup(self, planche):
+        '''
+        Un joueur distant ne peut pas choisir de coup de façon bloquante :
+        ses coups arrivent pendant que la boucle d'événements tourne.
+
+        Raises :
+            RuntimeError: toujours; utilisez choisir_coup_async(), par
+                exemple avec PartiePipopipette.jouer_async()
+        '''
+        raise RuntimeError('JoueurDistant: utilisez choisir_coup_async() (PartiePipopipette.jouer_async()).')
+
+    async def choisir_coup_async(self, planche):
+        '''
+        Attend le prochain coup reçu avec recevoir_coup().
+        '''
+        return await self.coups_recus.get()
+
+
+class JoueurOrdinateur(Joueur):
+    '''
+    Classe modélisant un joueur ordinateur.
+    '''
+
+    def __init__(self, couleur, rng=None):
+        '''
+        Cette méthode va construire un objet Joueur et
+        l'initialiser avec la bonne couleur et son générateur.
+        '''
+        super().__init__(couleur, rng)
+
+    def obtenir_type_joueur(self):
+        return "Ordinateur"
+
+    def choisir_coup(self, planche):
+        '''
+        Méthode qui va choisir aléatoirement un coup parmi les
+        coups possibles sur la planche. Pensez à utiliser
+        random.choice() et planche.obtenir_coups_possibles() pour
+        vous faciliter la tâche.
+
+        N.B. Vous pouvez sans aucun problème implémenter un
+                joueur ordinateur plus avancé qu'un simple choix
+                aléatoire. Il s'agit seulement du niveau minimum requis.
+
+        Args :
+            planche (Plache): la planche sur laquelle le joueur choisit son coup
+
+        Returns:
+            (int, int, str): L'index du la ligne (le coup) choisi par le joueur.
+        '''
+        return self.obtenir_rng().choice(planche.obtenir_coups_possibles())
+
+
+class JoueurOrdinateurPrudent(JoueurOrdinateur):
+    '''
+    Joueur ordinateur heuristique, à peine plus coûteux que le choix
+    aléatoire de JoueurOrdinateur. À chaque tour, dans l'ordre :
+
+        - il complète une boîte qui a déjà trois côtés, s'il y en a une;
+        - sinon, il joue au hasard un coup « sûr », qui ne trace le
+          troisième côté d'aucune boîte;
+        - sinon, il donne à l'adversaire la plus petite chaîne de boîtes
+          possible.
+
+    Les deux premières règles se vérifient en temps constant par coup grâce
+    aux compteurs de côtés de Planche.cotes_boites. Seule la dernière
+    examine les chaînes de la planche, une fois par décision.
+    '''
+
+    def obtenir_type_joueur(self):
+        return "Prudent"
+
+    def choisir_coup(self, planche):
+        cotes_boites = planche.cotes_boites
+        coups_surs = []
+        coups_possibles = planche.obtenir_coups_possibles()
+
+        for coup in coups_possibles:
+            numeros_boites = planche.numeros_boites_ligne(coup)
+
+            if any(cotes_boites[numero_boite] == 3 for numero_boite in numeros_boites):
+                return coup
+
+            if all(cotes_boites[numero_boite] < 2 for numero_boite in numeros_boites):
+                coups_surs.append(coup)
+
+        if coups_surs:
+            return self.obtenir_rng().choice(coups_surs)
+
+        return self.choisir_plus_petite_chaine(planche, coups_possibles)
+
+    def choisir_plus_petite_chaine(self, planche, coups_possibles):
+        '''
+        Choisit le coup qui donne le moins de boîtes à l'adversaire quand
+        tous les coups tracent le troisième côté d'une boîte.
+
+        Les boîtes à deux côtés sont regroupées en chaînes : deux de ces
+        boîtes sont dans la même chaîne si elles partagent une ligne non
+        jouée. Un coup donne toutes les chaînes des boîtes qui lui touchent.
+
+        Args :
+            planche (Planche): la planche sur laquelle le joueur choisit son coup
+            coups_possibles (List[(int, int, str)]): les coups non joués
+
+        Returns :
+            (int, int, str): le coup choisi
+        '''
+        cotes_boites = planche.cotes_boites
+        topologie = planche.obtenir_topologie()
+
+        # Numéro de chaîne de chaque boîte à deux côtés, par parcours en profondeur
+        chaines = {}
+        tailles_chaines = []
+
+        for depart in range(topologie.n_boites):
+            if cotes_boites[depart] != 2 or depart in chaines:
+                continue
+
+            numero_chaine = len(tailles_chaines)
+            chaines[depart] = numero_chaine
+            a_visiter = [depart]
+            taille = 0
+
+            while a_visiter:
+                numero_boite = a_visiter.pop()
+                taille += 1
+
+                for numero_ligne in topologie.lignes_boites[numero_boite]:
+                    if planche.lignes[topologie.index_lignes[numero_ligne]].jouee:
+                        continue
+
+                    for voisine in topologie.boites_lignes[numero_ligne]:
+                        if cotes_boites[voisine] == 2 and voisine not in chaines:
+                            chaines[voisine] = numero_chaine
+                            a_visiter.append(voisine)
+
+            tailles_chaines.append(taille)
+
+        def boites_donnees(coup):
+            numeros_chaines = {chaines[numero_boite] for numero_boite in planche.numeros_boites_ligne(coup)
+                               if numero_boite in chaines}
+
+            return sum(tailles_chaines[numero_chaine] for numero_chaine in numeros_chaines)
+
+        return min(coups_possibles, key=boites_donnees)
+
+
+class JoueurOrdinateurParfait(JoueurOrdinateur):
+    '''
+    Joueur ordinateur qui joue parfaitement à l'aide d'une table rétrograde
+    (voir pipopipette.retrograde) : chaque coup possible est évalué par une
+    lecture dans la table, et le joueur choisit au hasard parmi les
+    meilleurs.
+    '''
+    ARGUMENTS_REQUIS = ('table',)
+
+    def __init__(self, couleur, table, rng=None):
+        '''
+        Args :
+            couleur (str): la couleur qui sera jouée par le joueur.
+            table (TableRetrograde): la table des planches de la partie
+            rng (random.Random ou int): voir Joueur
+        '''
+        super().__init__(couleur, rng)
+
+        self.table = table
+
+    def obtenir_type_joueur(self):
+        return "Parfait"
+
+    def choisir_coup(self, planche):
+        evaluations = self.table.evaluer_coups(planche)
+        meilleure = max(evaluations.values())
+
+        return self.obtenir_rng().choice([coup for coup, valeur in evaluations.items() if valeur == meilleure])
+
+
+class JoueurOrdinateurRecherche(JoueurOrdinateur):
+    '''
+    Joueur ordinateur qui choisit ses coups par une recherche de profondeur
+    fixe dont les feuilles sont évaluées par lots par un modèle appris (voir
+    EvaluateurLots.rechercher() dans pipopipette.evaluateur).
+    '''
+    ARGUMENTS_REQUIS = ('evaluateur',)
+
+    def __init__(self, couleur, evaluateur, profondeur=2, largeur=None, rng=None):
+        '''
+        Args :
+            couleur (str): la couleur qui sera jouée par le joueur.
+            evaluateur (EvaluateurLots): l'évaluateur des planches de la partie
+            profondeur (int): le nombre de coups développés par recherche
+            largeur (int): le nombre maximal de coups développés par position,
+                choisis selon la politique du modèle, tous si None
+            rng (random.Random ou int): voir Joueur
+        '''
+        super().__init__(couleur, rng)
+
+        self.evaluateur = evaluateur
+        self.profondeur = profondeur
+        self.largeur = largeur
+
+        # Nombre de positions explorées par la dernière recherche, puis en tout
+        self.n_noeuds_explores = 0
+        self.n_noeuds_explores_total = 0
+
+    def obtenir_type_joueur(self):
+        return "Recherche"
+
+    def choisir_coup(self, planche):
+        evaluations, self.n_noeuds_explores = self.evaluateur.rechercher(planche, self.couleur,
+                                                                         self.profondeur, self.largeur)
+        self.n_noeuds_explores_total += self.n_noeuds_explores
+        meilleure = max(evaluations.values())
+
+        return self.obtenir_rng().choice([coup for coup, valeur in evaluations.items() if valeur == meilleure])
+
+
+# Type de joueur (voir Joueur.obtenir_type_joueur()) -> classe du joueur. La
+# partie, le serveur, la ligne de commande et les parties distribuées en
+# dérivent leurs listes de types.
+CLASSES_JOUEURS = {
+    'Humain': JoueurHumain,
+    'Ordinateur': JoueurOrdinateur,
+    'Prudent': JoueurOrdinateurPrudent,
+    'Parfait': JoueurOrdinateurParfait,
+    'Recherche': JoueurOrdinateurRecherche,
+}
+
+# Les types qui se créent à partir de la seule couleur
+TYPES_JOUEURS = [type_joueur for type_joueur, classe in CLASSES_JOUEURS.items() if not classe.ARGUMENTS_REQUIS]
+
+
+def creer_joueur(type_joueur, couleur, arguments=None):
+    '''
+    Crée un joueur selon son type.
+
+    Args :
+        type_joueur (str): le type du joueur, une clé de CLASSES_JOUEURS
+        couleur (str): la couleur qui sera jouée par le joueur
+        arguments (dict): type de joueur -> arguments nommés de son
+            constructeur, par exemple {'Parfait': {'table': table}} ou
+            {'Recherche': {'evaluateur': evaluateur, 'profondeur': 3}}. Les
+            arguments de Joueur.ARGUMENTS_REQUIS doivent y être.
+
+    Returns :
+        Joueur: le nouveau joueur
+
+    Raises :
+        ErreurTypeJoueur: si le type est inconnu ou qu'un argument requis
+            par sa classe manque
+    '''
+    if type_joueur not in CLASSES_JOUEURS:
+        raise ErreurTypeJoueur('Type de joueur inconnu : {}'.format(type_joueur))
+
+    classe = CLASSES_JOUEURS[type_joueur]
+    arguments_type = (arguments or {}).get(type_joueur, {})
+    manquants = [nom for nom in classe.ARGUMENTS_REQUIS if nom not in arguments_type]
+
+    if manquants:
+        raise ErreurTypeJoueur('Le joueur de type {} nécessite les arguments : {}'.format(type_joueur,
+                                                                                          ', '.join(manquants)))
+
+    return classe(couleur, **arguments_type)
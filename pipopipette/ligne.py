@@ -13,6 +13,16 @@ class Ligne:
     def __init__(self):
         self.jouee = False
 
+    def copier(self):
+        '''
+        Retourne une nouvelle ligne dans le même état, sans repasser par
+        le constructeur.
+        '''
+        copie = Ligne.__new__(Ligne)
+        copie.jouee = self.jouee
+
+        return copie
+
     def couleur_affichage(self):
         '''
         Nécessaire pour le TP4, NE PAS MODIFIER.
@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from time import perf_counter
+
+from pipopipette.etat_planche import etat_depuis_chaine
+from pipopipette.exceptions import ErreurClicCoup
+from pipopipette.hasard import obtenir_generateur, deriver_generateur
+from pipopipette.planche import Planche
+from pipopipette.joueur import CLASSES_JOUEURS, TYPES_JOUEURS, JoueurHumain, creer_joueur
+
+
+class PartiePipopipette:
+    def __init__(self, nom_fichier=None, joueur_rouge=None, joueur_bleu=None, n_boites_h=None, n_boites_v=None,
+                 rng=None, arguments_joueurs=None):
+        '''
+        Méthode d'initialisation d'une partie de pipopipette.
+
+        Args:
+            nom_fichier (str ou fichier texte): Si présent, la partie est
+                chargée à partir de ce fichier ou de ce tampon en mémoire
+                (voir charger()) plutôt que créée vide.
+            joueur_rouge (Joueur): Si présent, le joueur rouge de la
+                nouvelle partie (voir initialiser_joueurs()).
+            joueur_bleu (Joueur): Si présent, le joueur bleu de la
+                nouvelle partie (voir initialiser_joueurs()).
+            n_boites_h (int): Si présent, le nombre de rangées de boîtes de
+                la planche de la nouvelle partie.
+            n_boites_v (int): Si présent, le nombre de colonnes de boîtes de
+                la planche de la nouvelle partie.
+            rng (random.Random ou int): Si présent, le générateur de la
+                partie ou sa graine (voir pipopipette.hasard). Chaque joueur
+                qui n'a pas son propre générateur reçoit un flux dérivé de
+                celui-ci selon sa couleur, de sorte que la partie se rejoue
+                à l'identique avec la même graine.
+            arguments_joueurs (dict): Si présent, type de joueur ->
+                arguments nommés de son constructeur, pour recréer les
+                joueurs qui en ont besoin (voir creer_joueur_selon_type()),
+                par exemple {'Parfait': {'table': table}}.
+        '''
+        self.gagnant_partie = None
+        self.arguments_joueurs = arguments_joueurs
+        self.rng = obtenir_generateur(rng)
+        self.partie_nulle = False
+
+        # Liste des (coup, couleur) joués depuis le début de la partie
+        self.historique_coups = []
+
+        # Voir pipopipette.instrumentation.Instrumentation
+        self.instrumentation = None
+
+        # La planche est affichée tous les intervalle_affichage coups; si 0,
+        # ni la planche ni les messages ne le sont (voir jouer())
+        self.intervalle_affichage = 1
+
+        if nom_fichier is not None:
+            # charger() construit lui-même la planche à partir de la sauvegarde.
+            self.charger(nom_fichier)
+        else:
+            self.planche = Planche(n_boites_h, n_boites_v)
+            self.initialiser_joueurs(joueur_rouge, joueur_bleu)
+
+    def initialiser_joueurs(self, joueur_rouge=None, joueur_bleu=None):
+        '''
+        On initialise ici quatre attributs : joueur_rouge,
+        joueur_bleu, joueur_courant et couleur_joueur_courant.
+
+        Pour créer les objets joueur_rouge et joueur_bleu, faites
+        appel à creer_joueur().
+
+        joueur_courant est initialisé par défaut au joueur_rouge
+        et couleur_joueur_courant est initialisée à 'rouge'.
+
+        Pycharm vous sortira probablement des messages d'erreur à
+        cette fonction car vous initialisez des attributs en
+        dehors de la fonction __init__(), mais vous pouvez les
+        ignorer.
+
+        Args:
+            joueur_rouge (Joueur): Le joueur rouge, JoueurHumain('rouge')
+                par défaut.
+            joueur_bleu (Joueur): Le joueur bleu, JoueurHumain('bleu')
+                par défaut.
+        '''
+        self.joueur_rouge = joueur_rouge if joueur_rouge is not None else JoueurHumain('rouge')
+
+        self.joueur_bleu = joueur_bleu if joueur_bleu is not None else JoueurHumain('bleu')
+
+        self.attribuer_generateurs()
+
+        self.joueur_courant = self.joueur_rouge
+
+        self.couleur_joueur_courant = 'rouge'
+
+    def attribuer_generateurs(self):
+        '''
+        Donne à chaque joueur sans générateur propre le flux de la partie
+        dérivé selon sa couleur (voir hasard.deriver_generateur()). Sans
+        générateur de partie, les joueurs gardent le générateur global.
+        '''
+        for joueur in [self.joueur_rouge, self.joueur_bleu]:
+            if getattr(joueur, 'rng', None) is None:
+                joueur.rng = deriver_generateur(self.rng, joueur.couleur)
+
+    def creer_joueur(self, couleur):
+        '''
+        Demande à l'usager quel type de joueur (parmi
+        joueur.TYPES_JOUEURS) il désire pour le joueur de la couleur
+        en entrée.
+
+        Tant que l'entrée n'est pas valide, on continue de
+        demander à l'utilisateur.
+
+        Faites appel à self.creer_joueur_selon_type() pour créer
+        le joueur lorsque vous aurez un type valide.
+
+        Args :
+            couleur (str): la couleur pour laquelle on veut le type
+                de joueur.
+
+        Returns :
+            Joueur : Un objet Joueur de la classe du type entré (voir
+                joueur.CLASSES_JOUEURS).
+        '''
+        choix = ', '.join(TYPES_JOUEURS)
+
+        type_joueur = input('Quel type de joueur désirez-vous pour la couleur '
+                            '{} ? Entrez {}: '.format(couleur, choix))
+
+        while type_joueur not in TYPES_JOUEURS:
+            type_joueur = input('Le type entré est invalide. ' 'Les choix sont {}: '.format(choix))
+
+        return self.creer_joueur_selon_type(type_joueur, couleur)
+
+    def creer_joueur_selon_type(self, type_joueur, couleur):
+        '''
+        Crée l'objet Joueur approprié, selon le type passé en
+        paramètre (voir joueur.creer_joueur()). Les types dont le
+        constructeur a des arguments requis, comme 'Parfait', les
+        trouvent dans self.arguments_joueurs.
+
+        Args :
+            type (str): le type de joueur, une clé de
+                joueur.CLASSES_JOUEURS
+            couleur (str): la couleur du pion joué par le joueur,
+                'rouge' ou 'bleu'.
+
+        Returns :
+            Joueur: Un objet de la classe du type, JoueurHumain si le type
+                est inconnu.
+
+        Raises :
+            ErreurTypeJoueur: si self.arguments_joueurs ne contient pas les
+                arguments requis par le type.
+        '''
+        if type_joueur not in CLASSES_JOUEURS:
+            return JoueurHumain(couleur)
+
+        return creer_joueur(type_joueur, couleur, self.arguments_joueurs)
+
+    def jouer(self, intervalle_affichage=1):
+        '''
+        Méthode représentant la boucle principale de jeu.
+
+        Celle-ci fonctionne comme une boucle infinie. Pour chaque
+        itération, on joue un tour et si la partie est terminée,
+        on quitte la boucle.
+
+        Quand on sort de la boucle principale, on fait afficher le
+        message de fin de la partie
+
+        Utilisez les fonctions partie_terminee(), jouer_tour() et
+        message_fin_partie() pour vous faciliter la tâche.
+
+        Args :
+            intervalle_affichage (int): la planche est affichée au début
+                de la partie puis tous les intervalle_affichage coups, et
+                toujours en fin de partie; avec 0, ni la planche ni les
+                messages de la partie ne sont affichés. Sur les grandes
+                planches, l'affichage domine la durée d'une partie en console.
+        '''
+        self.intervalle_affichage = intervalle_affichage
+
+        self.afficher_message()
+        self.afficher_message('Début de la partie !')
+        self.afficher_planche(force=True)
+
+        while not self.partie_terminee():
+            self.jouer_tour()
+
+        self.afficher_planche(force=True, deja_affichee=True)
+        self.afficher_message(self.message_fin_partie())
+
+    def afficher_message(self, *message):
+        '''
+        Écrit un message de la partie avec print(), sauf si
+        self.intervalle_affichage vaut 0.
+        '''
+        if self.intervalle_affichage:
+            print(*message)
+
+    def afficher_planche(self, force=False, deja_affichee=False):
+        '''
+        Écrit la planche sur la sortie standard (voir Planche.ecrire())
+        selon self.intervalle_affichage : après chaque coup dont le numéro
+        en est un multiple, ou dès que force est True.
+
+        Args :
+            force (bool): afficher la planche même entre deux intervalles
+            deja_affichee (bool): avec force, ne pas réafficher la planche
+                si elle vient de l'être au dernier coup
+        '''
+        if not self.intervalle_affichage:
+            return
+
+        a_jour = len(self.historique_coups) % self.intervalle_affichage == 0
+
+        if (force and not (deja_affichee and a_jour)) or (not force and a_jour):
+            self.planche.ecrire(sys.stdout)
+            sys.stdout.write('\n')
+
+    def jouer_tour(self):
+        '''
+        Cette méthode commence par afficher à quel joueur c'est
+        le tour de jouer et faire imprimer l'état de la planche avec
+        self.afficher_planche().
+
+        On va ensuite chercher le coup choisi par le joueur courant
+        avec la méthode choisir_coup() de Joueur en lui passant la
+        planche de jeu courante (self.planche). Tant que le coup choisi
+        par un joueur n'est pas valide, on affiche la raison de
+        l'invalidité du coup et on redemande au joueur de choisir un
+        coup. Voir les commentaires de la méthode valider_coup() de Planche
+        pour plus de détails.
+
+        On finit par jouer le coup (validé) avec la méthode self.jouer_coup().
+
+        Si self.instrumentation n'est pas None, on y enregistre la durée
+        du tour (voir Instrumentation).
+        '''
+        if self.instrumentation is not None:
+            debut = perf_counter()
+            couleur = self.couleur_joueur_courant
+
+        self.afficher_message("C'est au tour du joueur {} de jouer.".format(self.couleur_joueur_courant))
+
+        coup = self.demander_coup()
+        coup_valide, message = self.planche.valider_coup(coup)
+
+        while not coup_valide:
+            self.afficher_message('Coup invalide !', message)
+            coup = self.demander_coup()
+            coup_valide, message = self.planche.valider_coup(coup)
+
+        self.jouer_coup(coup)
+
+        self.afficher_planche()
+
+        if self.instrumentation is not None:
+            self.instrumentation.observer('tour', perf_counter() - debut, couleur)
+
+    def demander_coup(self):
+        '''
+        Demande son coup au joueur courant avec sa méthode choisir_coup(),
+        en passant par self.instrumentation si elle est présente.
+
+        Returns:
+            (int, int, str): Le coup choisi par le joueur courant.
+        '''
+        if self.instrumentation is None:
+            return self.joueur_courant.choisir_coup(self.planche)
+
+        return self.instrumentation.mesurer_decision(self.joueur_courant, self.planche)
+
+    async def jouer_async(self, intervalle_affichage=1):
+        '''
+        Version coroutine de jouer() : chaque coup est obtenu avec la
+        méthode choisir_coup_async() du joueur courant, de sorte que
+        plusieurs parties peuvent être menées sur une même boucle
+        d'événements pendant que leurs joueurs réfléchissent ou attendent
+        un coup distant.
+        '''
+        self.intervalle_affichage = intervalle_affichage
+
+        self.afficher_message()
+        self.afficher_message('Début de la partie !')
+        self.afficher_planche(force=True)
+
+        while not self.partie_terminee():
+            await self.jouer_tour_async()
+
+        self.afficher_planche(force=True, deja_affichee=True)
+        self.afficher_message(self.message_fin_partie())
+
+    async def jouer_tour_async(self):
+        '''
+        Version coroutine de jouer_tour(). Voir jouer_async().
+        '''
+        if self.instrumentation is not None:
+            debut = perf_counter()
+            couleur = self.couleur_joueur_courant
+
+        self.afficher_message("C'est au tour du joueur {} de jouer.".format(self.couleur_joueur_courant))
+
+        coup = await self.demander_coup_async()
+        coup_valide, message = self.planche.valider_coup(coup)
+
+        while not coup_valide:
+            self.afficher_message('Coup invalide !', message)
+            coup = await self.demander_coup_async()
+            coup_valide, message = self.planche.valider_coup(coup)
+
+        self.jouer_coup(coup)
+
+        self.afficher_planche()
+
+        if self.instrumentation is not None:
+            self.instrumentation.observer('tour', perf_counter() - debut, couleur)
+
+    async def demander_coup_async(self):
+        '''
+        Version coroutine de demander_coup(), qui attend la méthode
+        choisir_coup_async() du joueur courant.
+
+        Returns:
+            (int, int, str): Le coup choisi par le joueur courant.
+        '''
+        if self.instrumentation is None:
+            return await self.joueur_courant.choisir_coup_async(self.planche)
+
+        return await self.instrumentation.mesurer_decision_async(self.joueur_courant, self.planche)
+
+    def jouer_coup(self, coup):
+        '''
+        Joue un coup sur la planche, fait la mise à jour de l'état
+        des boîtes et change de joueur au besoin (si aucune boîte
+        n'a été remplie en jouant le coup).
+
+        Faites appel aux méthodes jouer_coup() et maj_boites() de
+        Planche ainsi qu'à self.changer_joueur()
+
+        Si self.instrumentation n'est pas None, on y enregistre la durée
+        de l'application du coup (voir Instrumentation).
+
+        Args:
+            coup (int, int, str): L'index de la ligne à jouer
+
+        Raises:
+            ErreurClicCoup: si le coup est invalide (voir Planche.valider_coup()).
+                Rien n'est alors joué.
+        '''
+        if self.instrumentation is not None:
+            debut = perf_counter()
+            couleur = self.couleur_joueur_courant
+
+        coup_valide, message = self.planche.valider_coup(coup)
+
+        if not coup_valide:
+            raise ErreurClicCoup(message)
+
+        self.planche.jouer_coup(coup, self.couleur_joueur_courant)
+        self.historique_coups.append((coup, self.couleur_joueur_courant))
+
+        if not self.planche.maj_boites():
+            self.changer_joueur()
+
+        if self.instrumentation is not None:
+            self.instrumentation.observer('application', perf_counter() - debut, couleur)
+            self.instrumentation.incrementer('coups', couleur)
+
+    def partie_terminee(self):
+        '''
+        Méthode vérifiant si la partie est terminée.
+
+        Pour savoir si la planche de jeu est pleine, on peut
+        directement faire appel à self.planche.est_pleine(). Si
+        la planche est pleine, c'est que la partie est terminée.
+
+        Il faut alors savoir qui est le gagnant de la partie.
+        Pour obtenir le nombre de boîtes remplies par chacun
+        des joueurs, faites appel à la fonction bilan_boites()
+        de l'attribut self.planche. On assigne la couleur du
+        joueur gagnant (celui avec le plus de boîtes) à l'attribut
+        self.gagnant_partie.
+
+        Returns :
+            True si la partie est terminée, False sinon
+        '''
+        if self.planche.est_pleine():
+            n_boites_bleu, n_boites_rouge = self.planche.bilan_boites()
+
+            if n_boites_rouge > n_boites_bleu:
+                self.gagnant_partie = 'rouge'
+            else:
+                self.gagnant_partie = 'bleu'
+
+            return True
+
+        return False
+
+    def changer_joueur(self):
+        '''
+        En fonction de la couleur du joueur courant, met à
+        jour les attributs joueur_courant et couleur_joueur_courant.
+        '''
+        if self.couleur_joueur_courant == 'rouge':
+            self.joueur_courant = self.joueur_bleu
+            self.couleur_joueur_courant = 'bleu'
+        else:
+            self.joueur_courant = self.joueur_rouge
+            self.couleur_joueur_courant = 'rouge'
+
+    def message_fin_partie(self):
+        '''
+        Méthode qui gère le comportement de fin de partie.
+
+        On retourne un message approprié pour féliciter le gagnant.
+        Le joueur gagnant est contenu dans l'attribut
+        self.gagnant_partie.
+
+        Returns:
+            str: le message de félicitations du gagnant de la partie.
+        '''
+        return 'Le gagnant de la partie est le joueur {} !'.format(self.gagnant_partie)
+
+    def convertir_historique_en_chaine(self):
+        '''
+        Retourne une chaîne de caractères contenant la séquence des coups
+        joués depuis le début de la partie, à raison d'une entrée
+        ligne,colonne,orientation,couleur\n par coup.
+
+        Returns:
+            str: La chaîne de caractères représentant l'historique.
+        '''
+        return ''.join('{},{},{},{}\n'.format(ligne, col, orientation, couleur)
+                       for (ligne, col, orientation), couleur in self.historique_coups)
+
+    def sauvegarder(self, nom_fichier):
+        '''
+        Sauvegarde une partie dans un fichier. Le fichier
+        contiendra:
+        - Une ligne indiquant la couleur du joueur courant.
+        - Une ligne contenant le type du joueur rouge.
+        - Une ligne contenant le type du joueur bleu.
+        - Une ligne contenant les dimensions de la planche, sous la forme
+          "n_boites_h,n_boites_v".
+        - Le reste des lignes correspondant aux lignes et aux boîtes. Voir la
+          méthode convertir_en_chaine() de la planche pour le
+          format.
+
+        Faites appel à la fonction obtenir_type_joueur() de
+        la classe Joueur pour savoir le type d'un Joueur.
+
+        Args :
+            nom_fichier, le string du nom du fichier où sauvegarder, ou un
+                objet fichier texte déjà ouvert (par exemple un io.StringIO).
+        '''
+        if hasattr(nom_fichier, 'write'):
+            self._ecrire_sauvegarde(nom_fichier)
+        else:
+            with open(nom_fichier, 'w') as f:
+                self._ecrire_sauvegarde(f)
+
+    def _ecrire_sauvegarde(self, f):
+        f.write('{}\n'.format(self.couleur_joueur_courant))
+        f.write('{}\n'.format(self.joueur_rouge.obtenir_type_joueur()))
+        f.write('{}\n'.format(self.joueur_bleu.obtenir_type_joueur()))
+        f.write('{},{}\n'.format(self.planche.N_BOITES_H, self.planche.N_BOITES_V))
+        f.write(self.planche.convertir_en_chaine())
+
+    def charger(self, nom_fichier):
+        '''
+        Charge une partie à partir d'un fichier. Le fichier
+        a le même format que la méthode de sauvegarde.
+
+        Les joueurs sont recréés selon les types sauvegardés avec
+        self.creer_joueur_selon_type(), et la planche est construite une
+        seule fois puis remplie directement à partir de la sauvegarde.
+        L'historique des coups n'étant pas sauvegardé, il repart à vide.
+        Les joueurs dont le constructeur a des arguments requis, comme la
+        TableRetrograde d'un joueur 'Parfait' ou l'EvaluateurLots d'un
+        joueur 'Recherche', les reçoivent de self.arguments_joueurs.
+
+        Pycharm vous sortira probablement des messages d'erreur à
+        cette fonction car vous initialisez des attributs en
+        dehors de la fonction __init__(), mais vous pouvez les
+        ignorer.
+
+        Args:
+            nom_fichier (str ou fichier texte): Le nom du fichier à charger,
+                ou un objet fichier texte déjà ouvert (par exemple un
+                io.StringIO), ce qui évite de passer par le disque.
+
+        Raises :
+            ErreurTypeJoueur: si un joueur sauvegardé ne peut pas être
+                recréé (voir creer_joueur_selon_type()).
+        '''
+        if hasattr(nom_fichier, 'read'):
+            self._lire_sauvegarde(nom_fichier)
+        else:
+            with open(nom_fichier) as f:
+                self._lire_sauvegarde(f)
+
+    def _lire_sauvegarde(self, f):
+        self.couleur_joueur_courant = f.readline().rstrip('\n')
+        type_joueur_rouge = f.readline().rstrip('\n')
+        type_joueur_bleu = f.readline().rstrip('\n')
+
+        self.joueur_rouge = self.creer_joueur_selon_type(type_joueur_rouge, 'rouge')
+        self.joueur_bleu = self.creer_joueur_selon_type(type_joueur_bleu, 'bleu')
+        self.attribuer_generateurs()
+
+        if self.couleur_joueur_courant == 'rouge':
+            self.joueur_courant = self.joueur_rouge
+        else:
+            self.joueur_courant = self.joueur_bleu
+
+        # Les anciennes sauvegardes n'ont pas de ligne de dimensions : la
+        # planche y fait toujours Planche.N_BOITES_H x Planche.N_BOITES_V et
+        # la quatrième ligne est déjà une ligne de la planche.
+        ligne_dimensions = f.readline()
+        dimensions = ligne_dimensions.rstrip('\n').split(',')
+
+        if len(dimensions) == 2:
+            n_boites_h, n_boites_v = int(dimensions[0]), int(dimensions[1])
+            chaine = f.read()
+        else:
+            n_boites_h, n_boites_v = Planche.N_BOITES_H, Planche.N_BOITES_V
+            chaine = ligne_dimensions + f.read()
+
+        # La sauvegarde est décodée directement en état de planche, chargé
+        # en une passe sur les lignes et les boîtes.
+        self.planche = Planche.depuis_etat(etat_depuis_chaine(n_boites_h, n_boites_v, chaine))
+
+        self.historique_coups = []
+        self.gagnant_partie = None
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import io
+from functools import lru_cache
+
 from pipopipette.ligne import Ligne
 from pipopipette.boite import Boite
-from pipopipette.exceptions import ErreurClicCoup
-from tkinter import messagebox
+from pipopipette.topologie import Topologie, obtenir_topologie, hash_position
+from pipopipette.etat_planche import EtatPlanche, DeltaPlanche
 
 
 class Planche:
@@ -45,15 +48,32 @@ class Planche:
     N_BOITES_V = 3
     N_BOITES_H = 3
 
-    def __init__(self):
+    def __init__(self, n_boites_h=None, n_boites_v=None):
         '''
         Méthode spéciale initialisant une nouvelle planche.
+
+        Args :
+            n_boites_h (int): Si présent, le nombre de rangées de boîtes de
+                cette planche seulement, à la place de Planche.N_BOITES_H.
+            n_boites_v (int): Si présent, le nombre de colonnes de boîtes de
+                cette planche seulement, à la place de Planche.N_BOITES_V.
         '''
+        if n_boites_h is not None:
+            self.N_BOITES_H = n_boites_h
+
+        if n_boites_v is not None:
+            self.N_BOITES_V = n_boites_v
+
         self.initialisation_par_defaut()
 
         self.position_dernier_coup = None
         self.couleur_dernier_coup = None
 
+        # Flux des changements (voir abonner()) : le numéro du dernier
+        # changement et les fonctions à appeler à chaque changement.
+        self.numero_sequence = 0
+        self.abonnes = []
+
     def initialisation_par_defaut(self):
         '''
         Méthode initialisant les dictionnaires de lignes et de boîtes
@@ -61,6 +81,7 @@ class Planche:
         '''
         self.initialiser_lignes()
         self.initialiser_boites()
+        self.initialiser_cotes_boites()
 
     def initialiser_lignes(self):
         '''
@@ -99,16 +120,16 @@ class Planche:
         self.lignes = {}
 
         # Ligne verticale à droite
-        for ligne in range(Planche.N_BOITES_H):
-            self.lignes[(ligne, Planche.N_BOITES_V, 'V')] = Ligne()
+        for ligne in range(self.N_BOITES_H):
+            self.lignes[(ligne, self.N_BOITES_V, 'V')] = Ligne()
 
         # Ligne horizontale du bas
-        for col in range(Planche.N_BOITES_V):
-            self.lignes[(Planche.N_BOITES_H, col, 'H')] = Ligne()
+        for col in range(self.N_BOITES_V):
+            self.lignes[(self.N_BOITES_H, col, 'H')] = Ligne()
 
         # Lignes de base
-        for col in range(Planche.N_BOITES_V):
-            for ligne in range(Planche.N_BOITES_H):
+        for col in range(self.N_BOITES_V):
+            for ligne in range(self.N_BOITES_H):
                 for orientation in ['H', 'V']:
                     self.lignes[(ligne, col, orientation)] = Ligne()
 
@@ -137,10 +158,43 @@ class Planche:
         '''
         self.boites = {}
 
-        for col in range(Planche.N_BOITES_V):
-            for ligne in range(Planche.N_BOITES_H):
+        for col in range(self.N_BOITES_V):
+            for ligne in range(self.N_BOITES_H):
                 self.boites[(ligne, col)] = Boite()
 
+    def initialiser_cotes_boites(self):
+        '''
+        Méthode d'initialisation de self.cotes_boites, le nombre de côtés
+        joués de chaque boîte, indexé par le numéro de la boîte dans la
+        topologie (voir Topologie). Ces compteurs sont tenus à jour par
+        jouer_coup() et par les méthodes de chargement, ce qui permet de
+        connaître l'effet d'un coup sur les boîtes qui lui touchent sans
+        appeler compter_lignes_jouees_boite().
+        '''
+        self.cotes_boites = bytearray(self.N_BOITES_H * self.N_BOITES_V)
+
+    def recalculer_cotes_boites(self):
+        '''
+        Recalcule self.cotes_boites à partir des lignes jouées, après un
+        chargement qui modifie directement les lignes.
+        '''
+        topologie = self.obtenir_topologie()
+        masque = self.obtenir_masque_lignes()
+
+        self.cotes_boites = bytearray(bin(masque & masque_boite).count('1') for masque_boite in topologie.masques_boites)
+
+    def numeros_boites_ligne(self, index_ligne):
+        '''
+        Args :
+            index_ligne (int, int, str): l'index d'une ligne de la planche
+
+        Returns :
+            tuple: les numéros (voir Topologie) des boîtes qui touchent à la ligne
+        '''
+        topologie = self.obtenir_topologie()
+
+        return topologie.boites_lignes[topologie.numeros_lignes[index_ligne]]
+
     def coup_dans_les_limites(self, index_ligne):
         '''
         Vérifie si un coup est dans les limites de la planche.
@@ -189,6 +243,8 @@ class Planche:
           en entrée couleur et index_ligne, respectivement
         - Mettre à jour l'attribut jouee de la ligne située à
           l'index joué
+        - Si la ligne n'était pas déjà jouée, ajouter un côté joué aux
+          boîtes qui lui touchent dans self.cotes_boites
 
         Args :
             index_ligne (int, int, str): L'index de la ligne jouée
@@ -197,7 +253,13 @@ class Planche:
         self.couleur_dernier_coup = couleur
         self.position_dernier_coup = index_ligne
 
-        self.lignes[index_ligne].jouee = True
+        ligne = self.lignes[index_ligne]
+
+        if not ligne.jouee:
+            for numero_boite in self.numeros_boites_ligne(index_ligne):
+                self.cotes_boites[numero_boite] += 1
+
+        ligne.jouee = True
 
     def valider_coup(self, index_ligne):
         '''
@@ -228,18 +290,14 @@ class Planche:
 
             str: message d'erreur approprié si le coup est invalide, None sinon
         '''
-        try:
-            if index_ligne[2] not in ['H', 'V']:
-                return False, "L'orientation de la ligne doit être 'H' ou 'V' !"
-
-            if not self.coup_dans_les_limites(index_ligne):
-                raise ErreurClicCoup('Vous avez cliqué hors des limites !')
+        if index_ligne[2] not in ['H', 'V']:
+            return False, "L'orientation de la ligne doit être 'H' ou 'V' !"
 
-            if self.lignes[(index_ligne)].jouee:
-                raise ErreurClicCoup('Cette ligne a déjà été jouée !')
+        if not self.coup_dans_les_limites(index_ligne):
+            return False, 'Le coup est hors des limites !'
 
-        except ErreurClicCoup as e:
-            messagebox.showwarning('Erreur !', e)
+        if self.lignes[(index_ligne)].jouee:
+            return False, 'Cette ligne a déjà été jouée !'
 
         return True, None
 
@@ -267,7 +325,44 @@ class Planche:
         '''
         idx_boites_a_valider = self.obtenir_idx_boites_a_valider()
 
-        return self.valider_boites(idx_boites_a_valider)
+        if not self.abonnes:
+            self.numero_sequence += 1
+
+            return self.valider_boites(idx_boites_a_valider)
+
+        pleines_avant = [self.boites[idx].pleine for idx in idx_boites_a_valider]
+        changement = self.valider_boites(idx_boites_a_valider)
+
+        self.numero_sequence += 1
+        self.publier(DeltaPlanche(self.numero_sequence, self.position_dernier_coup, self.couleur_dernier_coup,
+                                  tuple(idx for idx, pleine in zip(idx_boites_a_valider, pleines_avant)
+                                        if not pleine and self.boites[idx].pleine)))
+
+        return changement
+
+    def abonner(self, fonction):
+        '''
+        Abonne une fonction au flux des changements de la planche. Après
+        chaque coup (à la fin de maj_boites()), la fonction reçoit un
+        DeltaPlanche : la ligne jouée, la couleur du joueur et les boîtes
+        remplies par le coup. Après un chargement qui remplace tout l'état
+        de la planche (charger_etat(), charger_dune_chaine()), elle reçoit
+        None, et l'abonné doit relire l'état avec obtenir_etat().
+
+        Chaque changement incrémente self.numero_sequence, qui est aussi le
+        numéro de séquence des deltas.
+
+        Args :
+            fonction (Callable[[DeltaPlanche], None]): la fonction à appeler
+        '''
+        self.abonnes.append(fonction)
+
+    def desabonner(self, fonction):
+        self.abonnes.remove(fonction)
+
+    def publier(self, delta):
+        for fonction in list(self.abonnes):
+            fonction(delta)
 
     def obtenir_idx_boites_a_valider(self):
         '''
@@ -416,6 +511,167 @@ class Planche:
 
         return n_boites_bleues, n_boites_rouges
 
+    def obtenir_topologie(self):
+        '''
+        Retourne la topologie (numérotation canonique des lignes et des
+        boîtes) partagée par toutes les planches de cette taille.
+
+        Returns :
+            Topologie: la topologie de la planche
+        '''
+        return obtenir_topologie(self.N_BOITES_H, self.N_BOITES_V)
+
+    def obtenir_masque_lignes(self):
+        '''
+        Retourne un entier dont le bit i est à 1 si la ligne numéro i de
+        la topologie est jouée.
+
+        Returns :
+            int: le masque des lignes jouées
+        '''
+        topologie = self.obtenir_topologie()
+        masque = 0
+
+        for idx, ligne in self.lignes.items():
+            if ligne.jouee:
+                masque |= 1 << topologie.numeros_lignes[idx]
+
+        return masque
+
+    def obtenir_couleurs_boites(self):
+        '''
+        Retourne la couleur de chacune des boîtes, dans l'ordre canonique
+        de la topologie, sous forme d'une chaîne d'octets (voir
+        Topologie.CODES_COULEURS).
+
+        Returns :
+            bytes: les codes de couleur des boîtes
+        '''
+        topologie = self.obtenir_topologie()
+
+        return bytes(Topologie.CODES_COULEURS[self.boites[idx].couleur] for idx in topologie.index_boites)
+
+    def hash_canonique(self):
+        '''
+        Retourne le hash canonique de l'état de la planche (lignes jouées
+        et couleurs des boîtes). Voir topologie.hash_position().
+
+        Returns :
+            int: le hash de la position, un entier signé de 64 bits
+        '''
+        return hash_position(self.N_BOITES_H, self.N_BOITES_V,
+                             self.obtenir_masque_lignes(), self.obtenir_couleurs_boites())
+
+    def obtenir_etat(self):
+        '''
+        Retourne un instantané immuable de l'état de la planche. Voir
+        EtatPlanche.
+
+        Returns :
+            EtatPlanche: l'état courant de la planche
+        '''
+        return EtatPlanche(self.N_BOITES_H, self.N_BOITES_V,
+                           self.obtenir_masque_lignes(), self.obtenir_couleurs_boites())
+
+    def charger_etat(self, etat):
+        '''
+        Remplace l'état des lignes et des boîtes de la planche par celui
+        d'un instantané de mêmes dimensions.
+
+        Args :
+            etat (EtatPlanche): l'état à charger
+        '''
+        assert (etat.n_boites_h, etat.n_boites_v) == (self.N_BOITES_H, self.N_BOITES_V), \
+            "Planche: dimensions de l'état invalides."
+
+        topologie = self.obtenir_topologie()
+        masque = etat.masque_lignes
+
+        for numero, idx in enumerate(topologie.index_lignes):
+            self.lignes[idx].jouee = bool(masque >> numero & 1)
+
+        for code, idx in zip(etat.couleurs_boites, topologie.index_boites):
+            boite = self.boites[idx]
+            boite.couleur = Topologie.COULEURS_CODES[code]
+            boite.pleine = code != 0
+
+        self.recalculer_cotes_boites()
+        self.signaler_chargement()
+
+    @classmethod
+    def depuis_etat(cls, etat):
+        '''
+        Construit une nouvelle planche à partir d'un instantané.
+
+        Les lignes et les boîtes sont créées directement dans leur état
+        final, dans l'ordre des dictionnaires d'une planche neuve, au lieu
+        d'être initialisées puis rechargées.
+
+        Args :
+            etat (EtatPlanche): l'état de la nouvelle planche
+
+        Returns :
+            Planche: la nouvelle planche
+        '''
+        planche = cls.__new__(cls)
+        planche.N_BOITES_H = etat.n_boites_h
+        planche.N_BOITES_V = etat.n_boites_v
+
+        ordre_lignes, ordre_boites = ordre_cles_planche(etat.n_boites_h, etat.n_boites_v)
+        masque = etat.masque_lignes
+        couleurs = etat.couleurs_boites
+
+        planche.lignes = {}
+
+        for idx, numero in ordre_lignes:
+            ligne = Ligne()
+            ligne.jouee = bool(masque >> numero & 1)
+            planche.lignes[idx] = ligne
+
+        planche.boites = {}
+
+        for idx, numero in ordre_boites:
+            boite = Boite()
+
+            if couleurs[numero]:
+                boite.assigner_couleur(Topologie.COULEURS_CODES[couleurs[numero]])
+
+            planche.boites[idx] = boite
+
+        planche.cotes_boites = bytearray(bin(masque & masque_boite).count('1')
+                                         for masque_boite in etat.obtenir_topologie().masques_boites)
+
+        planche.position_dernier_coup = None
+        planche.couleur_dernier_coup = None
+        planche.numero_sequence = 0
+        planche.abonnes = []
+
+        return planche
+
+    def cloner(self):
+        '''
+        Retourne une copie indépendante de la planche.
+
+        Contrairement à copy.deepcopy(), on ne passe pas par le mécanisme
+        générique de copie (mémo, réduction, etc.) : on copie les attributs
+        de la planche d'un bloc et on ne duplique que les objets Ligne et
+        Boite, dont l'état tient dans un ou deux attributs.
+
+        Returns :
+            Planche: la copie de la planche
+        '''
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+
+        clone.lignes = dict(zip(self.lignes, map(Ligne.copier, self.lignes.values())))
+        clone.boites = dict(zip(self.boites, map(Boite.copier, self.boites.values())))
+        clone.cotes_boites = self.cotes_boites[:]
+
+        # Le clone garde le numéro de séquence, mais pas les abonnés.
+        clone.abonnes = []
+
+        return clone
+
     def convertir_en_chaine(self):
         '''
         Retourne une chaîne de caractères correspond à l'état actuel
@@ -481,46 +737,103 @@ class Planche:
                 else:
                     self.boites[(int(ligne_string), int(colonne_string))].assigner_couleur(attribut)
 
-    def __repr__(self):
+        self.recalculer_cotes_boites()
+        self.signaler_chargement()
+
+    def signaler_chargement(self):
         '''
-        Cette méthode spéciale permet de modifier le comportement
-        d'une instance de la classe Planche pour l'affichage.
+        Signale aux abonnés que tout l'état de la planche a été remplacé.
+        Voir abonner().
+        '''
+        self.numero_sequence += 1
+        self.publier(None)
 
-        Faire un print(une_planche) affichera la planche à l'écran.
+    def ecrire(self, flux, rangees=None, colonnes=None):
+        '''
+        Écrit la représentation textuelle de la planche (celle de
+        __repr__()) dans un flux texte, une rangée de texte à la fois, sans
+        construire la chaîne complète en mémoire.
+
+        On peut n'écrire qu'une région de la planche en donnant les rangées
+        et les colonnes de boîtes à afficher; les lignes qui entourent la
+        région sont comprises. Sans région, la sortie est identique à
+        repr(planche).
+
+        Args :
+            flux (fichier texte): le flux où écrire, par exemple sys.stdout
+            rangees (range): les rangées de boîtes à écrire, toutes par défaut.
+                Le pas doit être 1.
+            colonnes (range): les colonnes de boîtes à écrire, toutes par
+                défaut. Le pas doit être 1.
         '''
+        rangees = rangees if rangees is not None else range(self.N_BOITES_H)
+        colonnes = colonnes if colonnes is not None else range(self.N_BOITES_V)
+
+        assert rangees.step == 1 and colonnes.step == 1, 'Planche: le pas de la région doit être 1.'
+        assert 0 <= rangees.start <= rangees.stop <= self.N_BOITES_H, 'Planche: rangées hors des limites.'
+        assert 0 <= colonnes.start <= colonnes.stop <= self.N_BOITES_V, 'Planche: colonnes hors des limites.'
+
         decalage_nouvelle_ligne = '\n' + ' ' * 3
-        planche = ''
+        lignes = self.lignes
+        boites = self.boites
+        derniere_colonne = colonnes.stop
 
-        planche += decalage_nouvelle_ligne
+        def ligne_horizontale(idx_ligne):
+            morceaux = [decalage_nouvelle_ligne]
 
-        for idx_colonne in range(Planche.N_BOITES_V + 1):
-            planche += '{:<4}'.format(idx_colonne)
+            for idx_colonne in colonnes:
+                morceaux.append('+---' if lignes[(idx_ligne, idx_colonne, 'H')].jouee else '+   ')
 
-        for idx_ligne in range(Planche.N_BOITES_H):
-            planche += decalage_nouvelle_ligne
+            morceaux.append('+{:>2}'.format(idx_ligne))
 
-            # On commence par dessiner la ligne du haut de la planche
-            for idx_colonne in range(Planche.N_BOITES_V):
-                planche += '+'
-                planche += '---' if self.lignes[(idx_ligne, idx_colonne, 'H')].jouee else '   '
+            return ''.join(morceaux)
 
-            planche += '+{:>2}'.format(idx_ligne) + decalage_nouvelle_ligne
+        flux.write(decalage_nouvelle_ligne + ''.join('{:<4}'.format(idx_colonne)
+                                                      for idx_colonne in range(colonnes.start, derniere_colonne + 1)))
 
-            # On rajoute les lignes verticales et la couleur des boîtes
-            for idx_colonne in range(Planche.N_BOITES_V):
-                planche += '|' if self.lignes[(idx_ligne, idx_colonne, 'V')].jouee else ' '
-                planche += '{:^3}'.format(self.boites[(idx_ligne, idx_colonne)].couleur_formattee())
+        for idx_ligne in rangees:
+            # La ligne du haut des boîtes de la rangée
+            flux.write(ligne_horizontale(idx_ligne))
 
-            # On rajoute la ligne verticale du bout
-            planche += '|' if self.lignes[(idx_ligne, Planche.N_BOITES_V, 'V')].jouee else ' '
+            # Les lignes verticales et la couleur des boîtes
+            morceaux = [decalage_nouvelle_ligne]
 
-        planche += decalage_nouvelle_ligne
+            for idx_colonne in colonnes:
+                morceaux.append('|' if lignes[(idx_ligne, idx_colonne, 'V')].jouee else ' ')
+                morceaux.append('{:^3}'.format(boites[(idx_ligne, idx_colonne)].couleur_formattee()))
 
-        # On rajoute la ligne horizontale du bas
-        for idx_colonne in range(Planche.N_BOITES_V):
-            planche += '+'
-            planche += '---' if self.lignes[(Planche.N_BOITES_H, idx_colonne, 'H')].jouee else '   '
+            morceaux.append('|' if lignes[(idx_ligne, derniere_colonne, 'V')].jouee else ' ')
+            flux.write(''.join(morceaux))
 
-        planche += '+{:>2}'.format(Planche.N_BOITES_H) + decalage_nouvelle_ligne
+        # La ligne horizontale du bas
+        flux.write(ligne_horizontale(rangees.stop) + decalage_nouvelle_ligne)
 
-        return planche
+    def __repr__(self):
+        '''
+        Cette méthode spéciale permet de modifier le comportement
+        d'une instance de la classe Planche pour l'affichage.
+
+        Faire un print(une_planche) affichera la planche à l'écran.
+        '''
+        flux = io.StringIO()
+        self.ecrire(flux)
+
+        return flux.getvalue()
+
+
+@lru_cache(maxsize=None)
+def ordre_cles_planche(n_boites_h, n_boites_v):
+    '''
+    Retourne l'ordre des clés des dictionnaires lignes et boites d'une
+    planche neuve, avec le numéro de chaque clé dans la topologie. Voir
+    Planche.depuis_etat().
+
+    Returns :
+        tuple: les (index, numéro) des lignes
+        tuple: les (index, numéro) des boîtes
+    '''
+    modele = Planche(n_boites_h, n_boites_v)
+    topologie = obtenir_topologie(n_boites_h, n_boites_v)
+
+    return (tuple((idx, topologie.numeros_lignes[idx]) for idx in modele.lignes),
+            tuple((idx, topologie.numeros_boites[idx]) for idx in modele.boites))
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+'''
+Relecture d'une partie enregistrée, coup par coup, dans les deux sens.
+
+Rejouer une partie depuis la planche vide pour afficher le coup n coûte n
+coups : sur une grande planche, déplacer le curseur d'une relecture devient
+lent. Relecture conserve donc, tous les intervalle_images coups, une image
+clé de la position, un EtatPlanche de quelques dizaines d'octets (masque des
+lignes jouées et couleurs des boîtes). Aller à un coup quelconque repart de
+l'image clé qui le précède et ne rejoue que les quelques coups suivants.
+
+Relecture.differences() donne en plus les lignes et les boîtes qui changent
+entre deux positions, pour qu'un affichage ne mette à jour que celles-là.
+
+Un fichier de relecture (voir sauvegarder_relecture() et charger_relecture())
+commence par une ligne n_boites_h,n_boites_v, suivie d'un coup par ligne au
+format de PartiePipopipette.convertir_historique_en_chaine().
+'''
+
+from pipopipette.base_parties import convertir_chaine_en_historique
+from pipopipette.etat_planche import EtatPlanche
+from pipopipette.topologie import Topologie, obtenir_topologie
+
+
+def sauvegarder_relecture(partie, nom_fichier):
+    '''
+    Enregistre les coups d'une partie dans un fichier de relecture.
+
+    Args :
+        partie (PartiePipopipette): la partie, dont historique_coups contient
+            les coups joués depuis la planche vide
+        nom_fichier (str ou fichier texte): le nom du fichier, ou un objet
+            fichier texte déjà ouvert
+    '''
+    contenu = '{},{}\n{}'.format(partie.planche.N_BOITES_H, partie.planche.N_BOITES_V,
+                                 partie.convertir_historique_en_chaine())
+
+    if hasattr(nom_fichier, 'write'):
+        nom_fichier.write(contenu)
+    else:
+        with open(nom_fichier, 'w') as f:
+            f.write(contenu)
+
+
+def charger_relecture(nom_fichier, n_boites_h=None, n_boites_v=None, intervalle_images=16):
+    '''
+    Lit un fichier de relecture. Les fichiers sans ligne de dimensions,
+    qui ne contiennent que les coups, sont acceptés : leur taille est alors
+    celle passée en argument, Planche.N_BOITES_H x Planche.N_BOITES_V à
+    défaut.
+
+    Args :
+        nom_fichier (str ou fichier texte): le fichier à lire
+        n_boites_h (int), n_boites_v (int): la taille de la planche; si le
+            fichier contient la sienne, elles doivent lui être égales
+        intervalle_images (int): voir Relecture
+
+    Returns :
+        Relecture: la relecture de la partie
+
+    Raises :
+        ValueError: si la taille passée en argument ne correspond pas à
+            celle du fichier, ou si un coup du fichier n'est pas une ligne de
+            la planche
+    '''
+    if hasattr(nom_fichier, 'read'):
+        contenu = nom_fichier.read()
+    else:
+        with open(nom_fichier) as f:
+            contenu = f.read()
+
+    premiere_ligne, _, reste = contenu.partition('\n')
+    dimensions = premiere_ligne.split(',')
+
+    if len(dimensions) == 2:
+        dimensions = int(dimensions[0]), int(dimensions[1])
+
+        if (n_boites_h, n_boites_v) not in [(None, None), dimensions]:
+            raise ValueError('La partie a été jouée sur une planche de {} x {} boîtes, pas de {} x {}.'.format(
+                dimensions[0], dimensions[1], n_boites_h, n_boites_v))
+
+        n_boites_h, n_boites_v = dimensions
+        contenu = reste
+    elif n_boites_h is None or n_boites_v is None:
+        from pipopipette.planche import Planche
+
+        n_boites_h, n_boites_v = Planche.N_BOITES_H, Planche.N_BOITES_V
+
+    return Relecture(n_boites_h, n_boites_v, convertir_chaine_en_historique(contenu), intervalle_images)
+
+
+class Relecture:
+    '''
+    Positions successives d'une partie enregistrée. Voir la documentation du
+    module.
+    '''
+
+    def __init__(self, n_boites_h, n_boites_v, historique, intervalle_images=16):
+        '''
+        Args :
+            n_boites_h (int): le nombre de rangées de boîtes
+            n_boites_v (int): le nombre de colonnes de boîtes
+            historique (List[((int, int, str), str)]): les (coup, couleur)
+                joués depuis la planche vide, comme
+                PartiePipopipette.historique_coups
+            intervalle_images (int): le nombre de coups entre deux images clés
+
+        Raises :
+            ValueError: si un coup de l'historique n'est pas une ligne de la
+                planche
+        '''
+        assert intervalle_images > 0, "Relecture: intervalle d'images invalide."
+
+        self.topologie = obtenir_topologie(n_boites_h, n_boites_v)
+        self.intervalle_images = intervalle_images
+
+        for coup, couleur in historique:
+            if tuple(coup) not in self.topologie.numeros_lignes or couleur not in ['rouge', 'bleu']:
+                raise ValueError("Le coup {} {} n'existe pas sur une planche de {} x {} boîtes.".format(
+                    couleur, tuple(coup), n_boites_h, n_boites_v))
+
+        # Chaque coup est conservé sous la forme (numéro de ligne, code de couleur).
+        self.coups = [(self.topologie.numeros_lignes[tuple(coup)], Topologie.CODES_COULEURS[couleur])
+                      for coup, couleur in historique]
+        self.historique = [(self.topologie.index_lignes[numero_ligne], Topologie.COULEURS_CODES[code])
+                           for numero_ligne, code in self.coups]
+
+        self.images = []
+        masque = 0
+        couleurs = bytearray(self.topologie.n_boites)
+
+        for numero_coup in range(len(self.coups) + 1):
+            if numero_coup % intervalle_images == 0:
+                self.images.append(EtatPlanche(n_boites_h, n_boites_v, masque, bytes(couleurs)))
+
+            if numero_coup < len(self.coups):
+                masque = self.jouer(masque, couleurs, *self.coups[numero_coup])
+
+    def __len__(self):
+        '''
+        Returns :
+            int: le nombre de coups de la partie
+        '''
+        return len(self.coups)
+
+    def jouer(self, masque, couleurs, numero_ligne, code_couleur):
+        '''
+        Joue une ligne sur un masque et colore les boîtes qu'elle complète.
+
+        Args :
+            masque (int): le masque des lignes jouées
+            couleurs (bytearray): les codes de couleur des boîtes, modifiés
+            numero_ligne (int): la ligne jouée
+            code_couleur (int): le code de couleur du joueur
+
+        Returns :
+            int: le nouveau masque
+        '''
+        topologie = self.topologie
+        masque |= 1 << numero_ligne
+
+        for numero_boite in topologie.boites_completees(masque, numero_ligne):
+            couleurs[numero_boite] = code_couleur
+
+        return masque
+
+    def etat_au_coup(self, numero_coup):
+        '''
+        Retourne la position après numero_coup coups, à partir de l'image clé
+        la plus proche qui le précède.
+
+        Args :
+            numero_coup (int): de 0 (planche vide) à len(self)
+
+        Returns :
+            EtatPlanche: la position
+        '''
+        assert 0 <= numero_coup <= len(self.coups), 'Relecture: numéro de coup hors des limites.'
+
+        image = self.images[numero_coup // self.intervalle_images]
+        debut = numero_coup - numero_coup % self.intervalle_images
+
+        if debut == numero_coup:
+            return image
+
+        masque = image.masque_lignes
+        couleurs = bytearray(image.couleurs_boites)
+
+        for numero_ligne, code_couleur in self.coups[debut:numero_coup]:
+            masque = self.jouer(masque, couleurs, numero_ligne, code_couleur)
+
+        return EtatPlanche(image.n_boites_h, image.n_boites_v, masque, bytes(couleurs))
+
+    def differences(self, etat_avant, etat_apres):
+        '''
+        Args :
+            etat_avant (EtatPlanche): la position affichée
+            etat_apres (EtatPlanche): la position à afficher
+
+        Returns :
+            List[(int, int, str)]: les index des lignes dont l'état change
+            List[(int, int)]: les index des boîtes dont la couleur change
+        '''
+        topologie = self.topologie
+        changees = etat_avant.masque_lignes ^ etat_apres.masque_lignes
+        lignes = []
+
+        while changees:
+            bit = changees & -changees
+            lignes.append(topologie.index_lignes[bit.bit_length() - 1])
+            changees ^= bit
+
+        boites = [topologie.index_boites[numero_boite]
+                  for numero_boite, (avant, apres) in enumerate(zip(etat_avant.couleurs_boites,
+                                                                     etat_apres.couleurs_boites))
+                  if avant != apres]
+
+        return lignes, boites
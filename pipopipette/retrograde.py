@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+'''
+Résolution rétrograde exacte des petites planches.
+
+Pour une planche de n lignes, la table contient, pour chacun des 2^n masques
+de lignes jouées (voir Topologie), la meilleure marge de boîtes que peut
+encore obtenir le joueur qui doit jouer : ses boîtes moins celles de son
+adversaire d'ici la fin de la partie, les boîtes déjà remplies exclues. La
+valeur ne dépend que du masque, puisque les boîtes remplies et le joueur qui
+les possède n'influencent pas la suite de la partie.
+
+Tout masque est atteignable à partir de la planche vide, et chaque coup
+ajoute un bit au masque : en parcourant les masques du plus grand au plus
+petit, les positions qui suivent un masque sont toujours déjà résolues. La
+table tient dans un entier signé de 8 bits par masque (array('b')), soit
+16 Mo pour la planche par défaut de 3 x 3 boîtes et 24 lignes, dont la
+résolution prend environ une minute.
+
+La table s'enregistre telle quelle sur disque et TableRetrograde la projette
+en mémoire (mmap) : l'ouverture est immédiate, les pages sont partagées
+entre les processus qui lisent le même fichier et une valeur se lit en un
+accès. Pour produire la table de la planche par défaut :
+
+    python -m pipopipette.retrograde --taille 3 3 --sortie table_3x3.bin
+'''
+
+import argparse
+import mmap
+import os
+from array import array
+from time import perf_counter
+
+from pipopipette.topologie import obtenir_topologie
+
+# Au-delà, la table ne tient plus raisonnablement en mémoire (2^n octets).
+N_LIGNES_MAX = 28
+
+
+def resoudre_retrograde(n_boites_h, n_boites_v):
+    '''
+    Calcule la table rétrograde d'une taille de planche. Voir la
+    documentation du module.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+
+    Returns :
+        array: la marge optimale du joueur qui joue, indexée par masque
+    '''
+    topologie = obtenir_topologie(n_boites_h, n_boites_v)
+    n_lignes = topologie.n_lignes
+
+    assert n_lignes <= N_LIGNES_MAX, 'resoudre_retrograde: planche trop grande.'
+
+    # Pour chaque ligne, son bit et les trois autres côtés de chacune des
+    # boîtes qu'elle touche : jouer la ligne complète la boîte si ses trois
+    # autres côtés sont déjà joués.
+    lignes = []
+
+    for numero_ligne in range(n_lignes):
+        bit = 1 << numero_ligne
+        autres_cotes = tuple(topologie.masques_boites[numero_boite] & ~bit
+                             for numero_boite in topologie.boites_lignes[numero_ligne])
+        lignes.append((bit, autres_cotes))
+
+    table = array('b', bytes(1 << n_lignes))
+
+    # La planche pleine vaut 0; on remonte jusqu'à la planche vide.
+    for masque in range(topologie.masque_complet - 1, -1, -1):
+        meilleure = -128
+
+        for bit, autres_cotes in lignes:
+            if masque & bit:
+                continue
+
+            n_boites = 0
+
+            for cotes in autres_cotes:
+                if masque & cotes == cotes:
+                    n_boites += 1
+
+            # Le joueur qui complète une boîte rejoue, sinon c'est à l'adversaire.
+            if n_boites:
+                valeur = n_boites + table[masque | bit]
+            else:
+                valeur = -table[masque | bit]
+
+            if valeur > meilleure:
+                meilleure = valeur
+
+        table[masque] = meilleure
+
+    return table
+
+
+def sauvegarder_table(table, chemin):
+    '''
+    Enregistre une table rétrograde, un octet signé par masque.
+    '''
+    with open(chemin, 'wb') as f:
+        table.tofile(f)
+
+
+class TableRetrograde:
+    '''
+    Table rétrograde projetée en mémoire à partir d'un fichier. Voir la
+    documentation du module.
+    '''
+
+    def __init__(self, chemin, n_boites_h, n_boites_v):
+        '''
+        Args :
+            chemin (str): le fichier écrit par sauvegarder_table()
+            n_boites_h (int): le nombre de rangées de boîtes de la table
+            n_boites_v (int): le nombre de colonnes de boîtes de la table
+        '''
+        self.chemin = chemin
+        self.topologie = obtenir_topologie(n_boites_h, n_boites_v)
+
+        with open(chemin, 'rb') as f:
+            assert os.fstat(f.fileno()).st_size == 1 << self.topologie.n_lignes, \
+                "TableRetrograde: la taille du fichier ne correspond pas à celle de la planche."
+
+            self.projection = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.valeurs = memoryview(self.projection).cast('b')
+
+    def __getstate__(self):
+        # Un processus qui reçoit la table la projette à nouveau à partir
+        # du même fichier, ce qui partage ses pages avec les autres.
+        return self.chemin, self.topologie.n_boites_h, self.topologie.n_boites_v
+
+    def __setstate__(self, etat):
+        self.__init__(*etat)
+
+    def __getitem__(self, masque):
+        '''
+        Returns :
+            int: la marge optimale du joueur qui joue à partir du masque
+        '''
+        return self.valeurs[masque]
+
+    def evaluer_coups(self, planche):
+        '''
+        Évalue exactement chacun des coups possibles.
+
+        Args :
+            planche (Planche ou EtatPlanche): la position, de la taille de la table
+
+        Returns :
+            dict: coup -> marge optimale du joueur qui joue le coup d'ici la
+                fin de la partie, boîtes déjà remplies exclues
+        '''
+        topologie = self.topologie
+        masque = planche.obtenir_masque_lignes() if hasattr(planche, 'obtenir_masque_lignes') else planche.masque_lignes
+        valeurs = self.valeurs
+        evaluations = {}
+
+        for numero_ligne in range(topologie.n_lignes):
+            bit = 1 << numero_ligne
+
+            if masque & bit:
+                continue
+
+            nouveau = masque | bit
+            n_boites = len(topologie.boites_completees(nouveau, numero_ligne))
+
+            if n_boites:
+                evaluations[topologie.index_lignes[numero_ligne]] = n_boites + valeurs[nouveau]
+            else:
+                evaluations[topologie.index_lignes[numero_ligne]] = -valeurs[nouveau]
+
+        return evaluations
+
+    def fermer(self):
+        self.valeurs.release()
+        self.projection.close()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Résolution rétrograde exacte d\'une petite planche.')
+    parser.add_argument('--taille', type=int, nargs=2, default=[3, 3], metavar=('N_BOITES_H', 'N_BOITES_V'))
+    parser.add_argument('--sortie', required=True, help='le fichier de la table')
+    args = parser.parse_args(arguments)
+
+    debut = perf_counter()
+    table = resoudre_retrograde(*args.taille)
+    sauvegarder_table(table, args.sortie)
+
+    print('{} positions résolues en {:.1f} s; marge de la planche vide : {}'.format(
+        len(table), perf_counter() - debut, table[0]))
+
+
+if __name__ == '__main__':
+    main()
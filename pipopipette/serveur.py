@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+'''
+Serveur asyncio hébergeant un grand nombre de parties de pipopipette
+simultanées.
+
+Le protocole est une suite de lignes JSON : chaque ligne envoyée par un
+client est une requête, et le serveur répond à chacune par exactement une
+ligne. Les requêtes reconnues sont :
+
+    {"commande": "creer", "rouge": "Humain", "bleu": "Ordinateur",
+     "n_boites_h": 3, "n_boites_v": 3}
+    {"commande": "jouer", "partie": 1, "coup": [0, 0, "H"]}
+    {"commande": "etat", "partie": 1}
+    {"commande": "quitter", "partie": 1}
+    {"commande": "regarder", "partie": 1}
+
+Les réponses contiennent "ok" (true ou false), "erreur" en cas d'échec et,
+pour les trois premières commandes, l'identifiant et l'état de la partie.
+
+Après "regarder", la connexion reçoit en plus, sans les demander, les
+messages de diffusion de la partie (voir pipopipette.diffusion) : un
+instantané, puis un delta par coup, et un message "fin" quand la partie est
+quittée. Ces messages se reconnaissent à leur champ "type" et portent
+l'identifiant de la partie; chaque delta n'est sérialisé qu'une fois, quel
+que soit le nombre de spectateurs. Regarder de nouveau une partie déjà
+regardée renvoie seulement un instantané.
+
+Les parties sont gardées en mémoire dans le processus du serveur. Les coups
+des joueurs ordinateurs sont calculés dans un pool de processus pour ne pas
+bloquer la boucle d'événements : le joueur et un instantané EtatPlanche de
+la planche y sont envoyés, et seul le coup choisi revient.
+'''
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from pipopipette.diffusion import DiffuseurPlanche
+from pipopipette.exceptions import ErreurClicCoup
+from pipopipette.hasard import GenerateurCompteur
+from pipopipette.joueur import TYPES_JOUEURS
+from pipopipette.partie import PartiePipopipette
+from pipopipette.planche import Planche
+
+
+def choisir_coup_hors_processus(joueur, etat):
+    '''
+    Fonction exécutée dans le pool de processus : reconstruit la planche à
+    partir de son état et demande son coup au joueur.
+
+    Args :
+        joueur (Joueur): le joueur ordinateur qui doit jouer
+        etat (EtatPlanche): l'état de la planche
+
+    Returns :
+        (int, int, str): le coup choisi
+        random.Random: le générateur du joueur après son choix, que le
+            serveur lui remet pour que le coup suivant ne reprenne pas les
+            mêmes tirages
+    '''
+    return joueur.choisir_coup(Planche.depuis_etat(etat)), joueur.rng
+
+
+class ErreurProtocole(Exception):
+    '''
+    Une exception indiquant qu'une requête reçue par le serveur est invalide.
+    '''
+    pass
+
+
+class SessionPartie:
+    '''
+    Une partie hébergée par le serveur et le verrou qui sérialise les coups
+    qui y sont joués.
+    '''
+    __slots__ = ('identifiant', 'partie', 'verrou', 'diffuseur')
+
+    def __init__(self, identifiant, partie):
+        self.identifiant = identifiant
+        self.partie = partie
+        self.verrou = asyncio.Lock()
+
+        # Créé au premier spectateur
+        self.diffuseur = None
+
+
+class ServeurPipopipette:
+    '''
+    Serveur de parties de pipopipette. Voir la documentation du module pour
+    le protocole.
+    '''
+
+    # Dimension maximale acceptée pour une planche créée par un client : une
+    # planche plus grande bloquerait la boucle d'événements à sa création.
+    N_BOITES_MAX = 32
+
+    def __init__(self, executeur=None, max_parties=None, graine=None):
+        '''
+        Args :
+            executeur (Executor): l'exécuteur où sont calculés les coups des
+                joueurs ordinateurs. Par défaut, un ProcessPoolExecutor créé
+                au premier coup ordinateur. Avec False, les coups sont
+                calculés directement dans la boucle d'événements.
+            max_parties (int): le nombre maximal de parties simultanées,
+                illimité si None.
+            graine (int): la graine des générateurs des parties (voir
+                pipopipette.hasard), tirée du système si None. Chaque
+                partie reçoit le flux de son identifiant.
+        '''
+        self.executeur = executeur
+        self.max_parties = max_parties
+        self.rng = GenerateurCompteur(graine)
+        self.sessions = {}
+        self.identifiants = itertools.count(1)
+
+        # Écrivain d'une connexion -> identifiants des parties qu'elle regarde
+        self.parties_regardees = {}
+
+    async def traiter_requete(self, requete, ecrivain=None):
+        '''
+        Traite une requête déjà décodée et retourne la réponse à envoyer.
+
+        Args :
+            requete (dict): la requête du client
+            ecrivain (asyncio.StreamWriter): la connexion du client, où sont
+                écrits les messages de diffusion après "regarder"
+
+        Returns :
+            dict: la réponse
+        '''
+        try:
+            if not isinstance(requete, dict):
+                raise ErreurProtocole('La requête doit être un objet JSON.')
+
+            commande = requete.get('commande')
+
+            if commande == 'creer':
+                session = self.creer_session(requete)
+                async with session.verrou:
+                    await self.faire_jouer_ordinateurs(session)
+                return self.reponse_etat(session)
+
+            session = self.obtenir_session(requete)
+
+            if commande == 'jouer':
+                async with session.verrou:
+                    self.jouer_coup_humain(session, requete.get('coup'))
+                    await self.faire_jouer_ordinateurs(session)
+                return self.reponse_etat(session)
+
+            if commande == 'etat':
+                return self.reponse_etat(session)
+
+            if commande == 'quitter':
+                del self.sessions[session.identifiant]
+
+                if session.diffuseur is not None:
+                    session.diffuseur.fermer()
+
+                return {'ok': True, 'partie': session.identifiant}
+
+            if commande == 'regarder':
+                if ecrivain is None:
+                    raise ErreurProtocole('La commande regarder nécessite une connexion.')
+
+                if session.diffuseur is None:
+                    session.diffuseur = DiffuseurPlanche(session.partie.planche,
+                                                         entete={'partie': session.identifiant})
+
+                session.diffuseur.ajouter_spectateur(ecrivain)
+                self.parties_regardees.setdefault(ecrivain, set()).add(session.identifiant)
+                return {'ok': True, 'partie': session.identifiant}
+
+            raise ErreurProtocole('Commande inconnue : {}'.format(commande))
+
+        except ErreurProtocole as e:
+            return {'ok': False, 'erreur': str(e)}
+
+    def creer_session(self, requete):
+        if self.max_parties is not None and len(self.sessions) >= self.max_parties:
+            raise ErreurProtocole('Le serveur a atteint son nombre maximal de parties.')
+
+        n_boites_h = self.valider_dimension(requete, 'n_boites_h')
+        n_boites_v = self.valider_dimension(requete, 'n_boites_v')
+
+        identifiant = next(self.identifiants)
+        partie = PartiePipopipette(n_boites_h=n_boites_h, n_boites_v=n_boites_v,
+                                   rng=self.rng.deriver(identifiant))
+
+        for couleur in ['rouge', 'bleu']:
+            type_joueur = requete.get(couleur, 'Humain')
+
+            if type_joueur not in TYPES_JOUEURS:
+                raise ErreurProtocole('Type de joueur invalide : {}'.format(type_joueur))
+
+            setattr(partie, 'joueur_' + couleur, partie.creer_joueur_selon_type(type_joueur, couleur))
+
+        partie.attribuer_generateurs()
+        partie.joueur_courant = partie.joueur_rouge
+
+        session = SessionPartie(identifiant, partie)
+        self.sessions[session.identifiant] = session
+
+        return session
+
+    def valider_dimension(self, requete, cle):
+        '''
+        Returns :
+            int: la dimension de planche demandée, ou None pour la dimension
+                par défaut
+        '''
+        dimension = requete.get(cle)
+
+        if dimension is None:
+            return None
+
+        if type(dimension) is not int or not 1 <= dimension <= self.N_BOITES_MAX:
+            raise ErreurProtocole('{} doit être un entier entre 1 et {}.'.format(cle, self.N_BOITES_MAX))
+
+        return dimension
+
+    def obtenir_session(self, requete):
+        if type(requete.get('partie')) is not int:
+            raise ErreurProtocole("L'identifiant de partie doit être un entier.")
+
+        session = self.sessions.get(requete['partie'])
+
+        if session is None:
+            raise ErreurProtocole('Partie inconnue : {}'.format(requete.get('partie')))
+
+        return session
+
+    def jouer_coup_humain(self, session, coup):
+        partie = session.partie
+
+        if partie.partie_terminee():
+            raise ErreurProtocole('La partie est terminée.')
+
+        if partie.joueur_courant.obtenir_type_joueur() != 'Humain':
+            raise ErreurProtocole("Ce n'est pas au tour d'un joueur humain.")
+
+        try:
+            ligne, col, orientation = coup
+            coup = (int(ligne), int(col), orientation)
+        except (TypeError, ValueError):
+            raise ErreurProtocole('Le coup doit être une liste [ligne, colonne, orientation].')
+
+        try:
+            partie.jouer_coup(coup)
+        except ErreurClicCoup as e:
+            raise ErreurProtocole(str(e))
+
+    async def faire_jouer_ordinateurs(self, session):
+        '''
+        Fait jouer les joueurs ordinateurs tant que c'est leur tour et que
+        la partie n'est pas terminée.
+        '''
+        partie = session.partie
+
+        while not partie.partie_terminee() and partie.joueur_courant.obtenir_type_joueur() != 'Humain':
+            partie.jouer_coup(await self.choisir_coup_ordinateur(partie.joueur_courant, partie.planche))
+
+    async def choisir_coup_ordinateur(self, joueur, planche):
+        if self.executeur is False:
+            return joueur.choisir_coup(planche)
+
+        if self.executeur is None:
+            self.executeur = ProcessPoolExecutor()
+
+        loop = asyncio.get_running_loop()
+        coup, joueur.rng = await loop.run_in_executor(self.executeur, choisir_coup_hors_processus,
+                                                      joueur, planche.obtenir_etat())
+
+        return coup
+
+    def reponse_etat(self, session):
+        partie = session.partie
+        terminee = partie.partie_terminee()
+        n_boites_bleues, n_boites_rouges = partie.planche.bilan_boites()
+
+        return {
+            'ok': True,
+            'partie': session.identifiant,
+            'n_boites_h': partie.planche.N_BOITES_H,
+            'n_boites_v': partie.planche.N_BOITES_V,
+            'planche': partie.planche.convertir_en_chaine(),
+            'joueur_courant': partie.couleur_joueur_courant,
+            'boites': {'rouge': n_boites_rouges, 'bleu': n_boites_bleues},
+            'terminee': terminee,
+            'gagnant': partie.gagnant_partie if terminee else None,
+        }
+
+    async def gerer_connexion(self, lecteur, ecrivain):
+        '''
+        Traite les requêtes d'une connexion jusqu'à sa fermeture.
+        '''
+        try:
+            while True:
+                ligne = await lecteur.readline()
+
+                if not ligne:
+                    break
+
+                try:
+                    requete = json.loads(ligne)
+                except ValueError:
+                    reponse = {'ok': False, 'erreur': 'JSON invalide.'}
+                else:
+                    reponse = await self.traiter_requete(requete, ecrivain)
+
+                ecrivain.write(json.dumps(reponse).encode() + b'\n')
+                await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for identifiant in self.parties_regardees.pop(ecrivain, ()):
+                session = self.sessions.get(identifiant)
+
+                if session is not None and session.diffuseur is not None:
+                    session.diffuseur.retirer_spectateur(ecrivain)
+
+            ecrivain.close()
+
+    async def demarrer_tcp(self, hote='127.0.0.1', port=8765):
+        '''
+        Returns :
+            asyncio.Server: le serveur TCP, déjà à l'écoute
+        '''
+        return await asyncio.start_server(self.gerer_connexion, hote, port)
+
+    async def demarrer_unix(self, chemin):
+        '''
+        Returns :
+            asyncio.Server: le serveur sur socket Unix, déjà à l'écoute
+        '''
+        return await asyncio.start_unix_server(self.gerer_connexion, chemin)
+
+    def fermer(self):
+        if self.executeur:
+            self.executeur.shutdown()
+
+
+class ClientLocal:
+    '''
+    Client qui remplace une connexion réseau pour les essais : les requêtes
+    passent par le même encodage JSON qu'une vraie connexion, mais sont
+    remises directement à ServeurPipopipette.traiter_requete().
+    '''
+
+    def __init__(self, serveur):
+        self.serveur = serveur
+
+    async def envoyer(self, **requete):
+        reponse = await self.serveur.traiter_requete(json.loads(json.dumps(requete)))
+
+        return json.loads(json.dumps(reponse))
+
+
+class ClientReseau:
+    '''
+    Client minimal du protocole sur TCP ou socket Unix.
+    '''
+
+    def __init__(self, lecteur, ecrivain):
+        self.lecteur = lecteur
+        self.ecrivain = ecrivain
+
+        # Messages de diffusion reçus en attendant une réponse
+        self.diffusion = collections.deque()
+
+    @classmethod
+    async def connecter_tcp(cls, hote='127.0.0.1', port=8765):
+        return cls(*await asyncio.open_connection(hote, port))
+
+    @classmethod
+    async def connecter_unix(cls, chemin):
+        return cls(*await asyncio.open_unix_connection(chemin))
+
+    async def envoyer(self, **requete):
+        self.ecrivain.write(json.dumps(requete).encode() + b'\n')
+        await self.ecrivain.drain()
+
+        while True:
+            message = json.loads(await self.lecteur.readline())
+
+            if 'type' not in message:
+                return message
+
+            self.diffusion.append(message)
+
+    async def recevoir_diffusion(self):
+        '''
+        Returns :
+            dict: le prochain message de diffusion des parties regardées
+        '''
+        if self.diffusion:
+            return self.diffusion.popleft()
+
+        return json.loads(await self.lecteur.readline())
+
+    async def fermer(self):
+        self.ecrivain.close()
+        await self.ecrivain.wait_closed()
+
+
+async def servir(hote, port, chemin_unix=None, graine=None):
+    serveur = ServeurPipopipette(graine=graine)
+
+    if chemin_unix is not None:
+        serveur_asyncio = await serveur.demarrer_unix(chemin_unix)
+    else:
+        serveur_asyncio = await serveur.demarrer_tcp(hote, port)
+
+    try:
+        async with serveur_asyncio:
+            await serveur_asyncio.serve_forever()
+    finally:
+        serveur.fermer()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Serveur de parties de pipopipette.')
+    parser.add_argument('--hote', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='chemin d\'un socket Unix à utiliser plutôt que TCP')
+    parser.add_argument('--graine', type=int, help='graine des parties, pour les rejouer à l\'identique')
+    args = parser.parse_args(arguments)
+
+    asyncio.run(servir(args.hote, args.port, args.unix, args.graine))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+from functools import lru_cache
+
+
+class Topologie:
+    '''
+    Classe décrivant la géométrie d'une planche de dimensions données,
+    indépendamment de son état.
+
+    Les lignes et les boîtes y reçoivent un numéro dans un ordre canonique
+    qui ne dépend pas de l'ordre d'insertion des dictionnaires de Planche :
+
+        - Les lignes horizontales d'abord, ligne par ligne puis colonne par
+          colonne, suivies des lignes verticales dans le même ordre.
+
+        - Les boîtes ligne par ligne, puis colonne par colonne.
+
+    Le numéro d'une ligne est la position de son bit dans un masque de
+    lignes jouées (un int), et le numéro d'une boîte est sa position dans
+    la chaîne d'octets des couleurs des boîtes.
+
+    Utilisez obtenir_topologie() plutôt que le constructeur : les
+    topologies sont partagées entre toutes les planches de même taille.
+    '''
+    # Code d'une boîte dans la chaîne d'octets des couleurs.
+    CODES_COULEURS = {'': 0, 'rouge': 1, 'bleu': 2}
+    COULEURS_CODES = ('', 'rouge', 'bleu')
+
+    def __init__(self, n_boites_h, n_boites_v):
+        self.n_boites_h = n_boites_h
+        self.n_boites_v = n_boites_v
+
+        self.index_lignes = []
+
+        for ligne in range(n_boites_h + 1):
+            for col in range(n_boites_v):
+                self.index_lignes.append((ligne, col, 'H'))
+
+        for ligne in range(n_boites_h):
+            for col in range(n_boites_v + 1):
+                self.index_lignes.append((ligne, col, 'V'))
+
+        self.index_boites = [(ligne, col) for ligne in range(n_boites_h) for col in range(n_boites_v)]
+
+        self.numeros_lignes = {idx: numero for numero, idx in enumerate(self.index_lignes)}
+        self.numeros_boites = {idx: numero for numero, idx in enumerate(self.index_boites)}
+
+        self.n_lignes = len(self.index_lignes)
+        self.n_boites = len(self.index_boites)
+
+        # Pour chaque boîte, les numéros de ses quatre côtés
+        self.lignes_boites = []
+
+        for ligne, col in self.index_boites:
+            self.lignes_boites.append(tuple(self.numeros_lignes[(ligne + decalage_ligne, col + decalage_col, orientation)]
+                                            for decalage_ligne, decalage_col, orientation
+                                            in [(0, 0, 'H'), (0, 0, 'V'), (0, 1, 'V'), (1, 0, 'H')]))
+
+        self.masques_boites = [sum(1 << numero for numero in cotes) for cotes in self.lignes_boites]
+
+        # Pour chaque ligne, les numéros des boîtes (une ou deux) qui lui touchent
+        boites_lignes = [[] for _ in range(self.n_lignes)]
+
+        for numero_boite, cotes in enumerate(self.lignes_boites):
+            for numero_ligne in cotes:
+                boites_lignes[numero_ligne].append(numero_boite)
+
+        self.boites_lignes = [tuple(boites) for boites in boites_lignes]
+
+        self.masque_complet = (1 << self.n_lignes) - 1
+
+    def boites_completees(self, masque, numero_ligne):
+        '''
+        Retourne les boîtes complétées en jouant la ligne numero_ligne.
+
+        Args :
+            masque (int): le masque des lignes jouées, incluant déjà la
+                ligne numero_ligne
+            numero_ligne (int): la ligne jouée
+
+        Returns :
+            List[int]: les numéros des boîtes (zéro, une ou deux) dont les
+                quatre côtés sont dans masque
+        '''
+        masques_boites = self.masques_boites
+
+        return [numero_boite for numero_boite in self.boites_lignes[numero_ligne]
+                if masque & masques_boites[numero_boite] == masques_boites[numero_boite]]
+
+
+@lru_cache(maxsize=None)
+def obtenir_topologie(n_boites_h, n_boites_v):
+    '''
+    Retourne la topologie partagée des planches de dimensions données.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+
+    Returns :
+        Topologie: la topologie correspondante
+    '''
+    return Topologie(n_boites_h, n_boites_v)
+
+
+def hash_position(n_boites_h, n_boites_v, masque_lignes, couleurs_boites):
+    '''
+    Calcule le hash canonique d'une position. Deux planches ont le même
+    hash si et seulement si elles ont les mêmes dimensions, les mêmes
+    lignes jouées et les mêmes couleurs de boîtes (aux collisions près).
+
+    Le hash est stable d'une exécution à l'autre (contrairement à hash())
+    et tient dans un entier signé de 64 bits, ce qui permet de le stocker
+    tel quel dans SQLite.
+
+    Args :
+        n_boites_h (int): le nombre de rangées de boîtes
+        n_boites_v (int): le nombre de colonnes de boîtes
+        masque_lignes (int): le masque des lignes jouées
+        couleurs_boites (bytes): les codes de couleur des boîtes
+
+    Returns :
+        int: le hash de la position
+    '''
+    topologie = obtenir_topologie(n_boites_h, n_boites_v)
+
+    h = hashlib.blake2b(digest_size=8)
+    h.update(n_boites_h.to_bytes(2, 'little'))
+    h.update(n_boites_v.to_bytes(2, 'little'))
+    h.update(masque_lignes.to_bytes((topologie.n_lignes + 7) // 8, 'little'))
+    h.update(couleurs_boites)
+
+    return int.from_bytes(h.digest(), 'little', signed=True)
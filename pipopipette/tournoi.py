@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+'''
+Tournois entre joueurs ordinateurs, avec classement Elo.
+
+Un tournoi se joue en rondes. À chaque ronde, les participants sont appariés
+(toutes rondes ou système suisse) et chaque paire joue, pour chacune des
+tailles de planche, deux parties en inversant les couleurs : comme le joueur
+rouge commence toujours (voir PartiePipopipette.initialiser_joueurs()),
+chacun des deux joue ainsi une fois en premier. Les parties d'une ronde sont
+jouées en parallèle dans un pool de processus.
+
+Après chaque ronde, on recalcule les cotes Elo (maximum de vraisemblance du
+modèle de Bradley-Terry) et on arrête dès que le résultat est clair : quand
+chacune des premières places devance significativement tous les
+participants classés après elle (voir classement_etabli()). On économise
+ainsi les parties qu'un match de longueur fixe jouerait après que l'issue
+soit connue.
+
+Tester le classement après chaque ronde, c'est regarder les données
+plusieurs fois : avec un test à 5 % à chaque regard, la probabilité de
+s'arrêter un jour sur un mauvais classement dépasse largement 5 %. Le seuil
+du test est donc corrigé (Bonferroni) pour le nombre maximal de regards,
+max_rondes - min_rondes + 1, et pour le nombre de paires de participants :
+la probabilité que le tournoi s'arrête sur des premières places dans le
+mauvais ordre est d'au plus risque (5 % par défaut), à l'approximation
+normale du maximum de vraisemblance près et si le modèle de Bradley-Terry
+est juste. Le critère precision, qui arrête sur la largeur des intervalles
+et non sur l'ordre, n'est pas couvert par cette garantie.
+'''
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+from pipopipette.hasard import GenerateurCompteur
+from pipopipette.partie import PartiePipopipette
+
+# Facteur de conversion entre l'échelle logistique naturelle et l'échelle Elo.
+ECHELLE_ELO = 400 / math.log(10)
+
+Z_95 = 1.959964
+
+
+class Participant:
+    '''
+    Un participant au tournoi : une sous-classe de Joueur et les arguments
+    supplémentaires à passer à son constructeur, après la couleur.
+    '''
+
+    def __init__(self, nom, classe_joueur, **parametres):
+        '''
+        Args :
+            nom (str): le nom du participant dans le classement
+            classe_joueur (type): une sous-classe de Joueur
+            parametres: les arguments nommés du constructeur du joueur
+        '''
+        self.nom = nom
+        self.classe_joueur = classe_joueur
+        self.parametres = parametres
+
+    def creer_joueur(self, couleur):
+        return self.classe_joueur(couleur, **self.parametres)
+
+    def __repr__(self):
+        return 'Participant {}'.format(self.nom)
+
+
+def jouer_partie(participant_rouge, participant_bleu, n_boites_h, n_boites_v, graine):
+    '''
+    Joue une partie complète sans affichage. Exécutée dans le pool de
+    processus, d'où les arguments simples.
+
+    Returns :
+        int: le nombre de boîtes rouges
+        int: le nombre de boîtes bleues
+    '''
+    partie = PartiePipopipette(joueur_rouge=participant_rouge.creer_joueur('rouge'),
+                               joueur_bleu=participant_bleu.creer_joueur('bleu'),
+                               n_boites_h=n_boites_h, n_boites_v=n_boites_v,
+                               rng=GenerateurCompteur(graine))
+
+    while not partie.partie_terminee():
+        partie.jouer_coup(partie.demander_coup())
+
+    n_boites_bleues, n_boites_rouges = partie.planche.bilan_boites()
+
+    return n_boites_rouges, n_boites_bleues
+
+
+def _jouer_partie(args):
+    return jouer_partie(*args)
+
+
+def calculer_elo(n_participants, resultats, parties_virtuelles=1, iterations=1000, tolerance=1e-9):
+    '''
+    Calcule les cotes Elo par maximum de vraisemblance du modèle de
+    Bradley-Terry (algorithme MM de Hunter), les nulles comptant pour une
+    demi-victoire de chaque côté.
+
+    Pour que les cotes restent finies quand un participant a tout gagné ou
+    tout perdu, on ajoute entre chaque paire un nombre de parties nulles
+    virtuelles.
+
+    Les intervalles de confiance à 95 % utilisent la diagonale de
+    l'information de Fisher; ils ignorent les covariances entre les cotes,
+    ce qui suffit pour décider quand arrêter un tournoi.
+
+    Args :
+        n_participants (int): le nombre de participants
+        resultats (dict): (i, j) -> [points de i contre j, nombre de parties]
+            pour i < j
+        parties_virtuelles (float): le nombre de nulles virtuelles par paire
+
+    Returns :
+        List[float]: la cote Elo de chaque participant, de moyenne 1500
+        List[float]: la demi-largeur de l'intervalle de confiance de chaque cote
+    '''
+    # victoires[i][j] : points de i contre j, virtuels compris
+    victoires = [[0.0] * n_participants for _ in range(n_participants)]
+
+    for i in range(n_participants):
+        for j in range(i + 1, n_participants):
+            points, n_parties = resultats.get((i, j), (0, 0))
+            victoires[i][j] = points + parties_virtuelles / 2
+            victoires[j][i] = n_parties - points + parties_virtuelles / 2
+
+    forces = [1.0] * n_participants
+
+    for _ in range(iterations):
+        nouvelles_forces = []
+
+        for i in range(n_participants):
+            total_victoires = sum(victoires[i])
+            denominateur = sum((victoires[i][j] + victoires[j][i]) / (forces[i] + forces[j])
+                               for j in range(n_participants) if j != i)
+            nouvelles_forces.append(total_victoires / denominateur if denominateur else forces[i])
+
+        moyenne_log = sum(math.log(force) for force in nouvelles_forces) / n_participants
+        nouvelles_forces = [force / math.exp(moyenne_log) for force in nouvelles_forces]
+
+        ecart = max(abs(math.log(a / b)) for a, b in zip(nouvelles_forces, forces))
+        forces = nouvelles_forces
+
+        if ecart < tolerance:
+            break
+
+    cotes = [1500 + ECHELLE_ELO * math.log(force) for force in forces]
+    intervalles = []
+
+    for i in range(n_participants):
+        information = 0.0
+
+        for j in range(n_participants):
+            if j != i:
+                n_parties = resultats.get((min(i, j), max(i, j)), (0, 0))[1]
+                p = forces[i] / (forces[i] + forces[j])
+                information += n_parties * p * (1 - p)
+
+        intervalles.append(Z_95 * ECHELLE_ELO / math.sqrt(information) if information > 0 else math.inf)
+
+    return cotes, intervalles
+
+
+def inverser(matrice):
+    '''
+    Inverse une matrice carrée par élimination de Gauss-Jordan.
+
+    Returns :
+        List[List[float]]: l'inverse, None si la matrice est singulière
+    '''
+    n = len(matrice)
+    lignes = [list(rangee) + [float(i == j) for j in range(n)] for i, rangee in enumerate(matrice)]
+
+    for colonne in range(n):
+        pivot = max(range(colonne, n), key=lambda i: abs(lignes[i][colonne]))
+
+        if abs(lignes[pivot][colonne]) < 1e-12:
+            return None
+
+        lignes[colonne], lignes[pivot] = lignes[pivot], lignes[colonne]
+        rangee_pivot = [valeur / lignes[colonne][colonne] for valeur in lignes[colonne]]
+        lignes[colonne] = rangee_pivot
+
+        for i in range(n):
+            if i != colonne and lignes[i][colonne]:
+                facteur = lignes[i][colonne]
+                lignes[i] = [a - facteur * b for a, b in zip(lignes[i], rangee_pivot)]
+
+    return [rangee[n:] for rangee in lignes]
+
+
+def calculer_covariance(cotes, resultats):
+    '''
+    Calcule la matrice de covariance des cotes Elo, inverse de l'information
+    de Fisher du modèle de Bradley-Terry sous la contrainte que les cotes
+    sont de moyenne fixe. Contrairement aux intervalles de calculer_elo(),
+    elle tient compte des covariances entre les cotes.
+
+    Args :
+        cotes (List[float]): les cotes Elo (voir calculer_elo())
+        resultats (dict): les résultats, comme pour calculer_elo()
+
+    Returns :
+        List[List[float]]: la covariance des cotes, en points Elo au carré.
+            None si le graphe des parties jouées n'est pas connexe, auquel
+            cas certaines différences de cotes ne sont pas estimables.
+    '''
+    n = len(cotes)
+    information = [[0.0] * n for _ in range(n)]
+
+    for (i, j), (_, n_parties) in resultats.items():
+        p = 1 / (1 + math.exp((cotes[j] - cotes[i]) / ECHELLE_ELO))
+        terme = n_parties * p * (1 - p)
+        information[i][i] += terme
+        information[j][j] += terme
+        information[i][j] -= terme
+        information[j][i] -= terme
+
+    # L'information est un laplacien, singulier dans la direction où
+    # toutes les cotes augmentent ensemble : on y ajoute J / n, puis on le
+    # retire de l'inverse, ce qui donne le pseudo-inverse.
+    inverse = inverser([[valeur + 1 / n for valeur in rangee] for rangee in information])
+
+    if inverse is None:
+        return None
+
+    return [[ECHELLE_ELO ** 2 * (valeur - 1 / n) for valeur in rangee] for rangee in inverse]
+
+
+def seuil_arret(n_participants, n_regards, risque=0.05):
+    '''
+    Seuil de la statistique z au-delà duquel classement_etabli() considère
+    qu'un participant en devance un autre, corrigé (Bonferroni) pour les
+    n_regards tests et les paires de participants. Voir la documentation du
+    module.
+
+    Returns :
+        float: le seuil
+    '''
+    n_paires = n_participants * (n_participants - 1) // 2
+
+    return NormalDist().inv_cdf(1 - risque / (n_regards * n_paires))
+
+
+def classement_etabli(cotes, covariance, n_places=1, seuil=Z_95, intervalles=None, precision=None):
+    '''
+    Décide si le résultat d'un tournoi est statistiquement clair.
+
+    Args :
+        cotes (List[float]): les cotes Elo des participants
+        covariance (List[List[float]]): leur covariance (voir
+            calculer_covariance()); None si elle n'est pas estimable
+        n_places (int): le nombre de places du haut du classement à établir;
+            len(cotes) - 1 pour établir le classement complet
+        seuil (float): le seuil de la statistique z de chaque comparaison,
+            1,96 pour un seul test à 95 %; voir seuil_arret() pour un
+            tournoi testé après chaque ronde
+        intervalles (List[float]), precision (float): si présents, le
+            résultat est aussi considéré clair quand tous les intervalles
+            (voir calculer_elo()) sont plus étroits que precision, même si
+            des participants restent à égalité
+
+    Returns :
+        bool: True si chacun des n_places premiers participants devance
+            chaque participant classé après lui : sa différence de cotes
+            dépasse seuil écarts-types
+    '''
+    if precision is not None and max(intervalles) <= precision:
+        return True
+
+    if covariance is None:
+        return False
+
+    ordre = sorted(range(len(cotes)), key=lambda i: -cotes[i])
+
+    for place, a in enumerate(ordre[:n_places]):
+        for b in ordre[place + 1:]:
+            variance = covariance[a][a] + covariance[b][b] - 2 * covariance[a][b]
+
+            if cotes[a] - cotes[b] <= seuil * math.sqrt(max(variance, 0.0)):
+                return False
+
+    return True
+
+
+class Tournoi:
+    '''
+    Tournoi entre plusieurs participants. Voir la documentation du module.
+    '''
+
+    def __init__(self, participants, tailles=((3, 3),), systeme='toutes_rondes', graine=0,
+                 min_rondes=2, max_rondes=50, n_places=1, precision=None, risque=0.05, n_processus=None):
+        '''
+        Args :
+            participants (List[Participant]): au moins deux participants
+            tailles (List[(int, int)]): les tailles (n_boites_h, n_boites_v)
+                des planches jouées à chaque ronde
+            systeme (str): 'toutes_rondes' ou 'suisse'
+            graine (int): la graine des parties; un même tournoi rejoué avec
+                la même graine donne les mêmes résultats
+            min_rondes (int): le nombre de rondes avant de pouvoir arrêter
+            max_rondes (int): le nombre maximal de rondes
+            n_places (int), precision (float): le critère d'arrêt, voir
+                classement_etabli()
+            risque (float): la probabilité maximale que le tournoi s'arrête
+                avant max_rondes sur un mauvais ordre des n_places premières
+                places (voir la documentation du module)
+            n_processus (int): la taille du pool, le nombre de coeurs par
+                défaut. Avec 0, les parties sont jouées dans ce processus.
+        '''
+        assert len(participants) >= 2, 'Tournoi: il faut au moins deux participants.'
+        assert systeme in ['toutes_rondes', 'suisse'], 'Tournoi: système invalide.'
+        assert 1 <= min_rondes <= max_rondes, 'Tournoi: nombres de rondes invalides.'
+
+        self.participants = list(participants)
+        self.tailles = list(tailles)
+        self.systeme = systeme
+        self.graine = graine
+        self.min_rondes = min_rondes
+        self.max_rondes = max_rondes
+        self.n_places = n_places
+        self.precision = precision
+        self.n_processus = n_processus
+
+        # Le classement est testé après chacune des rondes min_rondes à
+        # max_rondes.
+        self.seuil = seuil_arret(len(self.participants), max_rondes - min_rondes + 1, risque)
+
+        # (i, j) -> [points de i contre j, nombre de parties] pour i < j
+        self.resultats = {}
+        self.points = [0.0] * len(self.participants)
+        self.exemptions = [0] * len(self.participants)
+        self.n_parties = 0
+        self.n_rondes = 0
+        self.arret_anticipe = False
+
+    def apparier(self):
+        '''
+        Returns :
+            List[(int, int)]: les paires d'index de participants de la ronde
+        '''
+        n = len(self.participants)
+
+        if self.systeme == 'toutes_rondes':
+            return [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+        # Système suisse : on apparie les participants de points voisins en
+        # évitant, si possible, les paires déjà jouées. En cas de nombre
+        # impair, on exempte le moins bien classé parmi ceux qui l'ont été le
+        # moins souvent. Comme d'habitude au système suisse, l'exemption
+        # compte pour une ronde gagnée : autant de points que les parties
+        # d'une paire dans la ronde. Ces points ne servent qu'aux
+        # appariements et au classement par points, pas aux cotes Elo.
+        rng = GenerateurCompteur(self.graine, 'appariement', self.n_rondes)
+        ordre = sorted(range(n), key=lambda i: (-self.points[i], rng.random()))
+        paires = []
+
+        if n % 2 == 1:
+            exempte = min(reversed(ordre), key=lambda i: self.exemptions[i])
+            self.exemptions[exempte] += 1
+            self.points[exempte] += 2 * len(self.tailles)
+            ordre.remove(exempte)
+
+        while len(ordre) >= 2:
+            i = ordre.pop(0)
+            adversaire = next((j for j in ordre if (min(i, j), max(i, j)) not in self.resultats), ordre[0])
+            ordre.remove(adversaire)
+            paires.append((i, adversaire))
+
+        return paires
+
+    def preparer_ronde(self):
+        travaux = []
+
+        for i, j in self.apparier():
+            for n_boites_h, n_boites_v in self.tailles:
+                for rouge, bleu in [(i, j), (j, i)]:
+                    graine = '{}:{}'.format(self.graine, self.n_parties + len(travaux))
+                    travaux.append((rouge, bleu, n_boites_h, n_boites_v, graine))
+
+        return travaux
+
+    def enregistrer(self, rouge, bleu, n_boites_rouges, n_boites_bleues):
+        if n_boites_rouges > n_boites_bleues:
+            points_rouge = 1.0
+        elif n_boites_rouges < n_boites_bleues:
+            points_rouge = 0.0
+        else:
+            points_rouge = 0.5
+
+        self.points[rouge] += points_rouge
+        self.points[bleu] += 1 - points_rouge
+
+        i, j = min(rouge, bleu), max(rouge, bleu)
+        resultat = self.resultats.setdefault((i, j), [0.0, 0])
+        resultat[0] += points_rouge if rouge == i else 1 - points_rouge
+        resultat[1] += 1
+
+        self.n_parties += 1
+
+    def jouer(self):
+        '''
+        Joue le tournoi jusqu'à ce que le classement soit établi ou que le
+        nombre maximal de rondes soit atteint.
+
+        Returns :
+            List[dict]: le classement, du premier au dernier (voir classement())
+        '''
+        executeur = ProcessPoolExecutor(self.n_processus) if self.n_processus != 0 else None
+
+        try:
+            while self.n_rondes < self.max_rondes:
+                travaux = self.preparer_ronde()
+                arguments = [(self.participants[rouge], self.participants[bleu], n_boites_h, n_boites_v, graine)
+                             for rouge, bleu, n_boites_h, n_boites_v, graine in travaux]
+
+                if executeur is not None:
+                    scores = executeur.map(_jouer_partie, arguments, chunksize=max(1, len(arguments) // 32))
+                else:
+                    scores = map(_jouer_partie, arguments)
+
+                for (rouge, bleu, _, _, _), (n_boites_rouges, n_boites_bleues) in zip(travaux, scores):
+                    self.enregistrer(rouge, bleu, n_boites_rouges, n_boites_bleues)
+
+                self.n_rondes += 1
+
+                if self.n_rondes < self.min_rondes:
+                    continue
+
+                cotes, intervalles = calculer_elo(len(self.participants), self.resultats)
+                covariance = calculer_covariance(cotes, self.resultats)
+
+                if classement_etabli(cotes, covariance, self.n_places, self.seuil, intervalles, self.precision):
+                    self.arret_anticipe = self.n_rondes < self.max_rondes
+                    break
+        finally:
+            if executeur is not None:
+                executeur.shutdown()
+
+        return self.classement()
+
+    def classement(self):
+        '''
+        Returns :
+            List[dict]: pour chaque participant, du premier au dernier, son
+                nom, sa cote Elo, la demi-largeur de l'intervalle de
+                confiance à 95 %, ses points (exemptions comprises) et son
+                nombre de parties
+        '''
+        cotes, intervalles = calculer_elo(len(self.participants), self.resultats)
+        n_parties = [0] * len(self.participants)
+
+        for (i, j), (_, n) in self.resultats.items():
+            n_parties[i] += n
+            n_parties[j] += n
+
+        classement = [{'nom': participant.nom, 'elo': cotes[i], 'intervalle': intervalles[i],
+                       'points': self.points[i], 'parties': n_parties[i]}
+                      for i, participant in enumerate(self.participants)]
+
+        return sorted(classement, key=lambda ligne: -ligne['elo'])
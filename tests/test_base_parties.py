@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from pipopipette.base_parties import BaseDeParties, convertir_chaine_en_historique
+from pipopipette.joueur import JoueurOrdinateur
+from pipopipette.partie import PartiePipopipette
+from pipopipette.planche import Planche
+
+
+def jouer_partie(graine, n_boites_h=2, n_boites_v=2):
+    partie = PartiePipopipette(joueur_rouge=JoueurOrdinateur('rouge'), joueur_bleu=JoueurOrdinateur('bleu'),
+                               n_boites_h=n_boites_h, n_boites_v=n_boites_v, rng=graine)
+
+    while not partie.partie_terminee():
+        partie.jouer_coup(partie.demander_coup())
+
+    return partie
+
+
+def test_historique_aller_retour():
+    partie = jouer_partie(0)
+
+    assert convertir_chaine_en_historique(partie.convertir_historique_en_chaine()) == partie.historique_coups
+
+
+def test_partie_aller_retour(tmp_path):
+    chemin = str(tmp_path / 'parties.sqlite')
+    partie = jouer_partie(1, 3, 2)
+
+    with BaseDeParties(chemin) as base:
+        id_partie = base.ajouter_partie(partie)
+
+    with BaseDeParties(chemin) as base:
+        assert len(base) == 1
+
+        enregistree = base.obtenir_partie(id_partie)
+        n_boites_bleues, n_boites_rouges = partie.planche.bilan_boites()
+
+        assert enregistree['n_boites_h'] == 3 and enregistree['n_boites_v'] == 2
+        assert enregistree['type_joueur_rouge'] == 'Ordinateur'
+        assert enregistree['type_joueur_bleu'] == 'Ordinateur'
+        assert enregistree['boites_rouges'] == n_boites_rouges
+        assert enregistree['boites_bleues'] == n_boites_bleues
+        assert enregistree['coups'] == partie.historique_coups
+
+        assert base.obtenir_partie(id_partie + 1) is None
+
+
+def test_parties_passant_par():
+    parties = [jouer_partie(graine) for graine in range(5)]
+
+    with BaseDeParties() as base:
+        ids = base.ajouter_parties(parties)
+
+        assert base.parties_passant_par(Planche(2, 2)) == [(id_partie, 0) for id_partie in ids]
+        assert (ids[2], len(parties[2].planche.lignes)) in base.parties_passant_par(parties[2].planche)
+
+
+def test_taux_victoire_compte_les_nulles():
+    parties = [jouer_partie(graine) for graine in range(60)]
+    bilans = [partie.planche.bilan_boites() for partie in parties]
+
+    n_rouges = sum(rouges > bleues for bleues, rouges in bilans)
+    n_bleues = sum(bleues > rouges for bleues, rouges in bilans)
+    n_nulles = sum(bleues == rouges for bleues, rouges in bilans)
+
+    # Sur une planche de quatre boîtes, certaines parties sont nulles.
+    assert n_nulles > 0
+
+    with BaseDeParties() as base:
+        base.ajouter_parties(parties)
+
+        assert base.taux_victoire(Planche(2, 2), 'rouge') == (n_rouges / 60, n_nulles / 60, 60)
+        assert base.taux_victoire(Planche(2, 2), 'bleu') == (n_bleues / 60, n_nulles / 60, 60)
+
+
+def test_taux_victoire_position_absente():
+    with BaseDeParties() as base:
+        base.ajouter_partie(jouer_partie(0))
+
+        assert base.taux_victoire(Planche(3, 3), 'rouge') == (None, None, 0)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import pytest
+
+from pipopipette.simulation import SimulateurAleatoire, SimulateurVectorise, jouer_lot
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.mark.parametrize('n_boites_h, n_boites_v', [(1, 1), (2, 3), (5, 5), (8, 9)])
+def test_vectorise_comme_pur_python(n_boites_h, n_boites_v):
+    simulateur = SimulateurAleatoire(n_boites_h, n_boites_v)
+    vectorise = SimulateurVectorise(n_boites_h, n_boites_v)
+    cles = np.random.default_rng(0).random((500, simulateur.topologie.n_lignes))
+
+    attendu = [simulateur.compter_boites_premier_joueur(list(ligne), 0) for ligne in cles.tolist()]
+
+    assert vectorise.compter_boites_rouges(cles).tolist() == attendu
+
+
+def test_jouer_lot_vectorise():
+    n_parties = 20000
+    resultats = jouer_lot(3, 3, n_parties, graine=1, vectorise=True)
+    attendus = jouer_lot(3, 3, n_parties, graine=1, vectorise=False)
+
+    assert sum(resultats) == n_parties
+    assert resultats == jouer_lot(3, 3, n_parties, graine=1, n_processus=2, vectorise=True)
+
+    # Les deux versions tirent des parties différentes, mais de même loi.
+    for resultat, attendu in zip(resultats, attendus):
+        assert abs(resultat - attendu) < 5 * (n_parties / 4) ** 0.5
+
+
+def test_jouer_parties_vectorise():
+    victoires_rouges, victoires_bleues, nulles = SimulateurVectorise(2, 2, np.random.default_rng(2)).jouer_parties(1000)
+
+    assert victoires_rouges + victoires_bleues + nulles == 1000
+    assert nulles > 0